@@ -0,0 +1,86 @@
+"""Benchmark: searching a large tree with the grep tool.
+
+Creates a synthetic repository of small source files and compares a
+single-process scan, the process-pool scan and a scan narrowed by the
+trigram index (cold, warm, and warm after a file was edited in place).
+
+Usage:
+    python benchmarks/bench_grep.py [--files 20000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from vecna.tools import grep as grep_module
+from vecna.tools.grep import GrepTool
+from vecna.tools.trigram_index import TrigramIndex
+from vecna.tools.workspace_index import WorkspaceIndex
+
+WORDS = ["value", "result", "config", "handler", "request", "buffer", "index"]
+
+
+def build_repo(root: Path, files: int, per_dir: int = 100) -> None:
+    """Create `files` Python-like files of about 4 KiB each."""
+    rng = random.Random(0)
+    for i in range(files):
+        directory = root / f"pkg_{i // 2000}" / f"mod_{i // per_dir}"
+        directory.mkdir(parents=True, exist_ok=True)
+        lines = [
+            f"def {rng.choice(WORDS)}_{j}(x):\n    return x + {rng.randint(0, 99)}\n"
+            for j in range(60)
+        ]
+        if i % 997 == 0:
+            lines.append("def parse_widget_args(argv):\n    pass\n")
+        (directory / f"file_{i}.py").write_text("".join(lines))
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "repo"
+        build_repo(root, args.files)
+        index = WorkspaceIndex(root)
+        pattern = r"parse_widget_\w+"
+
+        tool = GrepTool(root, index=index, trigram_index=False)
+        threshold = grep_module.PARALLEL_THRESHOLD
+        grep_module.PARALLEL_THRESHOLD = args.files + 1
+        serial_time, serial = timed(tool.execute, pattern)
+        grep_module.PARALLEL_THRESHOLD = threshold
+
+        timed(tool.execute, "warm up the pool")
+        parallel_time, parallel = timed(tool.execute, pattern)
+        assert parallel == serial
+
+        trigrams = TrigramIndex(root, path=Path(tmp) / "trigrams.pickle")
+        indexed = GrepTool(root, index=index, trigram_index=trigrams)
+        cold_time, cold = timed(indexed.execute, pattern)
+        warm_time, warm = timed(indexed.execute, pattern)
+        assert cold == warm == serial
+        edited = root / "pkg_0" / "mod_0" / "file_1.py"
+        edited.write_text(edited.read_text() + "parse_widget_edit = 1\n")
+        edit_time, after_edit = timed(indexed.execute, pattern)
+        assert "file_1.py" in after_edit
+
+        print(f"searched {len(index):,} files, {len(serial.splitlines())} matches")
+        print(f"single process    {serial_time * 1e3:10.1f} ms")
+        print(f"process pool      {parallel_time * 1e3:10.1f} ms")
+        print(f"trigrams (cold)   {cold_time * 1e3:10.1f} ms")
+        print(f"trigrams (warm)   {warm_time * 1e3:10.1f} ms")
+        print(f"trigrams (edit)   {edit_time * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark: CPU cost per token of rendering a streamed Markdown response.
+
+Compares the previous approach (re-parse the full response on every chunk)
+with `vecna.render.StreamingMarkdown`, on a synthetic response fed in
+token-sized chunks. Frames are drawn at a fixed token interval to mimic a
+model streaming at a steady rate into a 12 fps display.
+
+Usage:
+    python benchmarks/bench_render.py [--tokens 8000] [--frame-every 7]
+"""
+
+import argparse
+import io
+import random
+import time
+from collections.abc import Callable, Iterator
+
+from rich.console import Console
+from rich.markdown import Markdown
+
+from vecna.render import StreamingMarkdown
+
+WORDS = (
+    "the agent reads a file and returns formatted contents with line numbers "
+    "while streaming tokens into the terminal renderer for each response"
+).split()
+
+
+def synthetic_response(tokens: int, seed: int = 0) -> list[str]:
+    """Build a Markdown response split into roughly `tokens` chunks."""
+    rng = random.Random(seed)
+    chunks: list[str] = []
+    while len(chunks) < tokens:
+        kind = rng.random()
+        if kind < 0.15:
+            chunks.append(f"## Section {len(chunks)}\n\n")
+        elif kind < 0.35:
+            chunks.append("```python\n")
+            for i in range(rng.randint(3, 12)):
+                chunks.append(f"value_{i} = compute({i})")
+                chunks.append("\n")
+            chunks.append("```\n\n")
+        elif kind < 0.5:
+            for _ in range(rng.randint(2, 5)):
+                chunks.append("- ")
+                chunks.extend(f"{rng.choice(WORDS)} " for _ in range(6))
+                chunks.append("\n")
+            chunks.append("\n")
+        else:
+            chunks.extend(f"{rng.choice(WORDS)} " for _ in range(rng.randint(20, 60)))
+            chunks.append("\n\n")
+    return chunks[:tokens]
+
+
+def make_console() -> Console:
+    return Console(
+        file=io.StringIO(), width=100, force_terminal=True, color_system="truecolor"
+    )
+
+
+def run_naive(chunks: list[str], frame_every: int) -> None:
+    """The old cli loop: parse the full response on every chunk."""
+    console = make_console()
+    full_response = ""
+    markdown = Markdown("")
+    for i, chunk in enumerate(chunks, 1):
+        full_response += chunk
+        markdown = Markdown(full_response)
+        if i % frame_every == 0:
+            console.render_lines(markdown, console.options)
+    console.render_lines(markdown, console.options)
+
+
+def run_incremental(chunks: list[str], frame_every: int) -> None:
+    """The streaming renderer: only the open block is parsed per frame."""
+    console = make_console()
+    renderer = StreamingMarkdown()
+    for i, chunk in enumerate(chunks, 1):
+        renderer.feed(chunk)
+        if i % frame_every == 0:
+            console.render_lines(renderer, console.options)
+    renderer.finish()
+    console.render_lines(renderer, console.options)
+
+
+def measure(run: Callable[[list[str], int], None], *args: object) -> float:
+    """Return the CPU seconds spent in `run`."""
+    start = time.process_time()
+    run(*args)
+    return time.process_time() - start
+
+
+def iter_results(tokens: int, frame_every: int) -> Iterator[tuple[str, float]]:
+    chunks = synthetic_response(tokens)
+    for name, run in (("naive", run_naive), ("incremental", run_incremental)):
+        yield name, measure(run, chunks, frame_every)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=8000)
+    parser.add_argument("--frame-every", type=int, default=7)
+    args = parser.parse_args()
+
+    results = dict(iter_results(args.tokens, args.frame_every))
+    for name, seconds in results.items():
+        per_token = seconds / args.tokens * 1e6
+        print(f"{name:<12} {seconds:8.3f} s CPU  {per_token:10.1f} µs/token")
+    print(f"speedup      {results['naive'] / results['incremental']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark: saving and resuming a long session.
+
+Builds a session of many tool-using turns with large tool results, once
+never compacted and once with a compaction near the end (as the history
+manager would make). Times a save per turn and resuming, and for comparison
+decoding every record of the log and reading every blob it refers to, as a
+resume that replayed the whole log would.
+
+Usage:
+    python benchmarks/bench_session.py [--turns 1000] [--result-size 20000]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from vecna.session import Session
+
+
+def tool_turn(i: int, size: int) -> list[dict]:
+    result = f"result {i}\n" + "x" * size
+    return [
+        {"role": "user", "content": f"Read file_{i}.py"},
+        {
+            "role": "assistant",
+            "content": [
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_{i}",
+                    "name": "read_file",
+                    "input": {"path": f"file_{i}.py"},
+                }
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "tool_result", "tool_use_id": f"toolu_{i}", "content": result}
+            ],
+        },
+        {"role": "assistant", "content": f"file_{i}.py defines the handler."},
+    ]
+
+
+def build_session(
+    sessions_dir: Path, turns: int, result_size: int, compact: bool
+) -> tuple[Session, list[dict], float]:
+    """Save a session turn by turn; return it, its history and the save time."""
+    session = Session.create(sessions_dir)
+    messages: list[dict] = []
+    compact_at = turns * 9 // 10 if compact else turns
+    sync_time = 0.0
+    for i in range(turns):
+        messages += tool_turn(i, result_size)
+        compactions = 0
+        if i >= compact_at:
+            # Older turns replaced by a summary; recent turns kept
+            if i == compact_at:
+                messages = [{"role": "user", "content": "Summary"}, *messages[-8:]]
+            compactions = 1
+        start = time.perf_counter()
+        session.sync(messages, compactions)
+        sync_time += time.perf_counter() - start
+    return session, messages, sync_time
+
+
+def read_whole_log(session: Session) -> list[dict]:
+    """Decode every record and read every blob, without skipping any."""
+    with open(session.log_path, "rb") as f:
+        records = [json.loads(line) for line in f]
+    for record in records:
+        for message in record.get("messages", [record.get("message")]):
+            if message is None or isinstance(message["content"], str):
+                continue
+            for block in message["content"]:
+                if "content_blob" in block:
+                    blob = session.blob_dir / f"{block['content_blob']}.txt"
+                    block["content"] = blob.read_text(encoding="utf-8")
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--result-size", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for compact in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            sessions_dir = Path(tmp)
+            session, messages, sync_time = build_session(
+                sessions_dir, args.turns, args.result_size, compact
+            )
+
+            start = time.perf_counter()
+            resumed = Session.open("latest", sessions_dir).load_messages()
+            resume_time = time.perf_counter() - start
+            assert resumed == messages
+
+            start = time.perf_counter()
+            records = read_whole_log(session)
+            decode_time = time.perf_counter() - start
+
+            log_size = session.log_path.stat().st_size
+            blobs = sum(1 for _ in session.blob_dir.iterdir())
+            kind = "compacted" if compact else "never compacted"
+            print(f"{args.turns} turns, {kind}: {len(records)} records, {blobs} blobs")
+            print(f"  log size          {log_size / 1e6:10.2f} MB")
+            print(f"  save per turn     {sync_time / args.turns * 1e3:10.3f} ms")
+            print(f"  resume            {resume_time * 1e3:10.1f} ms")
+            print(f"  read whole log    {decode_time * 1e3:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark: CLI cold-start latency.
+
+Runs each command in a fresh interpreter several times and reports the best
+wall time and its overhead over a bare interpreter, then breaks the import
+cost of `vecna.cli` down with `python -X importtime`. With --max-ms the
+script exits non-zero when the fast path (`vecna --version`) costs more than
+the threshold over the bare interpreter, so it can guard against an eager
+import sneaking back in.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--top 15] [--max-ms 50]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+COMMANDS = {
+    "python (baseline)": ["-c", "pass"],
+    "vecna --version": ["-m", "vecna.cli", "--version"],
+    "vecna --help": ["-m", "vecna.cli", "--help"],
+    "import vecna.agent": ["-c", "import vecna.agent"],
+    "import vecna.render": ["-c", "import vecna.render"],
+}
+
+
+def best_wall_time(args: list[str], runs: int) -> float:
+    """Return the fastest of several runs of the interpreter with `args`."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            check=True,
+            capture_output=True,
+            stdin=subprocess.DEVNULL,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(module: str) -> list[tuple[int, int, str]]:
+    """Return (self us, cumulative us, name) for each module `module` loads."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    times = {}
+    for label, command in COMMANDS.items():
+        times[label] = best_wall_time(command, args.runs)
+        overhead = times[label] - times["python (baseline)"]
+        print(f"{label:<22} {times[label] * 1e3:8.1f} ms  (+{overhead * 1e3:.1f} ms)")
+
+    rows = import_times("vecna.cli")
+    total_ms = sum(self_us for self_us, _, _ in rows) / 1e3
+    print(f"\nimport vecna.cli: {len(rows)} modules, {total_ms:.1f} ms")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: -r[1])[: args.top]:
+        print(f"  {cumulative_us / 1e3:8.2f} ms  {self_us / 1e3:8.2f} ms  {name}")
+
+    if args.max_ms is not None:
+        baseline = times["python (baseline)"]
+        fast_path_ms = (times["vecna --version"] - baseline) * 1e3
+        if fast_path_ms > args.max_ms:
+            sys.exit(f"vecna --version added {fast_path_ms:.1f} ms > {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: tool definitions and argument validation per dispatch.
+
+Compares building the tool list for every request, as the registry used to,
+with the list frozen at registration, and measures what validating the
+arguments of a call adds to dispatching it.
+
+Usage:
+    python benchmarks/bench_tool_dispatch.py [--calls 100000]
+"""
+
+import argparse
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from vecna.tools import tool_to_anthropic_format
+from vecna.tools.defaults import default_tools
+
+
+def time_per_call(func: Callable[[], object], calls: int) -> float:
+    """Return the best mean seconds per call over three runs."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "a.txt").write_text("alpha\n")
+        registry = default_tools(root)
+        tools = [registry.get(name) for name in registry.list_tools()]
+        arguments = {"path": "a.txt", "offset": 1, "limit": 100}
+        read_file = registry.get("read_file")
+
+        rebuilt = time_per_call(
+            lambda: [tool_to_anthropic_format(tool) for tool in tools], args.calls
+        )
+        frozen = time_per_call(registry.to_anthropic_format, args.calls)
+        validate = time_per_call(
+            lambda: registry.validate("read_file", arguments), args.calls
+        )
+        direct = time_per_call(lambda: read_file.execute(**arguments), args.calls)
+        dispatch = time_per_call(
+            lambda: registry.execute("read_file", arguments), args.calls
+        )
+
+    print(f"tool list, rebuilt     {rebuilt * 1e6:8.2f} µs/request")
+    print(f"tool list, frozen      {frozen * 1e6:8.2f} µs/request")
+    print(f"validate arguments     {validate * 1e6:8.2f} µs/call")
+    print(f"read_file, direct      {direct * 1e6:8.2f} µs/call")
+    print(f"read_file, registry    {dispatch * 1e6:8.2f} µs/call")
+    print(f"dispatch overhead      {(dispatch - direct) * 1e6:8.2f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: validate_path against the caching PathResolver.
+
+Builds a deep directory tree and validates every file in it several times,
+the way a turn that touches many paths would.
+
+Usage:
+    python benchmarks/bench_validate_path.py [--depth 20] [--files 500]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from vecna.tools.path_resolver import PathResolver
+from vecna.tools.utils import validate_path
+
+
+def build_tree(root: Path, depth: int, files: int) -> list[str]:
+    """Create `files` files spread over a directory chain `depth` levels deep."""
+    directory = root
+    levels = []
+    for i in range(depth):
+        directory = directory / f"level_{i}"
+        levels.append(directory)
+    directory.mkdir(parents=True)
+
+    paths = []
+    for i in range(files):
+        path = levels[i % depth] / f"file_{i}.py"
+        path.write_text("x = 1\n")
+        paths.append(str(path.relative_to(root)))
+    return paths
+
+
+def time_per_call(func, paths: list[str], rounds: int) -> float:
+    """Return the mean seconds per call of func over all paths."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for path in paths:
+            func(path)
+    return (time.perf_counter() - start) / (rounds * len(paths))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=20)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        paths = build_tree(root, args.depth, args.files)
+        resolver = PathResolver(root)
+
+        uncached = time_per_call(lambda p: validate_path(p, root), paths, args.rounds)
+        cached = time_per_call(resolver.resolve, paths, args.rounds)
+
+    print(f"validate_path  {uncached * 1e6:8.2f} µs/call")
+    print(f"PathResolver   {cached * 1e6:8.2f} µs/call")
+    print(f"speedup        {uncached / cached:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark: building and querying the workspace index.
+
+Creates a synthetic repository (with a .gitignore) and measures the initial
+parallel walk, a no-op refresh and glob queries against the path table. The
+queries are timed twice: within the refresh interval, and with the interval
+expired before every query, which is what a query sees after the agent spent
+a few seconds on something else. Both are measured for a watched index
+(inotify) and a polled one.
+
+Usage:
+    python benchmarks/bench_workspace_index.py [--files 50000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from vecna.tools.workspace_index import DEFAULT_REFRESH_INTERVAL, WorkspaceIndex
+
+PATTERNS = ("pkg_1/**/*.py", "**/file_5.md", "pkg_0/mod_3/*/*.txt")
+
+
+def build_repo(root: Path, files: int, per_dir: int = 50) -> None:
+    """Create `files` empty files spread over nested package directories."""
+    (root / ".gitignore").write_text("*.pyc\nnode_modules/\n")
+    for i in range(0, files, per_dir):
+        directory = root / f"pkg_{i // 5000}" / f"mod_{i // 500}" / f"sub_{i}"
+        directory.mkdir(parents=True)
+        for j in range(per_dir):
+            suffix = (".py", ".md", ".pyc", ".txt")[j % 4]
+            (directory / f"file_{j}{suffix}").touch()
+
+
+def timed(func, *args, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        build_repo(root, args.files)
+
+        for watch in (True, False):
+            index = WorkspaceIndex(root, watch=watch)
+            build_time, _ = timed(index.build)
+            refresh_time, _ = timed(index.refresh)
+            print(f"\n{'watched' if index.watching else 'polled'} index")
+            print(f"indexed {len(index):,} files")
+            print(f"build             {build_time * 1e3:10.1f} ms")
+            print(f"refresh (no-op)   {refresh_time * 1e3:10.1f} ms")
+
+            for interval in (DEFAULT_REFRESH_INTERVAL, 0):
+                index.refresh_interval = interval
+                label = "fresh" if interval else "stale"
+                for pattern in PATTERNS:
+                    seconds, matches = timed(index.glob, pattern, repeat=5)
+                    print(
+                        f"glob ({label}) {pattern:<22} {seconds * 1e3:7.2f} ms  "
+                        f"({len(matches)} hits)"
+                    )
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""Benchmark suite: tools, dispatch and rendering, with baseline comparison.
+
+Each case times one operation over many repetitions and records the best and
+median time per operation, and how much the repeats spread around the median.
+Results are written as JSON; when a baseline file exists, every case is
+compared with it and the run fails if any case's median got slower than the
+baseline's by more than the threshold and by more than the two runs' noise.
+
+Timings depend on the machine, so a baseline is only meaningful for runs on
+the machine that recorded it. Record one with --save-baseline before making
+a change, then run the suite again afterwards.
+
+Usage:
+    python benchmarks/suite.py [--filter render] [--quick]
+        [--output results.json] [--baseline benchmarks/baseline.json]
+        [--threshold 0.25] [--save-baseline]
+
+A change that adds or renames a case should save a new baseline with it.
+"""
+
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+from anthropic import Anthropic
+from bench_render import synthetic_response
+from bench_validate_path import build_tree
+from bench_workspace_index import build_repo
+from rich.console import Console
+
+from vecna.agent import Agent
+from vecna.render import StreamingMarkdown, stream_markdown
+from vecna.replay import RecordingTransport, ReplayTransport
+from vecna.tools import ToolRegistry
+from vecna.tools.defaults import default_tools
+from vecna.tools.echo import EchoTool
+from vecna.tools.file_cache import FileCache
+from vecna.tools.file_read import FileReadTool
+from vecna.tools.path_resolver import PathResolver
+from vecna.tools.read_files import ReadFilesTool
+from vecna.tools.utils import format_file_contents, validate_path
+from vecna.tools.workspace_index import WorkspaceIndex
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# A slowdown only counts as a regression if it is larger than this many times
+# the noise of both runs (the median absolute deviation of their repeats)
+NOISE_FACTOR = 3.0
+
+# A case's setup returns the operation to time; the stack owns its resources
+type Setup = Callable[[ExitStack, float], Callable[[], object]]
+
+
+@dataclass
+class Case:
+    """One benchmark: a named setup and how often to run its operation."""
+
+    name: str
+    setup: Setup
+    number: int
+    repeat: int = 11
+
+
+def _tmp_dir(stack: ExitStack) -> Path:
+    return Path(stack.enter_context(tempfile.TemporaryDirectory())).resolve()
+
+
+def _console() -> Console:
+    return Console(
+        file=io.StringIO(), width=100, force_terminal=True, color_system="truecolor"
+    )
+
+
+def _source_lines(count: int, width: int = 80) -> list[str]:
+    line = ("value = compute(alpha, beta, gamma) + " * 4)[:width]
+    return [f"{line} # {i}" for i in range(count)]
+
+
+def format_large(stack: ExitStack, scale: float) -> Callable[[], object]:
+    text = "\n".join(_source_lines(int(20_000 * scale)))
+    return lambda: format_file_contents("big.py", text, max_lines=20_000)
+
+
+def format_minified(stack: ExitStack, scale: float) -> Callable[[], object]:
+    # A few very long lines, like minified JavaScript
+    text = "\n".join("x" * 200_000 for _ in range(max(int(10 * scale), 1)))
+    return lambda: format_file_contents("bundle.min.js", text)
+
+
+def _deep_paths(stack: ExitStack, scale: float) -> tuple[Path, list[str]]:
+    root = _tmp_dir(stack)
+    return root, build_tree(root, depth=20, files=max(int(200 * scale), 20))
+
+
+def validate_deep(stack: ExitStack, scale: float) -> Callable[[], object]:
+    root, paths = _deep_paths(stack, scale)
+    return lambda: [validate_path(path, root) for path in paths]
+
+
+def resolve_deep(stack: ExitStack, scale: float) -> Callable[[], object]:
+    root, paths = _deep_paths(stack, scale)
+    resolver = PathResolver(root)
+    return lambda: [resolver.resolve(path) for path in paths]
+
+
+def dispatch_execute(stack: ExitStack, scale: float) -> Callable[[], object]:
+    registry = ToolRegistry()
+    registry.register(EchoTool())
+    return lambda: registry.execute("echo", {"message": "hello"})
+
+
+def dispatch_invalid(stack: ExitStack, scale: float) -> Callable[[], object]:
+    registry = ToolRegistry()
+    registry.register(EchoTool())
+    return lambda: registry.execute("echo", {"message": 1, "extra": True})
+
+
+def tool_definitions(stack: ExitStack, scale: float) -> Callable[[], object]:
+    registry = default_tools(_tmp_dir(stack))
+    return registry.to_anthropic_format
+
+
+def dispatch_execute_many(stack: ExitStack, scale: float) -> Callable[[], object]:
+    registry = ToolRegistry()
+    registry.register(EchoTool())
+    calls = [(str(i), "echo", {"message": "hello"}) for i in range(8)]
+    return lambda: registry.execute_many(calls)
+
+
+def _file_tool(stack: ExitStack, lines: int, cache: FileCache) -> FileReadTool:
+    root = _tmp_dir(stack)
+    (root / "file.py").write_text("\n".join(_source_lines(lines)) + "\n")
+    return FileReadTool(working_dir=root, cache=cache)
+
+
+def read_small_cold(stack: ExitStack, scale: float) -> Callable[[], object]:
+    cache = FileCache()
+    tool = _file_tool(stack, 200, cache)
+
+    def run() -> object:
+        cache.invalidate()
+        return tool.execute("file.py")
+
+    return run
+
+
+def read_small_cached(stack: ExitStack, scale: float) -> Callable[[], object]:
+    tool = _file_tool(stack, 200, FileCache())
+    return lambda: tool.execute("file.py")
+
+
+def read_big_window(stack: ExitStack, scale: float) -> Callable[[], object]:
+    cache = FileCache()
+    tool = _file_tool(stack, int(200_000 * scale), cache)
+
+    def run() -> object:
+        cache.invalidate()
+        return tool.execute("file.py", offset=int(100_000 * scale), limit=500)
+
+    return run
+
+
+def read_huge_binary(stack: ExitStack, scale: float) -> Callable[[], object]:
+    cache = FileCache()
+    root = _tmp_dir(stack)
+    with (root / "backup.tar.gz").open("wb") as f:
+        f.write(b"\x1f\x8b\x08\x00")
+        f.truncate(int(2 * 1024**3 * scale))  # Sparse
+    tool = FileReadTool(working_dir=root, cache=cache)
+
+    def run() -> object:
+        cache.invalidate()
+        return tool.execute("backup.tar.gz")
+
+    return run
+
+
+def _many_files(stack: ExitStack, count: int) -> Path:
+    root = _tmp_dir(stack)
+    for i in range(count):
+        (root / f"file{i}.py").write_text("\n".join(_source_lines(200)) + "\n")
+    return root
+
+
+def read_many_one_by_one(stack: ExitStack, scale: float) -> Callable[[], object]:
+    cache = FileCache()
+    tool = FileReadTool(working_dir=_many_files(stack, 20), cache=cache)
+
+    def run() -> object:
+        cache.invalidate()
+        return [tool.execute(f"file{i}.py") for i in range(20)]
+
+    return run
+
+
+def read_many_at_once(stack: ExitStack, scale: float) -> Callable[[], object]:
+    cache = FileCache()
+    tool = ReadFilesTool(working_dir=_many_files(stack, 20), cache=cache)
+
+    def run() -> object:
+        cache.invalidate()
+        return tool.execute(["*.py"])
+
+    return run
+
+
+def glob_stale(stack: ExitStack, scale: float) -> Callable[[], object]:
+    """A glob query after the refresh interval expired, as between turns."""
+    root = _tmp_dir(stack)
+    build_repo(root, int(20_000 * scale))
+    index = WorkspaceIndex(root, refresh_interval=0)
+    stack.callback(index.close)
+    return lambda: index.glob("**/file_5.md")
+
+
+def render_stream(stack: ExitStack, scale: float) -> Callable[[], object]:
+    """The CLI render loop, drawing a frame for every chunk (worst case)."""
+    chunks = synthetic_response(int(2000 * scale))
+    return lambda: stream_markdown(iter(chunks), _console(), refresh_per_second=1e9)
+
+
+def render_paced(stack: ExitStack, scale: float) -> Callable[[], object]:
+    """Incremental rendering with a frame every 7 tokens, as at ~12 fps."""
+    chunks = synthetic_response(int(2000 * scale))
+
+    def run() -> object:
+        console = _console()
+        renderer = StreamingMarkdown()
+        for i, chunk in enumerate(chunks, 1):
+            renderer.feed(chunk)
+            if i % 7 == 0:
+                console.render_lines(renderer, console.options)
+        renderer.finish()
+        return console.render_lines(renderer, console.options)
+
+    return run
+
+
+def _sse_reply(chunks: list[str]) -> bytes:
+    """Encode a streamed text reply as Messages API server-sent events."""
+    usage = {"input_tokens": 100, "output_tokens": len(chunks)}
+    message = {
+        "id": "msg_bench",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-bench",
+        "content": [],
+        "stop_reason": None,
+        "stop_sequence": None,
+        "usage": usage,
+    }
+    text_block = {"type": "text", "text": ""}
+    events = [
+        ("message_start", {"type": "message_start", "message": message}),
+        ("content_block_start", {"index": 0, "content_block": text_block}),
+        *(
+            (
+                "content_block_delta",
+                {"index": 0, "delta": {"type": "text_delta", "text": chunk}},
+            )
+            for chunk in chunks
+        ),
+        ("content_block_stop", {"index": 0}),
+        ("message_delta", {"delta": {"stop_reason": "end_turn"}, "usage": usage}),
+        ("message_stop", {}),
+    ]
+    return b"".join(
+        f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n".encode()
+        for name, data in events
+    )
+
+
+def agent_replay(stack: ExitStack, scale: float) -> Callable[[], object]:
+    """A full streamed turn: SDK parsing, the agent loop and the CLI renderer.
+
+    The reply is recorded once against a local stand-in for the API, then
+    replayed as fast as possible, so no network is involved.
+    """
+    cassette = _tmp_dir(stack) / "cassette.jsonl"
+    body = _sse_reply(synthetic_response(int(2000 * scale)))
+    upstream = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=body
+        )
+    )
+
+    def turn(transport: httpx.BaseTransport) -> str:
+        client = Anthropic(
+            api_key="bench", http_client=httpx.Client(transport=transport)
+        )
+        agent = Agent(client=client)
+        return stream_markdown(agent.chat_stream("Go"), _console())
+
+    turn(RecordingTransport(cassette, transport=upstream))
+    return lambda: turn(ReplayTransport(cassette))
+
+
+CASES = [
+    Case("format_file_contents.large", format_large, number=5),
+    Case("format_file_contents.minified", format_minified, number=20),
+    Case("validate_path.deep", validate_deep, number=5),
+    Case("path_resolver.deep", resolve_deep, number=20),
+    Case("registry.execute", dispatch_execute, number=20_000),
+    Case("registry.execute_invalid", dispatch_invalid, number=20_000),
+    Case("registry.execute_many", dispatch_execute_many, number=200),
+    Case("registry.tool_definitions", tool_definitions, number=20_000),
+    Case("file_read.small_cold", read_small_cold, number=500),
+    Case("file_read.small_cached", read_small_cached, number=5_000),
+    Case("file_read.big_window", read_big_window, number=50),
+    Case("file_read.huge_binary", read_huge_binary, number=500),
+    Case("file_read.many_cold", read_many_one_by_one, number=50),
+    Case("read_files.many_cold", read_many_at_once, number=50),
+    Case("workspace_index.glob_stale", glob_stale, number=200),
+    Case("render.stream_markdown", render_stream, number=1, repeat=5),
+    Case("render.paced_frames", render_paced, number=1, repeat=5),
+    Case("agent.replay_turn", agent_replay, number=1, repeat=5),
+]
+
+
+def run_case(case: Case, scale: float) -> dict[str, float | int]:
+    """Time a case and return its per-operation statistics in microseconds."""
+    number = max(int(case.number * scale), 1)
+    with ExitStack() as stack:
+        operation = case.setup(stack, scale)
+        operation()  # Warm up caches and lazy imports
+        samples = []
+        for _ in range(case.repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                operation()
+            samples.append((time.perf_counter() - start) / number * 1e6)
+    median = statistics.median(samples)
+    return {
+        "best_us": round(min(samples), 3),
+        "median_us": round(median, 3),
+        "mad_us": round(statistics.median(abs(s - median) for s in samples), 3),
+        "number": number,
+        "repeat": case.repeat,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], threshold: float
+) -> Iterator[tuple[str, float, bool]]:
+    """Yield (case, ratio to baseline, regressed) for cases in both runs.
+
+    Medians are compared: the best of a few repeats depends on one lucky
+    run, so comparing it flags cases at random. A case regressed if its
+    median grew by more than `threshold` and by more than `NOISE_FACTOR`
+    times the runs' combined noise, so cases that vary a lot on this machine
+    need a larger slowdown to fail.
+    """
+    for name, stats in results.items():
+        if name in baseline:
+            before = baseline[name]
+            slowdown = stats["median_us"] - before["median_us"]
+            noise = stats["mad_us"] + before.get("mad_us", 0.0)
+            ratio = stats["median_us"] / before["median_us"]
+            regressed = ratio > 1 + threshold and slowdown > NOISE_FACTOR * noise
+            yield name, ratio, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="Only run matching cases")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store results as baseline"
+    )
+    args = parser.parse_args()
+    scale = 0.1 if args.quick else 1.0
+
+    results = {}
+    for case in CASES:
+        if args.filter in case.name:
+            results[case.name] = stats = run_case(case, scale)
+            print(
+                f"{case.name:<32} {stats['median_us']:12.2f} µs  "
+                f"(± {stats['mad_us']:.2f}, best {stats['best_us']:.2f})"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.node(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        return
+
+    stored = json.loads(args.baseline.read_text())
+    if stored["meta"].get("quick") != args.quick:
+        print("\nbaseline was recorded with a different --quick setting; skipped")
+        return
+    print(f"\ncompared with {args.baseline} ({stored['meta'].get('commit')}):")
+    regressions = []
+    for name, ratio, regressed in compare(results, stored["results"], args.threshold):
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<32} {ratio:8.2f}x{flag}")
+        if regressed:
+            regressions.append(name)
+    if regressions:
+        sys.exit(
+            f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}"
+        )
+    # A case without a baseline is never checked, so that must not go unnoticed
+    missing = [name for name in results if name not in stored["results"]]
+    if missing:
+        sys.exit(f"no baseline for {', '.join(missing)}; save a new one")
+
+
+if __name__ == "__main__":
+    main()
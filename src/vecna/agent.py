@@ -1,32 +1,144 @@
 """Agent - Core logic for interacting with Claude."""
 
+import asyncio
 import os
+import threading
+from collections.abc import AsyncIterator, Iterator
+from typing import TYPE_CHECKING, Any
 
-from vecna.prompts import SYSTEM_PROMPT
-from vecna.utils import get_client
+from vecna.history import DEFAULT_HISTORY_BUDGET, HistoryManager
+from vecna.prompt_cache import (
+    add_usage,
+    cached_messages,
+    cached_system,
+    cached_tools,
+    empty_usage,
+)
+from vecna.prompts import SUMMARY_PROMPT, SYSTEM_PROMPT
+from vecna.session import Session
+from vecna.stats import StatsRecorder
+from vecna.tools import ToolCall, ToolRegistry
+from vecna.utils import get_async_client, get_client, load_env
 
+if TYPE_CHECKING:
+    # The SDK is imported by the client factories on first use
+    from anthropic import Anthropic, AsyncAnthropic
+
+# Ends the assistant message of a turn that was cancelled, so the model knows
+# on the next turn that its reply was cut short
+INTERRUPTED_NOTE = "[Interrupted by the user]"
+
+
+def _block_to_param(block: Any) -> dict[str, Any]:
+    """Convert a response content block to a request content block."""
+    if block.type == "text":
+        return {"type": "text", "text": block.text}
+    if block.type == "tool_use":
+        return {
+            "type": "tool_use",
+            "id": block.id,
+            "name": block.name,
+            "input": block.input,
+        }
+    return block.model_dump(exclude_none=True)
 
-class Agent:
-    """The main agent that handles conversations with Claude."""
 
-    def __init__(self) -> None:
-        """Initialize the agent."""
-        self.client = get_client()
+class BaseAgent:
+    """Conversation state and settings shared by the sync and async agents."""
+
+    def __init__(
+        self, tools: ToolRegistry | None = None, session: Session | None = None
+    ) -> None:
+        """Initialize the conversation settings.
+
+        Args:
+            tools: Tools the model may call (optional).
+            session: A session log to resume from and save each turn to
+                (optional).
+        """
+        load_env()
         self.model = os.environ.get("VECNA_MODEL", "claude-sonnet-4-5-20250929")
         self.max_tokens = os.environ.get("VECNA_MAX_TOKENS", 1024)
         self.messages: list[dict] = []
+        self.tools = tools
+        self.prompt_cache = os.environ.get("VECNA_PROMPT_CACHE", "1") != "0"
+        # Token usage of the latest turn, summed over its API calls
+        self.last_usage = empty_usage()
+        self.history = HistoryManager(
+            max_tokens=int(
+                os.environ.get("VECNA_HISTORY_BUDGET", DEFAULT_HISTORY_BUDGET)
+            ),
+            on_compact=self._forget_tool_results,
+        )
+        # Per-turn latency, throughput and tool timings
+        self.stats = StatsRecorder(trace_file=os.environ.get("VECNA_TRACE_FILE"))
+        self.session = session
+        if session is not None:
+            self.messages = session.load_messages()
+        # Set by cancel(), cleared when a turn starts
+        self._cancelled = threading.Event()
+        # The API stream being read, while there is one
+        self._stream: Any = None
 
-    def chat(self, user_message: str) -> str:
-        """Send a message and get a response.
+    @property
+    def cancelled(self) -> bool:
+        """Whether the current (or last) turn was cancelled."""
+        return self._cancelled.is_set()
 
-        Args:
-            user_message: The user's input.
+    def cancel(self) -> None:
+        """Stop the reply being streamed; safe to call from any thread.
 
-        Returns:
-            The assistant's response text.
+        The connection of the stream is shut down instead of read to the end,
+        so the API stops generating (and billing) output for it. Tools the
+        turn runs in a worker pool are stopped too. The turn's `chat_stream`
+        then ends early, with the history kept consistent as described in
+        `_cancel_turn`.
         """
+        self._cancelled.set()
+        stream = self._stream
+        if stream is not None:
+            from vecna.transport import interrupt
 
-        # Add user message to history
+            interrupt(stream.response)
+
+    def _summary_params(self, transcript: str) -> dict[str, Any]:
+        """Build the keyword arguments for a history summary request."""
+        return {
+            "model": self.model,
+            "max_tokens": 2048,
+            "system": SUMMARY_PROMPT,
+            "messages": [{"role": "user", "content": transcript}],
+        }
+
+    def _request_params(self, max_tokens: int) -> dict[str, Any]:
+        """Build the keyword arguments for a Messages API call."""
+        tools = []
+        if self.tools is not None:
+            tools = self.tools.to_anthropic_format()
+
+        if self.prompt_cache:
+            system = cached_system(SYSTEM_PROMPT)
+            tools = cached_tools(tools)
+            messages = cached_messages(self.messages)
+        else:
+            system = SYSTEM_PROMPT
+            messages = self.messages
+
+        params: dict[str, Any] = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": system,
+            "messages": messages,
+        }
+        if tools:
+            params["tools"] = tools
+        return params
+
+    def _add_user_message(self, user_message: str) -> None:
+        """Add a user message to history, starting a new turn."""
+        self.last_usage = empty_usage()
+        self._cancelled.clear()
+        self.stats.start_turn()
         self.messages.append(
             {
                 "role": "user",
@@ -34,56 +146,378 @@ class Agent:
             }
         )
 
-        # Call the API
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=int(self.max_tokens),
-            system=SYSTEM_PROMPT,
-            messages=self.messages,
+    def _add_assistant_message(self, assistant_message: str) -> None:
+        """Add an assistant message to history."""
+        self.messages.append(
+            {
+                "role": "assistant",
+                "content": assistant_message,
+            }
         )
 
-        # Extract the response text
-        assistant_message = response.content[0].text
+    def _add_response(self, response: Any) -> list[ToolCall]:
+        """Add a model response to history and count its token usage.
+
+        Args:
+            response: The API response message.
 
-        # Add assistant message to history
+        Returns:
+            The tool calls the response asked for (empty when it is final).
+        """
+        add_usage(self.last_usage, response.usage)
+        content = response.content
+        tool_calls = [
+            (block.id, block.name, block.input)
+            for block in content
+            if block.type == "tool_use"
+        ]
+        if tool_calls:
+            self.messages.append(
+                {
+                    "role": "assistant",
+                    "content": [_block_to_param(block) for block in content],
+                }
+            )
+        else:
+            self._add_assistant_message(
+                "".join(block.text for block in content if block.type == "text")
+            )
+        return tool_calls
+
+    def _end_turn(self) -> None:
+        """Save the finished turn and publish its stats."""
+        if self.session is not None:
+            self.session.sync(self.messages, len(self.history.compactions))
+        self.stats.end_turn(self.last_usage)
+
+    def _cancel_turn(self, prompt: dict[str, Any], partial: str) -> None:
+        """Leave the history consistent after the turn was cut short.
+
+        What the turn finished is kept: tool calls that ran, with their
+        results, and the text streamed so far, which becomes an assistant
+        message ending in `INTERRUPTED_NOTE`. Tool calls whose results never
+        came are dropped, keeping only their text. If nothing came of the turn
+        its prompt is removed as well, as if it had never been sent.
+
+        Args:
+            prompt: The user message that started the turn.
+            partial: The text streamed by the API call that was interrupted.
+        """
+        last = self.messages[-1] if self.messages else None
+        if (
+            last is not None
+            and last["role"] == "assistant"
+            and not isinstance(last["content"], str)
+        ):
+            # A response with tool calls, waiting for their results
+            self.messages.pop()
+            texts = [b["text"] for b in last["content"] if b["type"] == "text"]
+            partial = "".join(texts) + partial
+        text = partial.strip()
+        if text or not self.messages or self.messages[-1] is not prompt:
+            self._add_assistant_message(
+                f"{text}\n\n{INTERRUPTED_NOTE}" if text else INTERRUPTED_NOTE
+            )
+        else:
+            self.messages.pop()
+        if self.stats.current is not None:
+            self.stats.current.cancelled = True
+        # Results of the tool calls dropped above never reached the model
+        self._forget_tool_results()
+        self._end_turn()
+
+    def _forget_tool_results(self) -> None:
+        """Let the tools know earlier results may have left the history."""
+        if self.tools is not None:
+            self.tools.forget_results()
+
+    def _add_tool_results(self, results: list[tuple[str, str]]) -> None:
+        """Add tool results to history as a user message."""
         self.messages.append(
             {
-                "role": "assistant",
-                "content": assistant_message,
+                "role": "user",
+                "content": [
+                    {"type": "tool_result", "tool_use_id": call_id, "content": result}
+                    for call_id, result in results
+                ],
             }
         )
 
-        return assistant_message
 
-    def chat_stream(self, user_message: str) -> str:
+class Agent(BaseAgent):
+    """The main agent that handles conversations with Claude."""
+
+    def __init__(
+        self,
+        client: "Anthropic | None" = None,
+        tools: ToolRegistry | None = None,
+        session: Session | None = None,
+    ) -> None:
+        """Initialize the agent.
+
+        Args:
+            client: The Anthropic client to use (defaults to `get_client()`).
+            tools: Tools the model may call (optional).
+            session: A session log to resume from and save to (optional).
+        """
+        super().__init__(tools, session)
+        self.client = client or get_client()
+        if os.environ.get("VECNA_EXACT_TOKEN_COUNT") == "1":
+            self.history.count_tokens = self._count_tokens
+
+    def _count_tokens(self, messages: list[dict]) -> int:
+        """Count the exact input tokens of messages with the API."""
+        params = self._request_params(int(self.max_tokens))
+        params.pop("max_tokens")
+        params["messages"] = messages
+        return self.client.messages.count_tokens(**params).input_tokens
+
+    def _summarize(self, transcript: str) -> str:
+        """Summarize old history with the model."""
+        response = self.client.messages.create(**self._summary_params(transcript))
+        return "".join(b.text for b in response.content if b.type == "text")
+
+    def chat(self, user_message: str) -> str:
+        """Send a message and get a response.
+
+        Tool calls requested by the model are executed and their results
+        sent back until the model produces a final answer.
+
+        Args:
+            user_message: The user's input.
+
+        Returns:
+            The assistant's response text.
+        """
+
+        # Add user message to history
+        self._add_user_message(user_message)
+
+        texts: list[str] = []
+        while True:
+            # Keep the history within its token budget
+            self.history.compact(self.messages, self._summarize)
+
+            # Call the API
+            self.stats.start_call()
+            response = self.client.messages.create(
+                **self._request_params(int(self.max_tokens))
+            )
+            self.stats.end_call()
+
+            # Extract the response text
+            texts.extend(b.text for b in response.content if b.type == "text")
+
+            # Add assistant message to history, running any requested tools
+            tool_calls = self._add_response(response)
+            if not tool_calls:
+                break
+            self._add_tool_results(
+                self.tools.execute_many(
+                    tool_calls, self.stats.record_tool, self._cancelled
+                )
+            )
+
+        self._end_turn()
+        return "\n\n".join(texts)
+
+    def chat_stream(self, user_message: str) -> Iterator[str]:
         """Send a message and stream the response.
 
+        The turn stops early when `cancel()` is called, or when the generator
+        is closed or interrupted (e.g. by Ctrl+C) before it is exhausted.
+
         Args:
             user_message: The user's input.
 
         Yields:
             Chunks of the response text as they arrive.
         """
-        self.messages.append(
-            {
-                "role": "user",
-                "content": user_message,
-            }
-        )
+        self._add_user_message(user_message)
+        prompt = self.messages[-1]
+
+        # Text of the API call in progress, kept if the turn is cancelled
+        partial: list[str] = []
+        streamed_text = False
+        completed = False
+        try:
+            while not self.cancelled:
+                self.history.compact(self.messages, self._summarize)
+
+                # Use streaming API
+                self.stats.start_call()
+                with self.client.messages.stream(
+                    **self._request_params(8096)
+                ) as stream:
+                    self._stream = stream
+                    for text in stream.text_stream:
+                        if text:
+                            self.stats.first_token()
+                            streamed_text = True
+                        partial.append(text)
+                        yield text
+                        if self.cancelled:
+                            break
+                    if self.cancelled:
+                        break
+                    response = stream.get_final_message()
+                self._stream = None
+                self.stats.end_call()
+                partial.clear()
+
+                # Add complete response to history
+                tool_calls = self._add_response(response)
+                if not tool_calls:
+                    completed = True
+                    break
+                self._add_tool_results(
+                    self.tools.execute_many(
+                        tool_calls, self.stats.record_tool, self._cancelled
+                    )
+                )
+                if streamed_text:
+                    yield "\n\n"
+                    streamed_text = False
+        except (GeneratorExit, KeyboardInterrupt):
+            self._cancel_turn(prompt, "".join(partial))
+            raise
+        except Exception:
+            # Reading a stream shut down by cancel() fails
+            if not self.cancelled:
+                raise
+        finally:
+            self._stream = None
+
+        if completed:
+            self._end_turn()
+        else:
+            self._cancel_turn(prompt, "".join(partial))
+
+
+class AsyncAgent(BaseAgent):
+    """An agent built on the async client.
+
+    Network round trips are awaited instead of blocking the thread, so the
+    UI, tool execution and several sessions can share one event loop.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncAnthropic | None" = None,
+        tools: ToolRegistry | None = None,
+        session: Session | None = None,
+    ) -> None:
+        """Initialize the agent.
+
+        Args:
+            client: The async client to use (defaults to `get_async_client()`).
+            tools: Tools the model may call (optional).
+            session: A session log to resume from and save to (optional).
+        """
+        super().__init__(tools, session)
+        self.client = client or get_async_client()
+
+    async def _summarize(self, transcript: str) -> str:
+        """Summarize old history with the model."""
+        response = await self.client.messages.create(**self._summary_params(transcript))
+        return "".join(b.text for b in response.content if b.type == "text")
+
+    async def chat(self, user_message: str) -> str:
+        """Send a message and get a response.
+
+        Args:
+            user_message: The user's input.
+
+        Returns:
+            The assistant's response text.
+        """
+        self._add_user_message(user_message)
+
+        texts: list[str] = []
+        while True:
+            await self.history.acompact(self.messages, self._summarize)
+            self.stats.start_call()
+            response = await self.client.messages.create(
+                **self._request_params(int(self.max_tokens))
+            )
+            self.stats.end_call()
+            texts.extend(b.text for b in response.content if b.type == "text")
+
+            tool_calls = self._add_response(response)
+            if not tool_calls:
+                break
+            self._add_tool_results(
+                await self.tools.aexecute_many(
+                    tool_calls, self.stats.record_tool, self._cancelled
+                )
+            )
+
+        self._end_turn()
+        return "\n\n".join(texts)
+
+    async def chat_stream(self, user_message: str) -> AsyncIterator[str]:
+        """Send a message and stream the response.
+
+        The turn stops early when `cancel()` is called, or when the generator
+        is closed or its task cancelled before it is exhausted.
+
+        Args:
+            user_message: The user's input.
+
+        Yields:
+            Chunks of the response text as they arrive.
+        """
+        self._add_user_message(user_message)
+        prompt = self.messages[-1]
+
+        partial: list[str] = []
+        streamed_text = False
+        completed = False
+        try:
+            while not self.cancelled:
+                await self.history.acompact(self.messages, self._summarize)
+                self.stats.start_call()
+                async with self.client.messages.stream(
+                    **self._request_params(8096)
+                ) as stream:
+                    self._stream = stream
+                    async for text in stream.text_stream:
+                        if text:
+                            self.stats.first_token()
+                            streamed_text = True
+                        partial.append(text)
+                        yield text
+                        if self.cancelled:
+                            break
+                    if self.cancelled:
+                        break
+                    response = await stream.get_final_message()
+                self._stream = None
+                self.stats.end_call()
+                partial.clear()
+
+                tool_calls = self._add_response(response)
+                if not tool_calls:
+                    completed = True
+                    break
+                self._add_tool_results(
+                    await self.tools.aexecute_many(
+                        tool_calls, self.stats.record_tool, self._cancelled
+                    )
+                )
+                if streamed_text:
+                    yield "\n\n"
+                    streamed_text = False
+        except (GeneratorExit, KeyboardInterrupt, asyncio.CancelledError):
+            self._cancel_turn(prompt, "".join(partial))
+            raise
+        except Exception:
+            if not self.cancelled:
+                raise
+        finally:
+            self._stream = None
 
-        # To collect the full response for history
-        full_response = ""
-
-        # Use streaming API
-        with self.client.messages.stream(
-            model=self.model,
-            max_tokens=8096,
-            system=SYSTEM_PROMPT,
-            messages=self.messages,
-        ) as stream:
-            for text in stream.text_stream:
-                full_response += text
-                yield text
-
-        # Add complete response to history
-        self.messages.append({"role": "assistant", "content": full_response})
+        if completed:
+            self._end_turn()
+        else:
+            self._cancel_turn(prompt, "".join(partial))
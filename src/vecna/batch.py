@@ -0,0 +1,317 @@
+"""Batch mode - run many prompts headlessly with bounded concurrency.
+
+The input is a JSONL file with one item per line:
+
+    {"id": "fix-1", "prompt": "Explain main.py", "cwd": "repos/app"}
+
+Only `prompt` is required; `id` defaults to the line number and `cwd` (the
+directory the item's tools may read) to the current directory. Every item
+gets its own `AsyncAgent`, and all agents share one client, so they share
+its connection pool.
+
+At most `concurrency` items run at once. Reacting to rate limits is left
+to the client's transport (see `vecna.transport`), which halves its request
+limit and pauses for the retry-after time once per throttled response.
+Items whose requests still failed after the client's retries are retried
+as a whole, after waiting for the retry-after time or a backoff, when the
+error is transient. They don't cut the concurrency again: the transport
+has already reacted to the same responses.
+
+With the "batches" backend the requests of all items in flight are collected
+into Message Batches instead of being sent one by one (see
+`vecna.message_batches`); limits, retries and checkpoints work the same.
+
+A result line is appended to the output file as soon as each item finishes.
+The output doubles as the checkpoint: items already recorded as done are
+skipped when the same batch is run again, so an interrupted run picks up
+where it stopped. Failed items are retried on the next run, so a reader of
+the output should take the last line recorded for each id.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+from vecna.agent import AsyncAgent
+from vecna.tools import ToolRegistry
+from vecna.transport import RETRY_STATUSES, retry_after
+from vecna.utils import get_async_client
+
+if TYPE_CHECKING:
+    from anthropic import AsyncAnthropic
+
+DEFAULT_CONCURRENCY = 8
+# Batched requests wait together, so many more items can be in flight
+DEFAULT_BATCHES_CONCURRENCY = 1000
+DEFAULT_RETRIES = 3
+
+# Backoff before retrying an item, in seconds (its requests have already
+# been retried by the client's transport)
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+
+@dataclass
+class BatchItem:
+    """One prompt of a batch."""
+
+    id: str
+    prompt: str
+    cwd: Path
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one item, as written to the output file."""
+
+    id: str
+    status: str
+    response: str | None = None
+    error: str | None = None
+    attempts: int = 0
+    latency: float = 0.0
+    api_calls: int = 0
+    tool_calls: int = 0
+    usage: dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the result as a JSON-serializable dict."""
+        return asdict(self)
+
+
+@dataclass
+class BatchSummary:
+    """Counts of a finished (or interrupted) batch run."""
+
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+
+type ToolsFactory = Callable[[Path], ToolRegistry]
+type ResultCallback = Callable[[BatchResult], None]
+
+
+def read_items(path: Path) -> Iterator[BatchItem | BatchResult]:
+    """Read batch items lazily from a JSONL file.
+
+    Lines that aren't valid items are yielded as failed results instead, so
+    one bad line doesn't stop the run.
+
+    Args:
+        path: The input file.
+
+    Yields:
+        Items, or error results for invalid lines.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield BatchResult(f"line-{number}", "error", error=f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict) or not isinstance(
+                record.get("prompt"), str
+            ):
+                yield BatchResult(
+                    f"line-{number}", "error", error="Expected an object with a prompt"
+                )
+                continue
+            yield BatchItem(
+                id=str(record.get("id", f"line-{number}")),
+                prompt=record["prompt"],
+                cwd=Path(record.get("cwd") or ".").resolve(),
+            )
+
+
+def load_completed(path: Path) -> set[str]:
+    """Return the ids recorded as succeeded in an output file.
+
+    Args:
+        path: The output file (it need not exist).
+    """
+    completed: set[str] = set()
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return completed
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short when the last run was interrupted
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+
+
+def _open_output(path: Path) -> TextIO:
+    """Open the output for appending, after any line left unfinished."""
+    f = open(path, "a+", encoding="utf-8")
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != "\n":
+            f.write("\n")
+    return f
+
+
+def _retry_delay(error: Exception, attempt: int) -> float | None:
+    """Return how long to wait before retrying, or None if it's not worth it."""
+    from anthropic import APIConnectionError, APIStatusError
+
+    if isinstance(error, APIStatusError):
+        if error.status_code not in RETRY_STATUSES:
+            return None
+        wait = retry_after(error.response.headers)
+        if wait is not None:
+            return min(wait, MAX_BACKOFF)
+    elif not isinstance(error, APIConnectionError):
+        return None
+    backoff = min(BASE_BACKOFF * 2 ** (attempt - 1), MAX_BACKOFF)
+    return backoff * random.uniform(0.5, 1.0)
+
+
+async def run_batch(
+    input_path: Path,
+    output_path: Path,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    client: "AsyncAnthropic | None" = None,
+    tools_factory: ToolsFactory | None = None,
+    on_result: ResultCallback | None = None,
+    backend: str = "live",
+) -> BatchSummary:
+    """Run every item of a batch and append the results to the output.
+
+    Args:
+        input_path: The JSONL file of items.
+        output_path: The JSONL file results are appended to.
+        concurrency: The most items run at once.
+        retries: How often a transient failure is retried per item.
+        client: The client shared by all agents (defaults to
+            `get_async_client()`). With the batches backend it is wrapped in
+            a `BatchingClient` unless it already is one.
+        tools_factory: Creates the tools for an item's directory (defaults to
+            the standard tools).
+        on_result: Called with each result as it's written.
+        backend: "live" to send each request as it's made, or "batches" to
+            collect them into Message Batches (see `vecna.message_batches`).
+
+    Returns:
+        How many items succeeded, failed and were skipped as already done.
+
+    Raises:
+        ValueError: If `concurrency` is below 1 or the backend is unknown.
+    """
+    if concurrency < 1:
+        raise ValueError(f"Concurrency must be at least 1, not {concurrency}")
+    if backend == "batches":
+        from vecna.message_batches import BatchingClient
+
+        if not isinstance(client, BatchingClient):
+            client = BatchingClient(client)
+    elif backend != "live":
+        raise ValueError(f"Unknown backend: {backend}")
+    elif client is None:
+        client = get_async_client()
+    if tools_factory is None:
+        from vecna.tools.defaults import default_tools
+
+        tools_factory = default_tools
+
+    completed = load_completed(output_path)
+    summary = BatchSummary()
+    # Items are read as workers free up, so the input can be any size
+    queue: asyncio.Queue[BatchItem | None] = asyncio.Queue(maxsize=concurrency)
+    tools: dict[Path, ToolRegistry] = {}
+    seen: set[str] = set()
+
+    def tools_for(cwd: Path) -> ToolRegistry:
+        # Items in the same directory share their tools and caches
+        if cwd not in tools:
+            tools[cwd] = tools_factory(cwd)
+        return tools[cwd]
+
+    async def run_item(item: BatchItem) -> BatchResult:
+        if not item.cwd.is_dir():
+            return BatchResult(item.id, "error", error=f"No such directory: {item.cwd}")
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                agent = AsyncAgent(client=client, tools=tools_for(item.cwd))
+                response = await agent.chat(item.prompt)
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt > retries:
+                    return BatchResult(
+                        item.id,
+                        "error",
+                        error=f"{type(e).__name__}: {e}",
+                        attempts=attempt,
+                        latency=time.perf_counter() - start,
+                    )
+                await asyncio.sleep(delay)
+                continue
+            stats = agent.stats.last
+            return BatchResult(
+                item.id,
+                "ok",
+                response=response,
+                attempts=attempt,
+                latency=time.perf_counter() - start,
+                api_calls=stats.api_calls if stats else 0,
+                tool_calls=len(stats.tools) if stats else 0,
+                usage=dict(agent.last_usage),
+            )
+
+    with _open_output(output_path) as output:
+
+        def record(result: BatchResult) -> None:
+            output.write(json.dumps(result.to_dict()) + "\n")
+            output.flush()
+            if result.status == "ok":
+                summary.succeeded += 1
+            else:
+                summary.failed += 1
+            if on_result is not None:
+                on_result(result)
+
+        async def worker() -> None:
+            while (item := await queue.get()) is not None:
+                record(await run_item(item))
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for entry in read_items(input_path):
+                if isinstance(entry, BatchResult):
+                    record(entry)
+                elif entry.id in completed:
+                    summary.skipped += 1
+                elif entry.id in seen:
+                    record(BatchResult(entry.id, "error", error="Duplicate id"))
+                else:
+                    seen.add(entry.id)
+                    await queue.put(entry)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            # Registries may own worker processes (see `WorkerPool`)
+            for registry in tools.values():
+                registry.close()
+
+    return summary
@@ -0,0 +1,279 @@
+"""A local stand-in for the Messages and Message Batches APIs.
+
+Serves the endpoints the batch backend uses (create, retrieve and results of
+a Message Batch) and the live Messages endpoint, on localhost, so batch jobs
+can be run and tested without network access:
+
+    python -m vecna.batch_server --port 8765 --processing-time 2
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=local \\
+        vecna batch prompts.jsonl --backend batches
+
+Replies come from a responder function, given each request's parameters.
+The default one echoes the last user message. A batch stays "in_progress"
+for `processing_time` seconds after it is created, so polling is exercised
+too. Everything is kept in memory.
+"""
+
+import argparse
+import json
+import secrets
+import threading
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+# Given a request's parameters, returns a Message, or an error object
+# ({"type": "error", "error": {...}}) to make the request fail
+type Responder = Callable[[dict[str, Any]], dict[str, Any]]
+
+BATCHES_PATH = "/v1/messages/batches"
+
+
+def message(text: str, model: str = "stand-in") -> dict[str, Any]:
+    """Build a text-only Message."""
+    return {
+        "id": f"msg_{secrets.token_hex(8)}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": len(text.split())},
+    }
+
+
+def last_user_text(params: dict[str, Any]) -> str:
+    """Return the text of the last user message of a request."""
+    content = params["messages"][-1]["content"]
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content)
+
+
+def echo_responder(params: dict[str, Any]) -> dict[str, Any]:
+    """Reply with the last user message."""
+    return message(f"Echo: {last_user_text(params)}", params.get("model", "stand-in"))
+
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, UTC).isoformat().replace("+00:00", "Z")
+
+
+class _Batch:
+    """A submitted batch and the results it will have."""
+
+    def __init__(self, requests: list[dict[str, Any]], ends_at: float) -> None:
+        self.id = f"msgbatch_{secrets.token_hex(12)}"
+        self.requests = requests
+        self.created_at = time.time()
+        self.ends_at = ends_at
+        self.results: list[dict[str, Any]] | None = None
+
+    def resource(self, base_url: str) -> dict[str, Any]:
+        """The batch as the API describes it."""
+        ended = time.time() >= self.ends_at
+        counts = dict.fromkeys(
+            ("processing", "succeeded", "errored", "canceled", "expired"), 0
+        )
+        if ended:
+            for result in self.results or []:
+                counts[result["result"]["type"]] += 1
+        else:
+            counts["processing"] = len(self.requests)
+        return {
+            "id": self.id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": counts,
+            "created_at": _timestamp(self.created_at),
+            "expires_at": _timestamp(
+                self.created_at + timedelta(hours=24).total_seconds()
+            ),
+            "ended_at": _timestamp(self.ends_at) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": (
+                f"{base_url}{BATCHES_PATH}/{self.id}/results" if ended else None
+            ),
+        }
+
+
+class BatchServer:
+    """The stand-in server, running on a background thread.
+
+    Use it as a context manager, or call `start()` and `stop()`.
+    """
+
+    def __init__(
+        self,
+        responder: Responder = echo_responder,
+        processing_time: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        """Initialize the server.
+
+        Args:
+            responder: Produces the reply to each request.
+            processing_time: Seconds a batch stays in progress.
+            host: Address to listen on.
+            port: Port to listen on (0 picks a free one).
+        """
+        self.responder = responder
+        self.processing_time = processing_time
+        self.batches: dict[str, _Batch] = {}
+        # Requests answered, live or in batches
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The base URL to point the client at."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "BatchServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "BatchServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def respond(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Answer one request with the responder."""
+        with self._lock:
+            self.request_count += 1
+        try:
+            return self.responder(params)
+        except Exception as e:
+            return {"type": "error", "error": {"type": "api_error", "message": str(e)}}
+
+    def create_batch(self, requests: list[dict[str, Any]]) -> _Batch:
+        """Accept a batch; its results are computed right away."""
+        batch = _Batch(requests, time.time() + self.processing_time)
+        results = []
+        for request in requests:
+            reply = self.respond(request["params"])
+            if reply.get("type") == "error":
+                result = {"type": "errored", "error": reply}
+            else:
+                result = {"type": "succeeded", "message": reply}
+            results.append({"custom_id": request["custom_id"], "result": result})
+        batch.results = results
+        with self._lock:
+            self.batches[batch.id] = batch
+        return batch
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _send(
+                self, status: int, body: bytes, content_type: str = "application/json"
+            ) -> None:
+                self.send_response(status)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, data: dict[str, Any]) -> None:
+                self._send(status, json.dumps(data).encode())
+
+            def _error(self, status: int, error_type: str, text: str) -> None:
+                error = {"type": error_type, "message": text}
+                self._send_json(status, {"type": "error", "error": error})
+
+            def _read_json(self) -> Any:
+                length = int(self.headers.get("content-length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_POST(self) -> None:
+                try:
+                    body = self._read_json()
+                except ValueError:
+                    self._error(400, "invalid_request_error", "Body is not JSON")
+                    return
+                path = self.path.split("?")[0]
+                if path == "/v1/messages":
+                    reply = server.respond(body)
+                    if reply.get("type") == "error":
+                        self._send_json(500, reply)
+                    else:
+                        self._send_json(200, reply)
+                elif path == BATCHES_PATH:
+                    requests = body.get("requests")
+                    if not requests:
+                        self._error(400, "invalid_request_error", "No requests")
+                        return
+                    batch = server.create_batch(requests)
+                    self._send_json(200, batch.resource(server.url))
+                else:
+                    self._error(404, "not_found_error", f"No route for {path}")
+
+            def do_GET(self) -> None:
+                parts = self.path.split("?")[0].removeprefix(BATCHES_PATH).split("/")
+                batch = server.batches.get(parts[1]) if len(parts) > 1 else None
+                if batch is None or not self.path.startswith(BATCHES_PATH):
+                    self._error(404, "not_found_error", f"No route for {self.path}")
+                elif parts[2:] == []:
+                    self._send_json(200, batch.resource(server.url))
+                elif parts[2:] == ["results"] and time.time() >= batch.ends_at:
+                    lines = "".join(json.dumps(r) + "\n" for r in batch.results or [])
+                    self._send(200, lines.encode(), "application/x-jsonl")
+                else:
+                    self._error(404, "not_found_error", "Results are not ready")
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--processing-time",
+        type=float,
+        default=0.0,
+        help="Seconds each batch stays in progress",
+    )
+    args = parser.parse_args()
+
+    server = BatchServer(
+        processing_time=args.processing_time, host=args.host, port=args.port
+    )
+    print(f"Serving on {server.url} (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,189 @@
 """
 CLI entry point for the Vecna agent.
+
+Only the standard library is imported at module load. The agent, the
+renderer and the tools (and with them rich and the Anthropic SDK) are
+imported once the interactive session (or a batch) starts, so `--version`
+and `--help` return without paying for them.
 """
 
+import argparse
 import os
+import sys
 from pathlib import Path
 
-from rich.live import Live
-from rich.markdown import Markdown
+from vecna import __version__
+
+
+def _positive_int(value: str) -> int:
+    """Parse an argument that must be a whole number of at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(
+        prog="vecna",
+        description="A terminal AI coding assistant.",
+        epilog="Type 'help' in a session for the interactive commands.",
+    )
+    parser.add_argument(
+        "-V", "--version", action="version", version=f"vecna {__version__}"
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="latest",
+        metavar="ID",
+        help="Resume a saved session (the most recent one if no ID is given)",
+    )
+    parser.add_argument(
+        "--no-save", action="store_true", help="Don't save this session"
+    )
+
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    batch = commands.add_parser(
+        "batch",
+        help="Run the prompts of a JSONL file without interaction",
+        description="Run every prompt of a JSONL file concurrently and write "
+        "one result line per prompt. Rerunning skips the prompts already done.",
+    )
+    batch.add_argument("input", type=Path, help="JSONL file of prompts")
+    batch.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="JSONL file for the results (default: INPUT.results.jsonl)",
+    )
+    batch.add_argument(
+        "-j",
+        "--concurrency",
+        type=_positive_int,
+        help="Most prompts run at once (default: 8, or 1000 with batches)",
+    )
+    batch.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries of a prompt after a transient error (default: 3)",
+    )
+    batch.add_argument(
+        "--backend",
+        choices=["live", "batches"],
+        default="live",
+        help="Send requests live or through the Message Batches API, which "
+        "is cheaper but slower (default: live)",
+    )
+    return parser
+
 
-from vecna.agent import Agent
-from vecna.ui import (
-    console,
-    print_error,
-    print_help,
-    print_welcome,
-)
+def main(argv: list[str] | None = None) -> None:
+    """Main entry point for the Vecna CLI.
 
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:]).
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "batch":
+        output = args.output or args.input.with_suffix(".results.jsonl")
+        sys.exit(
+            run_batch(args.input, output, args.concurrency, args.retries, args.backend)
+        )
+    run_session(resume=args.resume, save=not args.no_save)
 
-def main() -> None:
-    """Main entry point for the Vecna CLI."""
+
+def run_batch(
+    input_path: Path,
+    output: Path,
+    concurrency: int | None = None,
+    retries: int = 3,
+    backend: str = "live",
+) -> int:
+    """Run a batch of prompts, reporting progress on stderr.
+
+    Args:
+        input_path: The JSONL file of prompts.
+        output: The JSONL file results are appended to.
+        concurrency: The most prompts run at once (defaults by backend).
+        retries: Retries of a prompt after a transient error.
+        backend: "live" or "batches".
+
+    Returns:
+        The exit status: 0 if every prompt succeeded, 1 otherwise.
+    """
+    import asyncio
+
+    from vecna import batch
+    from vecna.utils import load_env
+
+    load_env()
+    if concurrency is None:
+        concurrency = (
+            batch.DEFAULT_BATCHES_CONCURRENCY
+            if backend == "batches"
+            else batch.DEFAULT_CONCURRENCY
+        )
+
+    def report(result: batch.BatchResult) -> None:
+        detail = f"{result.latency:.1f}s" if result.status == "ok" else result.error
+        print(f"{result.id}: {result.status} ({detail})", file=sys.stderr)
+
+    try:
+        summary = asyncio.run(
+            batch.run_batch(
+                input_path,
+                output,
+                concurrency=concurrency,
+                retries=retries,
+                on_result=report,
+                backend=backend,
+            )
+        )
+    except KeyboardInterrupt:
+        print(f"Interrupted; run again to resume into {output}", file=sys.stderr)
+        return 130
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(
+        f"{summary.succeeded} succeeded, {summary.failed} failed, "
+        f"{summary.skipped} already done; results in {output}",
+        file=sys.stderr,
+    )
+    return 1 if summary.failed else 0
+
+
+def run_session(resume: str | None = None, save: bool = True) -> None:
+    """Run the interactive session in the current directory.
+
+    Args:
+        resume: Id of a saved session to continue ("latest" for the newest).
+        save: Whether to save the session's turns.
+    """
+    from vecna.agent import Agent
+    from vecna.render import stream_markdown
+    from vecna.session import Session, SessionError
+    from vecna.tools.defaults import default_tools
+    from vecna.tools.workers import DEFAULT_POOL_SIZE
+    from vecna.ui import (
+        console,
+        print_error,
+        print_help,
+        print_stats,
+        print_usage,
+        print_welcome,
+    )
+    from vecna.utils import load_env
+
+    # Settings in .env apply to the tools as well as the agent
+    load_env()
 
     # Get working directory
     working_dir = Path.cwd()
@@ -27,60 +192,103 @@ def main() -> None:
     console.print(f"[dim]Working directory: {working_dir}[/dim]")
     console.print()
 
-    # Initialize the agent
+    # Register the tools the agent may use; the search tools run in worker
+    # processes, so a slow search can time out or be cancelled with Ctrl+C.
+    # The tools serve this one conversation, so re-reads can be diffs.
+    workers = int(os.environ.get("VECNA_TOOL_WORKERS", DEFAULT_POOL_SIZE))
+    diff_rereads = os.environ.get("VECNA_DIFF_REREADS", "1") != "0"
+    tools = default_tools(working_dir, workers=workers, diff_rereads=diff_rereads)
+
+    # Initialize the agent, resuming a saved session if asked. Sessions
+    # record the tools' version, so a resume can tell the tools changed.
     try:
-        agent = Agent()
-    except ValueError as e:
+        session = Session.open(resume) if resume is not None else None
+        agent = Agent(tools=tools, session=session)
+        tools_changed = session is not None and (
+            session.load_meta().get("tools_version", tools.version) != tools.version
+        )
+        if session is None and save:
+            agent.session = Session.create(
+                meta={"cwd": str(working_dir), "tools_version": tools.version}
+            )
+    except (ValueError, SessionError, OSError) as e:
         print_error(str(e))
+        tools.close()
         return
 
-    while True:
-        try:
-            # Show prompt and get input
-            user_input = console.input("[blue bold]>[/blue bold] ")
+    if agent.session is not None:
+        resumed = f", resumed {len(agent.messages)} messages" if resume else ""
+        console.print(f"[dim]Session: {agent.session.id}{resumed}[/dim]")
+        if tools_changed:
+            console.print(
+                "[dim]The tools have changed since this session was started; "
+                "earlier tool calls may not match them[/dim]"
+            )
+        console.print()
+
+    try:
+        while True:
+            try:
+                # Show prompt and get input
+                user_input = console.input("[blue bold]>[/blue bold] ")
 
-            # Skip empty lines
-            if not user_input.strip():
-                continue
+                # Skip empty lines
+                if not user_input.strip():
+                    continue
 
-            # Handle built-in commands
-            command = user_input.strip().lower()
+                # Handle built-in commands
+                command = user_input.strip().lower()
 
-            # Check for exit command
-            if command in ("exit", "quit"):
-                console.print("[dim]Goodbye![/dim]")
+                # Check for exit command
+                if command in ("exit", "quit"):
+                    console.print("[dim]Goodbye![/dim]")
+                    break
+
+                if command == "help":
+                    print_help()
+                    continue
+
+                if command in ("stats", "/stats"):
+                    print_stats(agent.stats.last, agent.stats.summary())
+                    continue
+
+                if command == "clear":
+                    os.system("clear" if os.name != "nt" else "cls")
+                    print_welcome()
+                    continue
+
+                # Streamed response from model's API
+                console.print()  # Add spacing
+
+                # Render the response incrementally as text streams in; the
+                # turn's stats are published once the final frame is drawn
+                reply = agent.chat_stream(user_input)
+                try:
+                    with agent.stats.deferred():
+                        stream_markdown(
+                            reply, console, on_render=agent.stats.add_render_time
+                        )
+                except KeyboardInterrupt:
+                    # Ctrl+C stops the reply, not the session: closing the stream
+                    # ends the request and settles the history
+                    reply.close()
+                    console.print("\n[dim]Interrupted[/dim]")
+                    console.print()
+                    continue
+                print_usage(agent.last_usage)
+
+                console.print()  # Add spacing
+            except KeyboardInterrupt:
+                # Handle Ctrl+C gracefully
+                console.print("\n[dim]Goodbye![/dim]")
                 break
 
-            if command == "help":
-                print_help()
-                continue
-
-            if command == "clear":
-                os.system("clear" if os.name != "nt" else "cls")
-                print_welcome()
-                continue
-
-            # Streamed response from model's API
-            console.print()  # Add spacing
-
-            full_response = ""
-            # Use Live to update display as text streams in
-            with Live(Markdown(""), console=console, refresh_per_second=10) as live:
-                for chunk in agent.chat_stream(user_input):
-                    full_response += chunk
-                    # Echo the response
-                    live.update(Markdown(full_response))
-
-            console.print()  # Add spacing
-        except KeyboardInterrupt:
-            # Handle Ctrl+C gracefully
-            console.print("\n[dim]Goodbye![/dim]")
-            break
-
-        except EOFError:
-            # Handle Ctrl+D (end of input)
-            console.print("\n[dim]Goodbye![/dim]")
-            break
+            except EOFError:
+                # Handle Ctrl+D (end of input)
+                console.print("\n[dim]Goodbye![/dim]")
+                break
+    finally:
+        tools.close()
 
 
 if __name__ == "__main__":
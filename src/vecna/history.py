@@ -0,0 +1,258 @@
+"""History manager - keeps the conversation within a token budget.
+
+Every request resends the whole conversation, so history that grows without
+limit makes each turn slower and more expensive until it hits the context
+limit. The manager compacts old history in two stages, cheapest first:
+
+1. Old, large tool results are replaced by a short stub.
+2. Old turns are replaced by a model-generated summary.
+
+Compaction only ever cuts history at the start of a turn (a user message that
+is not a tool result), so a tool_use block is never separated from its
+tool_result. The most recent turns are always kept verbatim.
+"""
+
+import json
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+# Rough characters-per-token ratio used by the local estimator
+CHARS_PER_TOKEN = 4
+
+# Default budget for the conversation history, in tokens
+DEFAULT_HISTORY_BUDGET = 150_000
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def _content_chars(content: Any) -> int:
+    """Count the characters of a message's content."""
+    if isinstance(content, str):
+        return len(content)
+
+    total = 0
+    for block in content:
+        block_type = block.get("type")
+        if block_type == "text":
+            total += len(block["text"])
+        elif block_type == "tool_use":
+            total += len(block["name"]) + len(json.dumps(block["input"]))
+        elif block_type == "tool_result":
+            total += _content_chars(block.get("content", ""))
+        else:
+            total += len(json.dumps(block))
+    return total
+
+
+def estimate_tokens(messages: list[dict[str, Any]]) -> int:
+    """Estimate the token count of messages without calling the API.
+
+    Args:
+        messages: Messages in API format.
+
+    Returns:
+        The approximate number of tokens.
+    """
+    chars = sum(_content_chars(message["content"]) for message in messages)
+    # A few tokens of framing per message
+    return chars // CHARS_PER_TOKEN + 4 * len(messages)
+
+
+def is_turn_start(message: dict[str, Any]) -> bool:
+    """Check whether a message starts a new turn (user input, not tool results)."""
+    if message["role"] != "user":
+        return False
+    content = message["content"]
+    if isinstance(content, str):
+        return True
+    return not any(block.get("type") == "tool_result" for block in content)
+
+
+def _is_summary(message: dict[str, Any]) -> bool:
+    """Check whether a message is a summary written by `apply_summary`."""
+    content = message["content"]
+    return isinstance(content, str) and content.startswith(SUMMARY_HEADER)
+
+
+def render_transcript(messages: list[dict[str, Any]]) -> str:
+    """Render messages as plain text for the summarizer."""
+    lines = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            lines.append(f"{message['role'].upper()}: {content}")
+            continue
+        for block in content:
+            block_type = block.get("type")
+            if block_type == "text":
+                lines.append(f"{message['role'].upper()}: {block['text']}")
+            elif block_type == "tool_use":
+                arguments = json.dumps(block["input"])
+                lines.append(f"TOOL CALL: {block['name']}({arguments})")
+            elif block_type == "tool_result":
+                lines.append(f"TOOL RESULT: {block.get('content', '')}")
+    return "\n\n".join(lines)
+
+
+class HistoryManager:
+    """Enforces a token budget on a conversation history.
+
+    The manager edits the message list in place and records every compaction
+    in `compactions`, including how many tokens it saved.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_HISTORY_BUDGET,
+        keep_recent_turns: int = 2,
+        stub_over_chars: int = 2_000,
+        count_tokens: Callable[[list[dict[str, Any]]], int] | None = None,
+        on_compact: Callable[[], None] | None = None,
+    ) -> None:
+        """Initialize the manager.
+
+        Args:
+            max_tokens: Token budget for the history.
+            keep_recent_turns: Number of latest turns never compacted.
+            stub_over_chars: Tool results longer than this are stubbed.
+            count_tokens: Exact token counter (defaults to `estimate_tokens`).
+            on_compact: Called after each compaction, since earlier messages
+                may have been stubbed or summarized away.
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.stub_over_chars = stub_over_chars
+        self.count_tokens = count_tokens or estimate_tokens
+        self.on_compact = on_compact
+        self.compactions: list[dict[str, Any]] = []
+
+    def _protected_start(self, messages: list[dict[str, Any]]) -> int:
+        """Index of the first message in the turns that are kept verbatim."""
+        starts = [i for i, message in enumerate(messages) if is_turn_start(message)]
+        if len(starts) <= self.keep_recent_turns:
+            return 0
+        return starts[-self.keep_recent_turns]
+
+    def _record(self, strategy: str, before: int, after: int) -> None:
+        self.compactions.append(
+            {
+                "strategy": strategy,
+                "tokens_before": before,
+                "tokens_after": after,
+                "tokens_saved": before - after,
+            }
+        )
+        if self.on_compact is not None:
+            self.on_compact()
+
+    def stub_tool_results(self, messages: list[dict[str, Any]]) -> int:
+        """Replace old, large tool results with a short stub.
+
+        The first line of each result (usually a header such as the file
+        name) is kept so the model still knows what was there.
+
+        Returns:
+            The number of tool results stubbed.
+        """
+        stubbed = 0
+        for message in messages[: self._protected_start(messages)]:
+            if message["role"] != "user" or isinstance(message["content"], str):
+                continue
+            blocks = []
+            for block in message["content"]:
+                content = block.get("content")
+                if (
+                    block.get("type") == "tool_result"
+                    and isinstance(content, str)
+                    and len(content) > self.stub_over_chars
+                ):
+                    first_line = content.split("\n", 1)[0][:200]
+                    block = {
+                        **block,
+                        "content": (
+                            f"{first_line}\n[Earlier tool result removed to save "
+                            f"context: {len(content):,} characters]"
+                        ),
+                    }
+                    stubbed += 1
+                blocks.append(block)
+            message["content"] = blocks
+        return stubbed
+
+    def summary_cut(self, messages: list[dict[str, Any]]) -> int:
+        """Find where to cut history for summarization.
+
+        Returns:
+            The number of leading messages to summarize (0 if none).
+        """
+        cut = self._protected_start(messages)
+        # Nothing to gain from re-summarizing a lone previous summary
+        if cut == 0 or (cut <= 2 and _is_summary(messages[0])):
+            return 0
+        return cut
+
+    def apply_summary(
+        self, messages: list[dict[str, Any]], cut: int, summary: str
+    ) -> None:
+        """Replace the first `cut` messages with a summary exchange."""
+        messages[:cut] = [
+            {"role": "user", "content": f"{SUMMARY_HEADER}\n\n{summary}"},
+            {"role": "assistant", "content": "Understood, I'll continue from there."},
+        ]
+
+    def _stub_if_over_budget(self, messages: list[dict[str, Any]]) -> int | None:
+        """Run the cheap compaction stage.
+
+        Returns:
+            The token count if the history is still over budget, else None.
+        """
+        before = self.count_tokens(messages)
+        if before <= self.max_tokens:
+            return None
+
+        if self.stub_tool_results(messages):
+            after = self.count_tokens(messages)
+            self._record("stub_tool_results", before, after)
+            before = after
+            if before <= self.max_tokens:
+                return None
+        return before
+
+    def compact(
+        self,
+        messages: list[dict[str, Any]],
+        summarize: Callable[[str], str] | None = None,
+    ) -> None:
+        """Compact the history if it is over budget.
+
+        Args:
+            messages: The history, edited in place.
+            summarize: Turns a transcript into a summary (summaries are
+                skipped when not given).
+        """
+        before = self._stub_if_over_budget(messages)
+        cut = self.summary_cut(messages) if before is not None else 0
+        if summarize is None or not cut:
+            return
+        summary = summarize(render_transcript(messages[:cut]))
+        self.apply_summary(messages, cut, summary)
+        self._record("summarize", before, self.count_tokens(messages))
+
+    async def acompact(
+        self,
+        messages: list[dict[str, Any]],
+        summarize: Callable[[str], Awaitable[str]] | None = None,
+    ) -> None:
+        """Async version of `compact` for use with an async summarizer."""
+        before = self._stub_if_over_budget(messages)
+        cut = self.summary_cut(messages) if before is not None else 0
+        if summarize is None or not cut:
+            return
+        summary = await summarize(render_transcript(messages[:cut]))
+        self.apply_summary(messages, cut, summary)
+        self._record("summarize", before, self.count_tokens(messages))
+
+    @property
+    def tokens_saved(self) -> int:
+        """Total tokens saved by all compactions so far."""
+        return sum(record["tokens_saved"] for record in self.compactions)
@@ -0,0 +1,226 @@
+"""Message Batches backend - agent requests sent through the Batches API.
+
+`BatchingClient` stands in for the async client of an `AsyncAgent`. Each
+`messages.create()` call is queued instead of sent. Queued requests are
+submitted together as one Message Batch a short while after the first of
+them was made (or as soon as the batch is full). The batch is then polled, with a
+growing interval, until it ends, and each result goes back to the call that
+asked for it. The agent code is unchanged, so batched requests carry the same
+system prompt, tool schemas and history as live ones, and agents that call
+tools simply join the next batch with their follow-up request.
+
+Batches trade latency (minutes to hours) for throughput and cost, so this
+suits bulk jobs such as `vecna batch --backend batches`, not the REPL.
+Streaming is not available through batches: `messages.stream()` raises an
+`AnthropicError`.
+
+Failed results are raised as the SDK's own errors: an errored request as the
+status error of its error type (so rate limits are `RateLimitError`), and an
+expired request as `APITimeoutError`, so callers can retry them like live
+failures.
+"""
+
+import asyncio
+import itertools
+import json
+from typing import TYPE_CHECKING, Any
+
+from vecna.utils import get_async_client
+
+if TYPE_CHECKING:
+    from anthropic import AsyncAnthropic
+    from anthropic.types import Message, MessageBatch
+
+# How long to wait for more requests before submitting a batch, in seconds
+DEFAULT_LINGER = 0.5
+
+# Polling starts at the first interval and grows to the maximum
+DEFAULT_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 60.0
+POLL_BACKOFF = 1.5
+
+# API limits of a single batch (bytes with some room for the envelope)
+MAX_BATCH_REQUESTS = 100_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+# HTTP status and SDK error class of each API error type, as a live call
+# answered with that error would raise
+ERROR_TYPES = {
+    "invalid_request_error": (400, "BadRequestError"),
+    "authentication_error": (401, "AuthenticationError"),
+    "billing_error": (402, "APIStatusError"),
+    "permission_error": (403, "PermissionDeniedError"),
+    "not_found_error": (404, "NotFoundError"),
+    "request_too_large": (413, "APIStatusError"),
+    "rate_limit_error": (429, "RateLimitError"),
+    "api_error": (500, "InternalServerError"),
+    "overloaded_error": (529, "InternalServerError"),
+}
+
+
+class _BatchedMessages:
+    """The `messages` resource of a `BatchingClient`."""
+
+    def __init__(self, owner: "BatchingClient") -> None:
+        self._owner = owner
+
+    async def create(self, **params: Any) -> "Message":
+        """Queue a Messages API request and wait for its batched result."""
+        return await self._owner._enqueue(params)
+
+    def stream(self, **params: Any) -> Any:
+        """Refuse to stream, which batched requests can't do."""
+        from anthropic import AnthropicError
+
+        raise AnthropicError("Streaming is not available through batches")
+
+
+class BatchingClient:
+    """An async client whose message requests go through Message Batches.
+
+    Pass it as the client of one or more `AsyncAgent`s; their requests are
+    collected into shared batches.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncAnthropic | None" = None,
+        linger: float = DEFAULT_LINGER,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        max_poll_interval: float = MAX_POLL_INTERVAL,
+        max_requests: int = MAX_BATCH_REQUESTS,
+    ) -> None:
+        """Initialize the client.
+
+        Args:
+            client: The client batches are submitted with (defaults to
+                `get_async_client()`).
+            linger: Seconds to wait for more requests before submitting.
+            poll_interval: Seconds before the first status check.
+            max_poll_interval: Longest wait between status checks.
+            max_requests: Most requests in one batch.
+        """
+        self.client = client or get_async_client()
+        self.messages = _BatchedMessages(self)
+        self.linger = linger
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_requests = max_requests
+        # Ids of the batches submitted so far
+        self.batch_ids: list[str] = []
+        self._queue: dict[str, tuple[dict[str, Any], asyncio.Future]] = {}
+        self._queued_bytes = 0
+        self._ids = itertools.count(1)
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _enqueue(self, params: dict[str, Any]) -> "Message":
+        size = len(json.dumps(params))
+        if self._queue and self._queued_bytes + size > MAX_BATCH_BYTES:
+            self._flush()
+        future = asyncio.get_running_loop().create_future()
+        self._queue[f"req-{next(self._ids)}"] = (params, future)
+        self._queued_bytes += size
+        if len(self._queue) >= self.max_requests:
+            self._flush()
+        elif self._timer is None:
+            # Requests made within the wait after the first one share its batch
+            self._timer = asyncio.get_running_loop().call_later(
+                self.linger, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        """Submit the queued requests as a batch, in the background."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._queue:
+            return
+        requests, self._queue = self._queue, {}
+        self._queued_bytes = 0
+        task = asyncio.create_task(self._process(requests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(
+        self, requests: dict[str, tuple[dict[str, Any], asyncio.Future]]
+    ) -> None:
+        """Submit a batch, wait for it to end and hand out its results."""
+        from anthropic import AnthropicError
+
+        error: Exception | None = None
+        ended = False
+        try:
+            batch = await self.client.messages.batches.create(
+                requests=[
+                    {"custom_id": custom_id, "params": params}
+                    for custom_id, (params, _) in requests.items()
+                ]
+            )
+            self.batch_ids.append(batch.id)
+            await self._wait(batch)
+            async for entry in await self.client.messages.batches.results(batch.id):
+                request = requests.get(entry.custom_id)
+                if request is None or request[1].done():
+                    continue
+                if entry.result.type == "succeeded":
+                    request[1].set_result(entry.result.message)
+                else:
+                    request[1].set_exception(self._result_error(entry.result))
+            ended = True
+        except Exception as e:
+            error = e
+        finally:
+            # Every caller gets an answer, even if the batch was cut short
+            for custom_id, (_, future) in requests.items():
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                elif ended:
+                    future.set_exception(
+                        AnthropicError(
+                            f"Batch {batch.id} has no result for {custom_id}"
+                        )
+                    )
+                else:
+                    future.cancel()
+
+    async def _wait(self, batch: "MessageBatch") -> None:
+        """Poll a batch, with a growing interval, until it has ended."""
+        interval = self.poll_interval
+        while batch.processing_status != "ended":
+            await asyncio.sleep(interval)
+            interval = min(interval * POLL_BACKOFF, self.max_poll_interval)
+            batch = await self.client.messages.batches.retrieve(batch.id)
+
+    def _result_error(self, result: Any) -> Exception:
+        """Convert a failed batch result to the SDK error a live call raises."""
+        import anthropic
+        import httpx
+        from anthropic import AnthropicError, APITimeoutError
+
+        request = httpx.Request(
+            "POST", self.client.base_url.join("v1/messages/batches")
+        )
+        if result.type == "expired":
+            return APITimeoutError(request)
+        if result.type != "errored":
+            return AnthropicError(f"Batch request {result.type}")
+        body = result.error.model_dump()
+        error = body.get("error", {})
+        status, class_name = ERROR_TYPES.get(
+            error.get("type"), (500, "InternalServerError")
+        )
+        response = httpx.Response(status, request=request, json=body)
+        error_class = getattr(anthropic, class_name)
+        return error_class(
+            error.get("message", "Batch request failed"), response=response, body=body
+        )
+
+    async def aclose(self) -> None:
+        """Submit anything still queued and wait for all batches to end."""
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
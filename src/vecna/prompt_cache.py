@@ -0,0 +1,78 @@
+"""Prompt caching - cache_control breakpoints for Messages API requests.
+
+Every request resends the system prompt, the tool schemas and the whole
+conversation so far. Marking cache breakpoints lets the API reuse the
+processed prefix from the previous request instead of billing and processing
+it again as fresh input.
+
+Three breakpoints are placed (the API allows four):
+- the last tool definition, caching the tool list
+- the system prompt, caching tools + system
+- the last block of the newest message, a rolling breakpoint that caches the
+  whole conversation so the next turn only pays for what it adds
+"""
+
+from typing import Any
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Usage fields reported per turn
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_read_input_tokens",
+    "cache_creation_input_tokens",
+)
+
+
+def cached_system(prompt: str) -> list[dict[str, Any]]:
+    """Return the system prompt as a text block with a cache breakpoint."""
+    return [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}]
+
+
+def cached_tools(tools: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Return the tool list with a cache breakpoint on the last tool.
+
+    The input list is not modified.
+    """
+    if not tools:
+        return tools
+    return [*tools[:-1], {**tools[-1], "cache_control": CACHE_CONTROL}]
+
+
+def cached_messages(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Return the messages with a rolling breakpoint on the newest message.
+
+    Only the last message is copied; history itself is left untouched so the
+    breakpoint moves forward on every request.
+    """
+    if not messages:
+        return messages
+
+    last = messages[-1]
+    content = last["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = list(content)
+    if not blocks:
+        return messages
+
+    blocks[-1] = {**blocks[-1], "cache_control": CACHE_CONTROL}
+    return [*messages[:-1], {**last, "content": blocks}]
+
+
+def empty_usage() -> dict[str, int]:
+    """Return a zeroed usage record."""
+    return dict.fromkeys(USAGE_FIELDS, 0)
+
+
+def add_usage(total: dict[str, int], usage: Any) -> None:
+    """Add a response's usage counts to a running total.
+
+    Args:
+        total: The usage record to update in place.
+        usage: The `usage` object of an API response.
+    """
+    for field in USAGE_FIELDS:
+        total[field] += getattr(usage, field, None) or 0
@@ -1,5 +1,6 @@
 """Prompts package."""
 
+from vecna.prompts.summary import SUMMARY_PROMPT
 from vecna.prompts.system import SYSTEM_PROMPT
 
-__all__ = ["SYSTEM_PROMPT"]
+__all__ = ["SUMMARY_PROMPT", "SYSTEM_PROMPT"]
@@ -0,0 +1,15 @@
+"""Prompt used to compact old conversation history."""
+
+SUMMARY_PROMPT = """You compress conversation history for Vecna, a terminal-based AI \
+coding assistant.
+
+Summarize the transcript you are given so the assistant can continue the session
+without it. Keep:
+- The user's goals, requests and stated preferences
+- Decisions made and their reasons
+- File paths, function names and other identifiers that were discussed
+- Facts learned from tool results that are still relevant
+- Open questions and unfinished work
+
+Be concise. Write the summary as plain notes, without a preamble.
+"""
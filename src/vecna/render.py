@@ -0,0 +1,267 @@
+"""Incremental Markdown rendering for streamed responses.
+
+Re-parsing the whole response on every chunk makes streaming quadratic in the
+response length. The renderer here splits the text into top-level Markdown
+blocks as it arrives: blocks that can no longer change are parsed and rendered
+once, and only the trailing, still-open block is re-parsed on each frame.
+"""
+
+import os
+import re
+import time
+from collections.abc import Callable, Iterable
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.segment import Segment
+
+# Default number of frames drawn per second while streaming
+DEFAULT_REFRESH_RATE = 12.0
+
+_FENCE_CHARS = ("`", "~")
+
+# A list item: a bullet ("-", "*", "+") or a number followed by "." or ")"
+_LIST_ITEM = re.compile(r"(?:([-*+])|\d{1,9}([.)]))(?:[ \t]|$)")
+
+
+def _fence_marker(line: str) -> str | None:
+    """Return the fence marker (e.g. "```") if the line opens a code fence."""
+    stripped = line.lstrip(" ")
+    if len(line) - len(stripped) > 3:
+        return None
+    for char in _FENCE_CHARS:
+        if stripped.startswith(char * 3):
+            return char * (len(stripped) - len(stripped.lstrip(char)))
+    return None
+
+
+def _list_marker(line: str) -> str | None:
+    """Return what identifies the list a list item line belongs to.
+
+    Items of one list share their bullet character, or for ordered lists the
+    delimiter after the number; any other item starts a new list.
+    """
+    match = _LIST_ITEM.match(line)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+
+class _Block:
+    """A completed Markdown block, parsed once and rendered once per width."""
+
+    def __init__(self, text: str, code_theme: str) -> None:
+        self.text = text
+        self.markdown = Markdown(text, code_theme=code_theme)
+        self._lines: list[list[Segment]] | None = None
+        self._width: int | None = None
+
+    def render_lines(
+        self, console: Console, options: ConsoleOptions
+    ) -> list[list[Segment]]:
+        """Render the block to lines, reusing the result while the width holds."""
+        if self._lines is None or self._width != options.max_width:
+            lines = console.render_lines(
+                self.markdown, options.update(height=None), pad=False
+            )
+            # Spacing between blocks is added by the parent renderable
+            while lines and not Segment.get_line_length(lines[-1]):
+                lines.pop()
+            while lines and not Segment.get_line_length(lines[0]):
+                lines.pop(0)
+            self._lines = lines
+            self._width = options.max_width
+        return self._lines
+
+
+class StreamingMarkdown:
+    """A Rich renderable that accepts Markdown text incrementally.
+
+    Text is fed in arbitrary chunks with `feed()`. Completed top-level blocks
+    (paragraphs, lists, closed code fences, ...) are cached as rendered lines,
+    so each frame only parses the block that is still being written.
+    """
+
+    def __init__(self, code_theme: str = "monokai") -> None:
+        """Initialize an empty renderer.
+
+        Args:
+            code_theme: Pygments theme used for code blocks.
+        """
+        self.code_theme = code_theme
+        self._blocks: list[_Block] = []
+        self._open_lines: list[str] = []
+        self._partial = ""
+        self._fence: str | None = None
+        self._after_blank = False
+        # Marker of the top-level list the open block ends in, if any
+        self._list: str | None = None
+        self._tail: Markdown | None = None
+        self._tail_text: str | None = None
+
+    @property
+    def block_count(self) -> int:
+        """Number of completed (cached) blocks."""
+        return len(self._blocks)
+
+    def feed(self, chunk: str) -> None:
+        """Append a chunk of streamed text.
+
+        Args:
+            chunk: The next piece of the response.
+        """
+        if "\n" not in chunk:
+            self._partial += chunk
+            return
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line + "\n")
+
+    def finish(self) -> None:
+        """Close the trailing block once the stream has ended."""
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = ""
+        self._commit()
+
+    def _add_line(self, line: str) -> None:
+        """Process one complete line, committing blocks that have closed."""
+        if self._fence is not None:
+            self._open_lines.append(line)
+            stripped = line.strip()
+            closing = stripped.startswith(self._fence)
+            if closing and not stripped.strip(self._fence[0]):
+                self._fence = None
+                self._commit()
+            return
+
+        if not line.strip():
+            # A blank line may end the block, but indented continuations
+            # (nested list content, indented code) still belong to it.
+            if self._open_lines:
+                self._open_lines.append(line)
+                self._after_blank = True
+            return
+
+        marker = _fence_marker(line)
+        item = None if line[0].isspace() else _list_marker(line)
+        # An item of the same list after a blank line makes the list loose
+        # rather than ending it
+        continues_list = item is not None and item == self._list
+        if (
+            self._after_blank and not line[0].isspace() and not continues_list
+        ) or marker is not None:
+            self._commit()
+        self._after_blank = False
+        if item is not None:
+            self._list = item
+
+        self._open_lines.append(line)
+        if marker is not None:
+            self._fence = marker
+
+    def _commit(self) -> None:
+        """Move the open block into the list of completed blocks."""
+        text = "".join(self._open_lines).rstrip("\n")
+        self._open_lines = []
+        self._after_blank = False
+        self._list = None
+        if text.strip():
+            self._blocks.append(_Block(text, self.code_theme))
+
+    def _tail_markdown(self) -> Markdown | None:
+        """Parse the still-open block, reusing the last parse if unchanged."""
+        text = ("".join(self._open_lines) + self._partial).rstrip("\n")
+        if not text.strip():
+            return None
+        if text != self._tail_text:
+            self._tail = Markdown(text, code_theme=self.code_theme)
+            self._tail_text = text
+        return self._tail
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        new_line = Segment.line()
+        first = True
+        for block in self._blocks:
+            if not first:
+                yield new_line
+            first = False
+            for line in block.render_lines(console, options):
+                yield from line
+                yield new_line
+
+        tail = self._tail_markdown()
+        if tail is not None:
+            if not first:
+                yield new_line
+            yield from console.render(tail, options)
+
+
+def get_refresh_rate() -> float:
+    """Get the streaming frame rate from VECNA_REFRESH_RATE.
+
+    Values that aren't positive numbers fall back to DEFAULT_REFRESH_RATE.
+    """
+    try:
+        rate = float(os.environ.get("VECNA_REFRESH_RATE", DEFAULT_REFRESH_RATE))
+    except ValueError:
+        return DEFAULT_REFRESH_RATE
+    # Written so that NaN falls back too
+    return rate if rate > 0 else DEFAULT_REFRESH_RATE
+
+
+def stream_markdown(
+    chunks: Iterable[str],
+    console: Console,
+    refresh_per_second: float | None = None,
+    on_render: Callable[[float], None] | None = None,
+) -> str:
+    """Render streamed Markdown chunks live, merging chunks into frames.
+
+    Chunks are fed to a `StreamingMarkdown` as they arrive, but the display
+    is only redrawn when a frame is due, so fast streams cost at most
+    `refresh_per_second` renders per second.
+
+    Args:
+        chunks: The streamed response text.
+        console: The console to render to.
+        refresh_per_second: Maximum frames per second (defaults to
+            VECNA_REFRESH_RATE or DEFAULT_REFRESH_RATE, as do rates that
+            aren't positive).
+        on_render: Called with the seconds spent rendering, after each
+            chunk that was rendered and after the final frame.
+
+    Returns:
+        The full response text.
+    """
+    if refresh_per_second is not None and refresh_per_second > 0:
+        rate = refresh_per_second
+    else:
+        rate = get_refresh_rate()
+    frame_interval = 1.0 / rate
+    renderer = StreamingMarkdown()
+    parts: list[str] = []
+
+    with Live(renderer, console=console, auto_refresh=False) as live:
+        last_frame = 0.0
+        for chunk in chunks:
+            start = time.perf_counter()
+            parts.append(chunk)
+            renderer.feed(chunk)
+            now = time.monotonic()
+            if now - last_frame >= frame_interval:
+                live.refresh()
+                last_frame = now
+            if on_render is not None:
+                on_render(time.perf_counter() - start)
+        start = time.perf_counter()
+        renderer.finish()
+        live.refresh()
+        if on_render is not None:
+            on_render(time.perf_counter() - start)
+
+    return "".join(parts)
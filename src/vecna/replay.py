@@ -0,0 +1,422 @@
+"""Record/replay transports - run the agent against recorded API traffic.
+
+A recording transport sits between the Anthropic client and the network and
+appends every exchange to a cassette file: the request, the response status
+and headers, and each chunk of the response body with the time it arrived.
+For streamed responses the chunks are the server-sent events, so the
+cassette captures time to first token and the pacing of the stream.
+
+A replay transport serves those exchanges back in order without touching the
+network, either at the recorded speed or as fast as possible. The agent, the
+tool loop and the renderer run unchanged on top of it, which makes
+end-to-end tests and latency benchmarks deterministic and offline.
+
+The cassette is a JSONL file with one exchange per line. Body chunks are
+stored base64-encoded, exactly as they came off the wire. Credentials are
+never written: the API key header is not recorded.
+
+The client factories in `vecna.utils` pick a transport from the environment:
+
+    VECNA_CASSETTE=path.jsonl VECNA_CASSETTE_MODE=record   # record
+    VECNA_CASSETTE=path.jsonl VECNA_CASSETTE_MODE=replay   # replay
+    VECNA_REPLAY_SPEED=1      # 1 = recorded timing, 0 = as fast as possible
+"""
+
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+# Request headers that are never written to a cassette
+REDACTED_HEADERS = frozenset({"x-api-key", "authorization", "cookie"})
+
+# Response headers that are never written to a cassette
+DROPPED_RESPONSE_HEADERS = frozenset({"set-cookie"})
+
+type Chunk = tuple[float, bytes]
+
+
+class ReplayError(Exception):
+    """Raised when a request has no matching exchange in the cassette."""
+
+    pass
+
+
+def _request_body(request: httpx.Request) -> Any:
+    """Return a request's JSON body, or its text if it isn't JSON."""
+    content = request.read()
+    if not content:
+        return None
+    try:
+        return json.loads(content)
+    except ValueError:
+        return content.decode("utf-8", errors="replace")
+
+
+def _exchange(
+    request: httpx.Request,
+    response: httpx.Response,
+    headers_delay: float,
+    chunks: list[Chunk],
+) -> dict[str, Any]:
+    """Build a cassette entry for a finished exchange."""
+    return {
+        "request": {
+            "method": request.method,
+            "path": request.url.path,
+            "headers": {
+                name: value
+                for name, value in request.headers.items()
+                if name.lower() not in REDACTED_HEADERS
+            },
+            "body": _request_body(request),
+        },
+        "response": {
+            "status": response.status_code,
+            "headers": [
+                [name, value]
+                for name, value in response.headers.multi_items()
+                if name.lower() not in DROPPED_RESPONSE_HEADERS
+            ],
+            "headers_delay": headers_delay,
+            "chunks": [
+                [round(delay, 6), base64.b64encode(data).decode("ascii")]
+                for delay, data in chunks
+            ],
+        },
+    }
+
+
+def load_cassette(path: Path) -> list[dict[str, Any]]:
+    """Read every exchange recorded in a cassette.
+
+    Args:
+        path: The cassette file.
+
+    Returns:
+        The exchanges, in recording order.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _CassetteWriter:
+    """Appends exchanges to a cassette file, one JSON line each."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def write(self, exchange: dict[str, Any]) -> None:
+        line = json.dumps(exchange) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Passes a response body through, timing each chunk."""
+
+    def __init__(
+        self,
+        stream: httpx.SyncByteStream,
+        start: float,
+        on_close: Callable[[list[Chunk]], None],
+    ) -> None:
+        self._stream = stream
+        self._start = start
+        self._on_close = on_close
+        self._chunks: list[Chunk] = []
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._chunks.append((time.perf_counter() - self._start, chunk))
+            yield chunk
+
+    def close(self) -> None:
+        self._stream.close()
+        if not self._closed:
+            self._closed = True
+            self._on_close(self._chunks)
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    """Async version of `_RecordingStream`."""
+
+    def __init__(
+        self,
+        stream: httpx.AsyncByteStream,
+        start: float,
+        on_close: Callable[[list[Chunk]], None],
+    ) -> None:
+        self._stream = stream
+        self._start = start
+        self._on_close = on_close
+        self._chunks: list[Chunk] = []
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._chunks.append((time.perf_counter() - self._start, chunk))
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+        if not self._closed:
+            self._closed = True
+            self._on_close(self._chunks)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Forwards requests to a real transport and records the exchanges.
+
+    An exchange is written when its response is closed, so a body that was
+    only partly read (e.g. a cancelled stream) is recorded as far as it got.
+    """
+
+    def __init__(self, path: Path, transport: httpx.BaseTransport | None = None):
+        """Initialize the recorder.
+
+        Args:
+            path: The cassette to append to.
+            transport: The transport that talks to the network.
+        """
+        self.writer = _CassetteWriter(path)
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = self.transport.handle_request(request)
+        headers_delay = time.perf_counter() - start
+
+        def on_close(chunks: list[Chunk]) -> None:
+            self.writer.write(_exchange(request, response, headers_delay, chunks))
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, start, on_close),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Async version of `RecordingTransport`."""
+
+    def __init__(
+        self, path: Path, transport: httpx.AsyncBaseTransport | None = None
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            path: The cassette to append to.
+            transport: The transport that talks to the network.
+        """
+        self.writer = _CassetteWriter(path)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        headers_delay = time.perf_counter() - start
+
+        def on_close(chunks: list[Chunk]) -> None:
+            self.writer.write(_exchange(request, response, headers_delay, chunks))
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(response.stream, start, on_close),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class _Cassette:
+    """The exchanges of a cassette, handed out in order per method and path."""
+
+    def __init__(self, path: Path, speed: float, strict: bool) -> None:
+        self.exchanges = load_cassette(path)
+        self.speed = speed
+        self.strict = strict
+        self._used = [False] * len(self.exchanges)
+        self._lock = threading.Lock()
+
+    def next_for(self, request: httpx.Request) -> dict[str, Any]:
+        """Return the first unused exchange recorded for this request."""
+        with self._lock:
+            for i, exchange in enumerate(self.exchanges):
+                recorded = exchange["request"]
+                if self._used[i] or (recorded["method"], recorded["path"]) != (
+                    request.method,
+                    request.url.path,
+                ):
+                    continue
+                if self.strict and recorded["body"] != _request_body(request):
+                    raise ReplayError(
+                        f"Request {i} to {request.url.path} differs from the "
+                        f"recorded request"
+                    )
+                self._used[i] = True
+                return exchange
+        raise ReplayError(
+            f"No recorded exchange left for {request.method} {request.url.path}"
+        )
+
+    @property
+    def remaining(self) -> int:
+        """Number of exchanges not replayed yet."""
+        return self._used.count(False)
+
+    def delays(self, exchange: dict[str, Any]) -> Iterator[tuple[float, bytes]]:
+        """Yield (seconds to wait, data) for each recorded body chunk."""
+        elapsed = exchange["response"]["headers_delay"]
+        for delay, data in exchange["response"]["chunks"]:
+            wait = max(delay - elapsed, 0.0) * self.speed
+            elapsed = delay
+            yield wait, base64.b64decode(data)
+
+
+def _response(exchange: dict[str, Any], stream: Any) -> httpx.Response:
+    recorded = exchange["response"]
+    return httpx.Response(
+        status_code=recorded["status"],
+        headers=[tuple(header) for header in recorded["headers"]],
+        stream=stream,
+    )
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks: Iterator[tuple[float, bytes]]) -> None:
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        for wait, data in self._chunks:
+            if wait:
+                time.sleep(wait)
+            yield data
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: Iterator[tuple[float, bytes]]) -> None:
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for wait, data in self._chunks:
+            if wait:
+                await asyncio.sleep(wait)
+            yield data
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Serves recorded exchanges instead of calling the network.
+
+    Requests are matched to exchanges by method and path, in recording order.
+    """
+
+    def __init__(self, path: Path, speed: float = 0.0, strict: bool = False):
+        """Load a cassette for replay.
+
+        Args:
+            path: The cassette to replay.
+            speed: 1.0 replays at the recorded timing (0.5 twice as fast);
+                0 replays as fast as possible.
+            strict: Raise `ReplayError` when a request body differs from the
+                recorded one.
+        """
+        self.cassette = _Cassette(path, speed, strict)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        exchange = self.cassette.next_for(request)
+        headers_delay = exchange["response"]["headers_delay"] * self.cassette.speed
+        if headers_delay:
+            time.sleep(headers_delay)
+        return _response(exchange, _ReplayStream(self.cassette.delays(exchange)))
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """Async version of `ReplayTransport`."""
+
+    def __init__(self, path: Path, speed: float = 0.0, strict: bool = False):
+        """Load a cassette for replay.
+
+        Args:
+            path: The cassette to replay.
+            speed: 1.0 replays at the recorded timing; 0 as fast as possible.
+            strict: Raise `ReplayError` when a request body differs from the
+                recorded one.
+        """
+        self.cassette = _Cassette(path, speed, strict)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        exchange = self.cassette.next_for(request)
+        headers_delay = exchange["response"]["headers_delay"] * self.cassette.speed
+        if headers_delay:
+            await asyncio.sleep(headers_delay)
+        return _response(exchange, _AsyncReplayStream(self.cassette.delays(exchange)))
+
+
+def replay_mode() -> str | None:
+    """Return "record" or "replay" when a cassette is configured, else None.
+
+    Raises:
+        ValueError: If VECNA_CASSETTE_MODE is not "record" or "replay".
+    """
+    if not os.environ.get("VECNA_CASSETTE"):
+        return None
+    mode = os.environ.get("VECNA_CASSETTE_MODE", "replay")
+    if mode not in ("record", "replay"):
+        raise ValueError(
+            f"VECNA_CASSETTE_MODE must be 'record' or 'replay', not '{mode}'"
+        )
+    return mode
+
+
+def transport_from_env(
+    transport: httpx.BaseTransport | None = None,
+) -> httpx.BaseTransport | None:
+    """Return the transport selected by VECNA_CASSETTE, if any.
+
+    Args:
+        transport: The network transport a recording is made through.
+    """
+    mode = replay_mode()
+    if mode is None:
+        return None
+    path = Path(os.environ["VECNA_CASSETTE"])
+    if mode == "record":
+        return RecordingTransport(path, transport)
+    return ReplayTransport(path, speed=float(os.environ.get("VECNA_REPLAY_SPEED", 0)))
+
+
+def async_transport_from_env(
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> httpx.AsyncBaseTransport | None:
+    """Return the async transport selected by VECNA_CASSETTE, if any.
+
+    Args:
+        transport: The network transport a recording is made through.
+    """
+    mode = replay_mode()
+    if mode is None:
+        return None
+    path = Path(os.environ["VECNA_CASSETTE"])
+    if mode == "record":
+        return AsyncRecordingTransport(path, transport)
+    return AsyncReplayTransport(
+        path, speed=float(os.environ.get("VECNA_REPLAY_SPEED", 0))
+    )
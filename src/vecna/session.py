@@ -0,0 +1,311 @@
+"""Session persistence - an append-only log of each conversation.
+
+Every session is a directory holding `log.jsonl`, with one record per line,
+and a `blobs/` directory for large tool results. After each turn the agent
+appends the messages added since the last sync. Nothing is ever rewritten,
+so saving a turn costs the same however long the session is.
+
+History compaction edits earlier messages in place (stubbing old tool
+results, replacing old turns with a summary), which an append of new
+messages can't express. After a compaction the whole, now smaller history
+is appended as a snapshot record instead. Resuming only parses the records
+after the last snapshot: the earlier lines are skipped without being
+decoded.
+
+Sessions that are never compacted get snapshots too, as checkpoints: once
+enough messages were appended since the last snapshot, the next sync writes
+one. Decoding one snapshot record is several times faster than decoding its
+messages one record at a time. Checkpoints are spaced further apart as the
+history grows, so the log stays within a small multiple of its size.
+
+Tool results longer than `BLOB_THRESHOLD` characters are stored out of line,
+named by the SHA-256 of their content, so they are written once and keep
+the log small. They are read back when the session is resumed rather than
+when first needed: the next request sends the whole history, so every
+result in it is needed right away anyway. What resuming avoids is reading
+the results that earlier turns had and a compaction dropped.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+from typing import Any
+
+# Tool results longer than this (in characters) are stored as blobs
+BLOB_THRESHOLD = 4096
+
+# A checkpoint is written once this many messages were appended since the
+# last snapshot, or `CHECKPOINT_FRACTION` of that snapshot's messages if more
+CHECKPOINT_MESSAGES = 256
+CHECKPOINT_FRACTION = 0.25
+
+LOG_NAME = "log.jsonl"
+
+_SNAPSHOT_PREFIX = b'{"type": "snapshot"'
+
+
+class SessionError(Exception):
+    """Raised when a session can't be found or read."""
+
+    pass
+
+
+def default_sessions_dir() -> Path:
+    """Return where sessions are stored (VECNA_SESSIONS_DIR overrides)."""
+    configured = os.environ.get("VECNA_SESSIONS_DIR")
+    if configured:
+        return Path(configured)
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / "vecna" / "sessions"
+
+
+def new_session_id() -> str:
+    """Return a new session id that sorts by creation time."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+class Session:
+    """An append-only session log on disk.
+
+    Use `Session.create()` for a new session and `Session.open()` to resume
+    one; then call `sync()` after each turn and `load_messages()` on resume.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        """Wrap an existing session directory.
+
+        Args:
+            directory: The session's directory.
+        """
+        self.directory = directory
+        self.id = directory.name
+        self.log_path = directory / LOG_NAME
+        self.blob_dir = directory / "blobs"
+        # Messages of the in-memory history already in the log
+        self._synced = 0
+        self._compactions = 0
+        # Messages in the log's last snapshot, and in records after it
+        self._snapshot_size = 0
+        self._since_snapshot = 0
+        # Whether the log is known to end with a complete line
+        self._tail_checked = False
+
+    @classmethod
+    def create(
+        cls, sessions_dir: Path | None = None, meta: dict[str, Any] | None = None
+    ) -> "Session":
+        """Start a new session.
+
+        Args:
+            sessions_dir: Where sessions are stored (defaults to
+                `default_sessions_dir()`).
+            meta: Extra fields for the session's first record (e.g. the
+                working directory).
+        """
+        directory = (sessions_dir or default_sessions_dir()) / new_session_id()
+        directory.mkdir(parents=True)
+        session = cls(directory)
+        record = {"type": "meta", "id": session.id, "created": time.time()}
+        session._append([{**record, **(meta or {})}])
+        return session
+
+    @classmethod
+    def open(cls, session_id: str, sessions_dir: Path | None = None) -> "Session":
+        """Open an existing session.
+
+        Args:
+            session_id: The session's id, or "latest" for the newest one.
+            sessions_dir: Where sessions are stored.
+
+        Raises:
+            SessionError: If there is no such session.
+        """
+        sessions_dir = sessions_dir or default_sessions_dir()
+        if session_id == "latest":
+            ids = list_sessions(sessions_dir)
+            if not ids:
+                raise SessionError("No sessions to resume")
+            session_id = ids[-1]
+        directory = sessions_dir / session_id
+        if "/" in session_id or not (directory / LOG_NAME).is_file():
+            raise SessionError(f"Session not found: {session_id}")
+        return cls(directory)
+
+    def load_meta(self) -> dict[str, Any]:
+        """Load the session's first record, with the fields given to `create()`.
+
+        Only the first line of the log is read.
+
+        Returns:
+            The record, or an empty dict if it can't be decoded.
+
+        Raises:
+            SessionError: If the log can't be read.
+        """
+        try:
+            with open(self.log_path, "rb") as f:
+                line = f.readline()
+        except OSError as e:
+            raise SessionError(f"Can't read session {self.id}: {e}") from e
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return {}
+        return record if record.get("type") == "meta" else {}
+
+    def load_messages(self) -> list[dict[str, Any]]:
+        """Load the conversation for resuming.
+
+        Only the records after the last snapshot (or checkpoint) are
+        decoded, and only the blobs they refer to are read.
+
+        Returns:
+            The messages, in API format.
+        """
+        try:
+            data = self.log_path.read_bytes()
+        except OSError as e:
+            raise SessionError(f"Can't read session {self.id}: {e}") from e
+
+        messages: list[dict[str, Any]] = []
+        snapshot_size = 0
+        start = 0
+        end = len(data)
+        while (found := data.rfind(b"\n" + _SNAPSHOT_PREFIX, 0, end)) != -1:
+            line_end = data.find(b"\n", found + 1)
+            if line_end == -1:
+                line_end = len(data)
+            try:
+                record = json.loads(data[found + 1 : line_end])
+            except ValueError:
+                # A snapshot cut short by a crash; the history it held is
+                # still in the records before it
+                end = found
+                continue
+            messages = [self._inflate(m) for m in record["messages"]]
+            snapshot_size = len(messages)
+            start = line_end + 1
+            break
+
+        for line in data[start:].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash mid-write; later lines are intact
+                continue
+            if record["type"] == "message":
+                messages.append(self._inflate(record["message"]))
+            elif record["type"] == "snapshot":
+                messages = [self._inflate(m) for m in record["messages"]]
+                snapshot_size = len(messages)
+
+        self._synced = len(messages)
+        self._snapshot_size = snapshot_size
+        self._since_snapshot = len(messages) - snapshot_size
+        return messages
+
+    def sync(self, messages: list[dict[str, Any]], compactions: int = 0) -> None:
+        """Append what changed in the history since the last sync.
+
+        Args:
+            messages: The agent's full message history.
+            compactions: How many compactions the history has had; when it
+                changes, a snapshot is written instead of new messages.
+        """
+        new = messages[self._synced :]
+        checkpoint = max(CHECKPOINT_MESSAGES, self._snapshot_size * CHECKPOINT_FRACTION)
+        if (
+            compactions != self._compactions
+            or len(messages) < self._synced
+            or self._since_snapshot + len(new) >= checkpoint
+        ):
+            record = {
+                "type": "snapshot",
+                "messages": [self._deflate(m) for m in messages],
+            }
+            self._append([record])
+            self._compactions = compactions
+            self._snapshot_size = len(messages)
+            self._since_snapshot = 0
+        else:
+            if not new:
+                return
+            self._append(
+                [{"type": "message", "message": self._deflate(m)} for m in new]
+            )
+            self._since_snapshot += len(new)
+        self._synced = len(messages)
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        """Append records with a single write, after any line left unfinished."""
+        payload = "".join(json.dumps(record) + "\n" for record in records)
+        with open(self.log_path, "a+", encoding="utf-8") as f:
+            # Only a crash can leave a line unfinished, and this session's
+            # own writes end their lines, so the tail is checked once
+            if not self._tail_checked and f.tell() > 0:
+                f.seek(f.tell() - 1)
+                if f.read(1) != "\n":
+                    payload = "\n" + payload
+            self._tail_checked = True
+            f.write(payload)
+
+    def _deflate(self, message: dict[str, Any]) -> dict[str, Any]:
+        """Move large tool results out of a message into blobs."""
+        content = message["content"]
+        if isinstance(content, str):
+            return message
+        blocks = []
+        for block in content:
+            result = block.get("content")
+            if (
+                block.get("type") == "tool_result"
+                and isinstance(result, str)
+                and len(result) > BLOB_THRESHOLD
+            ):
+                block = {k: v for k, v in block.items() if k != "content"}
+                block["content_blob"] = self._write_blob(result)
+            blocks.append(block)
+        return {**message, "content": blocks}
+
+    def _inflate(self, message: dict[str, Any]) -> dict[str, Any]:
+        """Restore tool results stored as blobs."""
+        content = message["content"]
+        if isinstance(content, str):
+            return message
+        for block in content:
+            digest = block.pop("content_blob", None)
+            if digest is not None:
+                block["content"] = self._read_blob(digest)
+        return message
+
+    def _write_blob(self, text: str) -> str:
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_dir / f"{digest}.txt"
+        if not path.exists():
+            self.blob_dir.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f".{secrets.token_hex(4)}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_blob(self, digest: str) -> str:
+        try:
+            return (self.blob_dir / f"{digest}.txt").read_text(encoding="utf-8")
+        except OSError:
+            return f"(tool result {digest[:12]} is missing from the session)"
+
+
+def list_sessions(sessions_dir: Path | None = None) -> list[str]:
+    """Return the ids of all stored sessions, oldest first."""
+    sessions_dir = sessions_dir or default_sessions_dir()
+    try:
+        entries = list(os.scandir(sessions_dir))
+    except OSError:
+        return []
+    return sorted(entry.name for entry in entries if entry.is_dir())
@@ -0,0 +1,294 @@
+"""Turn statistics - where the time of each turn goes.
+
+The agent reports the timing of every API call and tool call in a turn to a
+`StatsRecorder`, and the CLI adds the time spent rendering. When a turn ends
+its `TurnStats` are kept for the `stats` command, appended to a JSONL trace
+file if one is configured (VECNA_TRACE_FILE), and passed to every registered
+hook, so metrics can be forwarded to other collectors.
+"""
+
+import json
+import statistics
+import threading
+import time
+import warnings
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+# Finished turns kept in memory for the summary
+DEFAULT_KEEP_TURNS = 1000
+
+
+@dataclass
+class ToolTiming:
+    """How long one tool call took."""
+
+    call_id: str
+    name: str
+    seconds: float
+
+
+@dataclass
+class TurnStats:
+    """Timing and token counts of one turn (a user message and its reply).
+
+    Times are in seconds. `ttft` is measured from the user message to the
+    first streamed text, and is None when nothing was streamed.
+    `tokens_per_second` is output tokens over the time spent generating
+    them, from the first token (or the request, when nothing streamed) to the
+    end of each API call. A cancelled turn counts only the API calls that
+    finished.
+    """
+
+    turn: int
+    started_at: float
+    latency: float = 0.0
+    ttft: float | None = None
+    api_calls: int = 0
+    api_time: float = 0.0
+    generation_time: float = 0.0
+    tokens_per_second: float | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    tools: list[ToolTiming] = field(default_factory=list)
+    render_time: float = 0.0
+    retries: int = 0
+    cancelled: bool = False
+
+    @property
+    def tool_time(self) -> float:
+        """Total time spent in tool calls (they may overlap)."""
+        return sum(tool.seconds for tool in self.tools)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the stats as a JSON-serializable dict."""
+        return {**asdict(self), "tool_time": self.tool_time}
+
+
+type StatsHook = Callable[[TurnStats], None]
+
+# The recorder of the turn running in the current thread or task
+_active: ContextVar["StatsRecorder | None"] = ContextVar("vecna_stats", default=None)
+
+
+def record_retry(status: int) -> None:
+    """Count a retried API request against the turn that made it.
+
+    Args:
+        status: The status code that was retried (0 for a failed connection).
+    """
+    recorder = _active.get()
+    if recorder is not None:
+        recorder.record_retry(status)
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _distribution(values: list[float]) -> dict[str, float] | None:
+    if not values:
+        return None
+    return {
+        "mean": statistics.fmean(values),
+        "p50": _percentile(values, 0.5),
+        "p95": _percentile(values, 0.95),
+        "max": max(values),
+    }
+
+
+class StatsRecorder:
+    """Collects per-turn timings and publishes each turn when it ends.
+
+    Tool timings may be reported from worker threads; everything else is
+    reported from the thread running the turn.
+    """
+
+    def __init__(
+        self,
+        trace_file: Path | str | None = None,
+        hooks: list[StatsHook] | None = None,
+        keep_turns: int = DEFAULT_KEEP_TURNS,
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            trace_file: A JSONL file each finished turn is appended to.
+            hooks: Callables given each finished turn's stats.
+            keep_turns: Finished turns kept in memory for `summary()`.
+        """
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.hooks: list[StatsHook] = list(hooks or [])
+        self.turns: deque[TurnStats] = deque(maxlen=keep_turns)
+        self.current: TurnStats | None = None
+        self._turn_count = 0
+        self._turn_start = 0.0
+        self._call_start = 0.0
+        self._call_first_token: float | None = None
+        self._deferred = 0
+        self._pending: list[TurnStats] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: StatsHook) -> None:
+        """Register a callable to receive each finished turn."""
+        self.hooks.append(hook)
+
+    @property
+    def last(self) -> TurnStats | None:
+        """The most recent finished turn."""
+        if self._pending:
+            return self._pending[-1]
+        return self.turns[-1] if self.turns else None
+
+    def start_turn(self) -> None:
+        """Start timing a new turn."""
+        self._turn_count += 1
+        self._turn_start = time.perf_counter()
+        self.current = TurnStats(turn=self._turn_count, started_at=time.time())
+        # Requests made from here on in this thread or task belong to the turn
+        _active.set(self)
+
+    def start_call(self) -> None:
+        """Mark the start of an API call."""
+        self._call_start = time.perf_counter()
+        self._call_first_token = None
+
+    def first_token(self) -> None:
+        """Mark the arrival of streamed text (only the first one counts)."""
+        if self._call_first_token is not None or self.current is None:
+            return
+        now = time.perf_counter()
+        self._call_first_token = now
+        if self.current.ttft is None:
+            self.current.ttft = now - self._turn_start
+
+    def end_call(self) -> None:
+        """Mark the end of an API call."""
+        if self.current is None:
+            return
+        now = time.perf_counter()
+        self.current.api_calls += 1
+        self.current.api_time += now - self._call_start
+        self.current.generation_time += now - (
+            self._call_first_token or self._call_start
+        )
+
+    def record_tool(self, call_id: str, name: str, seconds: float) -> None:
+        """Record a finished tool call (safe to call from any thread)."""
+        with self._lock:
+            if self.current is not None:
+                self.current.tools.append(ToolTiming(call_id, name, seconds))
+
+    def record_retry(self, status: int) -> None:
+        """Count a retried API request of the current turn."""
+        with self._lock:
+            if self.current is not None:
+                self.current.retries += 1
+
+    def add_render_time(self, seconds: float) -> None:
+        """Add time spent rendering to the current (or just finished) turn."""
+        turn = self.current or (self._pending[-1] if self._pending else None)
+        if turn is not None:
+            turn.render_time += seconds
+
+    def end_turn(self, usage: dict[str, int]) -> TurnStats | None:
+        """Finish the current turn and publish its stats.
+
+        Args:
+            usage: The turn's token usage, summed over its API calls.
+
+        Returns:
+            The finished turn's stats.
+        """
+        turn = self.current
+        if turn is None:
+            return None
+        self.current = None
+        turn.latency = time.perf_counter() - self._turn_start
+        turn.input_tokens = usage.get("input_tokens", 0)
+        turn.output_tokens = usage.get("output_tokens", 0)
+        turn.cache_read_input_tokens = usage.get("cache_read_input_tokens", 0)
+        turn.cache_creation_input_tokens = usage.get("cache_creation_input_tokens", 0)
+        if turn.generation_time > 0:
+            turn.tokens_per_second = turn.output_tokens / turn.generation_time
+
+        if self._deferred:
+            self._pending.append(turn)
+        else:
+            self._publish(turn)
+        return turn
+
+    @contextmanager
+    def deferred(self) -> Iterator[None]:
+        """Hold back publishing turns that end inside the block.
+
+        Lets the caller add work done after the agent returns, such as the
+        final frame of a streamed reply, before the turn is published.
+        """
+        self._deferred += 1
+        try:
+            yield
+        finally:
+            self._deferred -= 1
+            if not self._deferred:
+                pending, self._pending = self._pending, []
+                for turn in pending:
+                    self._publish(turn)
+
+    def _publish(self, turn: TurnStats) -> None:
+        self.turns.append(turn)
+        if self.trace_file is not None:
+            line = json.dumps(turn.to_dict()) + "\n"
+            try:
+                with open(self.trace_file, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                warnings.warn(f"Could not write trace file: {e}", stacklevel=2)
+        for hook in self.hooks:
+            try:
+                hook(turn)
+            except Exception as e:
+                # A failing collector must not break the session
+                warnings.warn(f"Stats hook {hook!r} failed: {e}", stacklevel=2)
+
+    def summary(self) -> dict[str, Any]:
+        """Aggregate the finished turns.
+
+        Returns:
+            Turn count, latency/TTFT/throughput distributions, token and
+            retry totals, and per-tool call counts and times.
+        """
+        turns = list(self.turns)
+        tools: dict[str, dict[str, float]] = {}
+        for turn in turns:
+            for tool in turn.tools:
+                entry = tools.setdefault(tool.name, {"calls": 0, "seconds": 0.0})
+                entry["calls"] += 1
+                entry["seconds"] += tool.seconds
+        return {
+            "turns": len(turns),
+            "latency": _distribution([t.latency for t in turns]),
+            "ttft": _distribution([t.ttft for t in turns if t.ttft is not None]),
+            "tokens_per_second": _distribution(
+                [t.tokens_per_second for t in turns if t.tokens_per_second]
+            ),
+            "input_tokens": sum(t.input_tokens for t in turns),
+            "output_tokens": sum(t.output_tokens for t in turns),
+            "cache_read_input_tokens": sum(t.cache_read_input_tokens for t in turns),
+            "cache_creation_input_tokens": sum(
+                t.cache_creation_input_tokens for t in turns
+            ),
+            "api_time": sum(t.api_time for t in turns),
+            "tool_time": sum(t.tool_time for t in turns),
+            "render_time": sum(t.render_time for t in turns),
+            "retries": sum(t.retries for t in turns),
+            "tools": tools,
+        }
@@ -1,7 +1,17 @@
 """Tools package - contains all tools available to the agent."""
 
-from vecna.tools.base import Tool, tool_to_anthropic_format
+from vecna.tools.base import Tool, ToolCall, ToolOutput, tool_to_anthropic_format
 from vecna.tools.exceptions import PathSecurityError
 from vecna.tools.registry import ToolRegistry
+from vecna.tools.schema import SchemaError, compile_schema
 
-__all__ = ["PathSecurityError", "Tool", "ToolRegistry", "tool_to_anthropic_format"]
+__all__ = [
+    "PathSecurityError",
+    "SchemaError",
+    "Tool",
+    "ToolCall",
+    "ToolOutput",
+    "ToolRegistry",
+    "compile_schema",
+    "tool_to_anthropic_format",
+]
@@ -2,8 +2,15 @@
 Base classes for tools
 """
 
+from collections.abc import Iterable
 from typing import Any, Protocol
 
+# A tool invocation requested by the model: (tool_use_id, name, arguments)
+type ToolCall = tuple[str, str, dict[str, Any]]
+
+# What a tool returns: the whole result, or the result in chunks
+type ToolOutput = str | Iterable[str]
+
 
 class Tool(Protocol):
     """Protocol that all tools must follow.
@@ -13,6 +20,10 @@ class Tool(Protocol):
     - description: What it does (shown to Claude)
     - parameters: JSON Schema describing the inputs
     - execute(): Method that performs the action
+
+    Tools whose results refer back to earlier results may also define
+    `forget_results()`, which the registry calls when those may have left
+    the model's context.
     """
 
     @property
@@ -30,14 +41,16 @@ class Tool(Protocol):
         """JSON Schema for the tool's parameters"""
         pass
 
-    def execute(self, **kwargs: Any) -> str:
+    def execute(self, **kwargs: Any) -> ToolOutput:
         """Execute the tool with the given arguments
 
         Args:
             **kwargs: The parameters defined in the schema
 
         Returns:
-            A string result to show to the LLM.
+            A string result to show to the LLM, or an iterable of string
+            chunks for results that may be large. The registry truncates
+            either to its output budget.
         """
         pass
 
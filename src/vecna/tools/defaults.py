@@ -0,0 +1,57 @@
+"""The standard tool set given to the agent."""
+
+from pathlib import Path
+
+from vecna.tools.file_read import FileReadTool
+from vecna.tools.glob import GlobTool
+from vecna.tools.grep import GrepTool
+from vecna.tools.read_files import ReadFilesTool
+from vecna.tools.registry import ToolRegistry
+from vecna.tools.seen_files import SeenFiles
+
+
+def default_tools(
+    working_dir: Path,
+    workers: int = 0,
+    diff_rereads: bool = False,
+    parallel_search: bool = True,
+) -> ToolRegistry:
+    """Create a registry with the standard tools rooted in `working_dir`.
+
+    Args:
+        working_dir: The directory the tools may read and search.
+        workers: Size of a worker pool for the search tools (0 runs every
+            tool in this process). Glob and grep can take long on big trees,
+            so they run in the pool, where they can time out and be
+            cancelled; file reads are cheap and served from this process's
+            cache, so they stay in process.
+        diff_rereads: Answer re-reads of files the model has already seen
+            with a diff (see `vecna.tools.seen_files`). The registry must
+            then serve a single conversation.
+        parallel_search: Let grep fan large searches out over its own
+            process pool. Pool workers build their tools without it, since
+            they can't start processes of their own.
+
+    Returns:
+        A registry with the file read, multi-file read, glob and grep tools.
+    """
+    pool = None
+    if workers > 0:
+        from vecna.tools.workers import WorkerPool
+
+        pool = WorkerPool(_worker_tools, working_dir, size=workers)
+    tools = ToolRegistry(pool=pool)
+    seen = SeenFiles(max_output_chars=tools.max_output_chars) if diff_rereads else None
+    tools.register(FileReadTool(working_dir=working_dir, seen=seen))
+    tools.register(ReadFilesTool(working_dir=working_dir, seen=seen))
+    tools.register(GlobTool(working_dir=working_dir), isolated=pool is not None)
+    tools.register(
+        GrepTool(working_dir=working_dir, parallel=parallel_search),
+        isolated=pool is not None,
+    )
+    return tools
+
+
+def _worker_tools(working_dir: Path) -> ToolRegistry:
+    """Build the tools of a worker in the pool `default_tools` starts."""
+    return default_tools(working_dir, parallel_search=False)
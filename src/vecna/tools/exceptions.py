@@ -5,3 +5,21 @@ class PathSecurityError(Exception):
     """Raised when a path attempts to escape the working directory."""
 
     pass
+
+
+class ToolWorkerError(Exception):
+    """Raised when a tool run in a worker process fails or its worker dies."""
+
+    pass
+
+
+class ToolTimeoutError(ToolWorkerError):
+    """Raised when a tool in a worker process runs past its timeout."""
+
+    pass
+
+
+class ToolCancelledError(ToolWorkerError):
+    """Raised when a tool in a worker process is cancelled."""
+
+    pass
@@ -0,0 +1,172 @@
+"""File cache - keeps recently read files in memory.
+
+The agent often reads the same file several times in a session. The cache
+holds each file's decoded text and its formatted tool output, so a repeated
+read costs one `stat()` instead of a read, a decode and a format.
+
+Entries are validated against the file's (st_mtime_ns, st_size, st_ino) on
+every lookup, so a file changed on disk is never served stale. Tools that
+write files should also call `invalidate()` explicitly, since a write within
+the filesystem's timestamp granularity may keep the same mtime and size.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from pathlib import Path
+
+# Default memory budget of a cache, in bytes (approximated by characters)
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+type FileSignature = tuple[int, int, int]
+
+
+def file_signature(stat: os.stat_result) -> FileSignature:
+    """Return the fields that identify a version of a file."""
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class CacheEntry:
+    """One cached file version: its decoded text and formatted outputs."""
+
+    def __init__(self, signature: FileSignature, text: str | None) -> None:
+        self.signature = signature
+        self.text = text
+        self.formatted: dict[Hashable, str] = {}
+
+    @property
+    def size(self) -> int:
+        """Approximate memory held by the entry."""
+        text_size = len(self.text) if self.text is not None else 0
+        return text_size + sum(len(output) for output in self.formatted.values())
+
+
+class FileCache:
+    """An LRU cache of file contents with a memory budget.
+
+    Keys are resolved paths; each entry remembers the file signature it was
+    read at. Thread-safe, so tools running concurrently can share it.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_bytes: Memory budget for all entries.
+        """
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Path, CacheEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: Path, signature: FileSignature) -> CacheEntry | None:
+        """Look up a file, dropping the entry if the file has changed.
+
+        Args:
+            path: The resolved file path.
+            signature: The file's current signature.
+
+        Returns:
+            The cached entry, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature != signature:
+                self._remove(path)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry
+
+    def put_text(self, path: Path, signature: FileSignature, text: str) -> None:
+        """Store a file's decoded text."""
+        with self._lock:
+            entry = self._entry_for(path, signature)
+            self._size -= entry.size
+            entry.text = text
+            self._size += entry.size
+            self._evict()
+
+    def put_formatted(
+        self, path: Path, signature: FileSignature, key: Hashable, output: str
+    ) -> None:
+        """Store a formatted tool output for a file.
+
+        Args:
+            path: The resolved file path.
+            signature: The signature of the file version that was formatted.
+            key: What distinguishes this output (e.g. the line window).
+            output: The formatted output.
+        """
+        with self._lock:
+            entry = self._entry_for(path, signature)
+            self._size -= entry.size
+            entry.formatted[key] = output
+            self._size += entry.size
+            self._evict()
+
+    def invalidate(self, path: Path | None = None) -> None:
+        """Drop a file from the cache, or everything when no path is given."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._size = 0
+            elif path in self._entries:
+                self._remove(path)
+
+    @property
+    def size(self) -> int:
+        """Approximate memory held by all entries."""
+        return self._size
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss/eviction counters and current usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
+
+    def _entry_for(self, path: Path, signature: FileSignature) -> CacheEntry:
+        """Return the entry for this file version, replacing an older one."""
+        entry = self._entries.get(path)
+        if entry is None or entry.signature != signature:
+            if entry is not None:
+                self._remove(path)
+            entry = CacheEntry(signature, None)
+            self._entries[path] = entry
+        self._entries.move_to_end(path)
+        return entry
+
+    def _remove(self, path: Path) -> None:
+        self._size -= self._entries.pop(path).size
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until within budget."""
+        while self._size > self.max_bytes and self._entries:
+            path = next(iter(self._entries))
+            self._remove(path)
+            self.evictions += 1
+
+
+_caches: dict[Path, FileCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_file_cache(working_dir: Path) -> FileCache:
+    """Return the cache shared by all tools rooted in a working directory."""
+    working_dir = working_dir.resolve()
+    with _caches_lock:
+        cache = _caches.get(working_dir)
+        if cache is None:
+            cache = _caches[working_dir] = FileCache()
+        return cache
@@ -1,10 +1,37 @@
 """File read tool - safely reads files from the working directory."""
 
+import os
+import stat
 from pathlib import Path
 from typing import Any
 
 from vecna.tools.exceptions import PathSecurityError
-from vecna.tools.utils import format_file_contents, validate_path
+from vecna.tools.file_cache import (
+    CacheEntry,
+    FileCache,
+    FileSignature,
+    file_signature,
+    get_file_cache,
+)
+from vecna.tools.path_resolver import get_path_resolver
+from vecna.tools.seen_files import SeenFiles
+from vecna.tools.sniff import (
+    BINARY_SNIFF_BYTES,
+    decode_text,
+    describe_binary,
+    is_ascii_compatible,
+    sniff_bytes,
+    sniff_file,
+)
+from vecna.tools.utils import (
+    COUNT_LINES_LIMIT,
+    DEFAULT_MAX_LINES,
+    MMAP_THRESHOLD,
+    count_file_lines,
+    format_lines,
+    read_lines,
+    split_lines,
+)
 
 
 class FileReadTool:
@@ -13,15 +40,39 @@ class FileReadTool:
     Security:
     - Only reads files within the working directory
     - Validates paths to prevent traversal attacks
+
+    Large files are read as a window of lines (`offset`/`limit`) without
+    loading the rest of the file. Small files are cached (see `FileCache`),
+    shared with every tool rooted in the same working directory.
+
+    Each file's first bytes are sniffed before it is decoded (see
+    `vecna.tools.sniff`): binary files are summarized rather than read, and
+    text is decoded in the encoding its byte order mark or contents suggest.
+
+    Given a `SeenFiles` record, a read of a window the model has already
+    seen returns only what changed since (see `vecna.tools.seen_files`).
     """
 
-    def __init__(self, working_dir: Path) -> None:
+    def __init__(
+        self,
+        working_dir: Path,
+        cache: FileCache | None = None,
+        seen: SeenFiles | None = None,
+    ) -> None:
         """Initialize with the working directory.
 
         Args:
             working_dir: The directory to restrict file access to.
+            cache: The file cache to use (defaults to the one shared by
+                tools in `working_dir`).
+            seen: The reads the model has seen in this conversation, to
+                answer re-reads with a diff (optional; must not be shared
+                between conversations).
         """
         self.working_dir = working_dir.resolve()
+        self.cache = cache or get_file_cache(self.working_dir)
+        self.resolver = get_path_resolver(self.working_dir)
+        self.seen = seen
 
     @property
     def name(self) -> str:
@@ -31,7 +82,9 @@ class FileReadTool:
     def description(self) -> str:
         return (
             "Read the contents of a file at the specified path. "
-            "The path must be relative to the working directory."
+            "The path must be relative to the working directory. "
+            f"Returns up to {DEFAULT_MAX_LINES} lines; use offset and limit "
+            "to read other parts of large files."
         )
 
     @property
@@ -45,43 +98,151 @@ class FileReadTool:
                         "Path to the file to read, relative to working directory. "
                         "Example: 'src/main.py' or 'README.md'"
                     ),
-                }
+                },
+                "offset": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Line number to start reading from (1-based).",
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": (
+                        "Maximum number of lines to read "
+                        f"(default {DEFAULT_MAX_LINES})."
+                    ),
+                },
+                "count_lines": {
+                    "type": "boolean",
+                    "description": (
+                        "Count the file's total lines even when it is very large."
+                    ),
+                },
             },
             "required": ["path"],
         }
 
-    def execute(self, path: str) -> str:
+    def execute(
+        self,
+        path: str,
+        offset: int = 1,
+        limit: int = DEFAULT_MAX_LINES,
+        count_lines: bool = False,
+    ) -> str:
         """Read a file and return its contents.
 
         Args:
             path: Path to the file (relative to working directory).
+            offset: First line to read (1-based).
+            limit: Maximum number of lines to read.
+            count_lines: Count total lines even for files too large to count
+                cheaply.
 
         Returns:
             Formatted file contents with line numbers, or an error message.
         """
         try:
             # Validate the path
-            resolved_path = validate_path(path, self.working_dir)
+            resolved_path = self.resolver.resolve(path)
 
-            # Check if file exists
-            if not resolved_path.exists():
+            # Check that the file exists and is a regular file
+            try:
+                file_stat = resolved_path.stat()
+            except FileNotFoundError:
                 return f"Error: File not found: {path}"
-
-            # Check if it's actually a file
-            if not resolved_path.is_file():
+            if not stat.S_ISREG(file_stat.st_mode):
                 return f"Error: Not a file: {path}"
 
-            # Read the file
-            contents = resolved_path.read_text()
-
-            # Format and return
-            return format_file_contents(resolved_path.name, contents)
+            offset = max(int(offset), 1)
+            limit = max(int(limit), 1)
+            window = (offset, limit, bool(count_lines))
+
+            # Serve repeated reads of an unchanged file from the cache
+            signature = file_signature(file_stat)
+            entry = self.cache.get(resolved_path, signature)
+            if entry is not None and window in entry.formatted:
+                output = entry.formatted[window]
+            elif file_stat.st_size < MMAP_THRESHOLD:
+                output = self._read_small(resolved_path, signature, entry, window)
+                self.cache.put_formatted(resolved_path, signature, window, output)
+            else:
+                output = self._read_window(resolved_path, file_stat, window)
+                self.cache.put_formatted(resolved_path, signature, window, output)
+
+            if self.seen is not None:
+                return self.seen.report(resolved_path, window, output)
+            return output
 
         except PathSecurityError as e:
             return str(e)
         except PermissionError:
             return f"Error: Permission denied: {path}"
-        except UnicodeDecodeError:
-            return f"Error: Cannot read binary file: {path}"
         except Exception as e:
             return f"Error reading file: {e}"
+
+    def forget_results(self) -> None:
+        """Forget the reads the model has seen, so the next ones are full."""
+        if self.seen is not None:
+            self.seen.forget()
+
+    def _read_small(
+        self,
+        resolved_path: Path,
+        signature: FileSignature,
+        entry: CacheEntry | None,
+        window: tuple[int, int, bool],
+    ) -> str:
+        """Format a window of a small file, reading it whole and caching its text."""
+        if entry is not None and entry.text is not None:
+            text = entry.text
+        else:
+            data = resolved_path.read_bytes()
+            head = data[:BINARY_SNIFF_BYTES]
+            sniffed = sniff_bytes(head, complete=len(data) == len(head))
+            if sniffed.binary:
+                return describe_binary(
+                    resolved_path.name, sniffed.kind, len(data), head
+                )
+            text = decode_text(data, sniffed.encoding)
+            self.cache.put_text(resolved_path, signature, text)
+
+        offset, limit, _ = window
+        lines = split_lines(text)
+        start = offset - 1
+        return format_lines(
+            resolved_path.name,
+            lines[start : start + limit],
+            offset,
+            len(lines),
+            more=len(lines) > start + limit,
+        )
+
+    def _read_window(
+        self,
+        resolved_path: Path,
+        file_stat: os.stat_result,
+        window: tuple[int, int, bool],
+    ) -> str:
+        """Format a window of a large file, reading only as far as needed."""
+        offset, limit, count_lines = window
+        # Only the head is read to tell a huge binary from text
+        sniffed, head = sniff_file(resolved_path)
+        if sniffed.binary:
+            return describe_binary(
+                resolved_path.name, sniffed.kind, file_stat.st_size, head
+            )
+        lines, more = read_lines(resolved_path, offset, limit, sniffed.encoding)
+
+        # A window that reached the end of the file gives the total for free
+        # (unless it started past the end); otherwise count when cheap or
+        # asked for. Counting "\n" bytes only works when the encoding writes
+        # line breaks that way
+        total_lines = None
+        if not more and (lines or offset == 1):
+            total_lines = offset - 1 + len(lines)
+        elif is_ascii_compatible(sniffed.encoding) and (
+            count_lines or file_stat.st_size <= COUNT_LINES_LIMIT
+        ):
+            total_lines = count_file_lines(resolved_path)
+
+        return format_lines(resolved_path.name, lines, offset, total_lines, more)
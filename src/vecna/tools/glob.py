@@ -0,0 +1,105 @@
+"""Glob tool - finds files in the working directory by pattern."""
+
+from pathlib import Path
+from typing import Any
+
+from vecna.tools.exceptions import PathSecurityError
+from vecna.tools.path_resolver import get_path_resolver
+from vecna.tools.workspace_index import WorkspaceIndex, get_workspace_index
+
+# Default maximum number of paths returned
+DEFAULT_GLOB_LIMIT = 200
+
+
+class GlobTool:
+    """Tool for finding files by glob pattern.
+
+    Queries are answered from the `WorkspaceIndex` of the working directory,
+    which skips files excluded by .gitignore, instead of walking the tree.
+    """
+
+    def __init__(self, working_dir: Path, index: WorkspaceIndex | None = None) -> None:
+        """Initialize with the working directory.
+
+        Args:
+            working_dir: The directory to search.
+            index: The index to query (defaults to the one shared by tools in
+                `working_dir`).
+        """
+        self.working_dir = working_dir.resolve()
+        self.index = index or get_workspace_index(self.working_dir)
+        self.resolver = get_path_resolver(self.working_dir)
+
+    @property
+    def name(self) -> str:
+        return "glob"
+
+    @property
+    def description(self) -> str:
+        return (
+            "Find files in the working directory whose paths match a glob "
+            "pattern. '*' matches within one directory and '**' across "
+            "directories, e.g. '**/*.py' or 'src/**/test_*.py'. Files ignored "
+            "by .gitignore are not listed. Use this to discover paths before "
+            "reading files."
+        )
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "pattern": {
+                    "type": "string",
+                    "description": "Glob pattern relative to the search directory.",
+                },
+                "path": {
+                    "type": "string",
+                    "description": (
+                        "Directory to search in, relative to the working "
+                        "directory (default: the working directory)."
+                    ),
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": (
+                        f"Maximum number of paths to return "
+                        f"(default {DEFAULT_GLOB_LIMIT})."
+                    ),
+                },
+            },
+            "required": ["pattern"],
+        }
+
+    def execute(
+        self, pattern: str, path: str = ".", limit: int = DEFAULT_GLOB_LIMIT
+    ) -> str:
+        """List the files matching a pattern.
+
+        Args:
+            pattern: Glob pattern, relative to `path`.
+            path: Directory to search in (relative to working directory).
+            limit: Maximum number of paths to return.
+
+        Returns:
+            Matching paths relative to the working directory, one per line.
+        """
+        try:
+            directory = self.resolver.resolve(path)
+        except PathSecurityError as e:
+            return str(e)
+
+        base = directory.relative_to(self.working_dir).as_posix()
+        if base != ".":
+            pattern = f"{base}/{pattern.removeprefix('./')}"
+
+        limit = max(int(limit), 1)
+        matches = self.index.glob(pattern, limit=limit + 1)
+        if not matches:
+            return f"No files match '{pattern}'"
+
+        output = matches[:limit]
+        if len(matches) > limit:
+            output.append(f"... (more than {limit} matches, narrow the pattern)")
+        return "\n".join(output)
@@ -0,0 +1,369 @@
+"""Grep tool - searches file contents in the working directory by regex."""
+
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from vecna.tools.exceptions import PathSecurityError
+from vecna.tools.path_resolver import PathResolver, get_path_resolver
+from vecna.tools.sniff import BINARY_SNIFF_BYTES
+from vecna.tools.trigram_index import TrigramIndex, required_trigrams
+from vecna.tools.workspace_index import WorkspaceIndex, get_workspace_index
+
+# Default maximum number of matching lines returned
+DEFAULT_MAX_RESULTS = 100
+
+# Searches over fewer files than this run in-process
+PARALLEL_THRESHOLD = 64
+
+# Files per task sent to a worker process
+BATCH_SIZE = 128
+
+# Matched lines longer than this are shortened in the output
+MAX_LINE_CHARS = 300
+
+# (path relative to working dir, line number, line text)
+type GrepMatch = tuple[str, int, str]
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_search_pool() -> ProcessPoolExecutor:
+    """Return the process pool shared by all searches, starting it on first use.
+
+    Workers are started from a fork server rather than forked from this
+    (multi-threaded) process.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1, mp_context=context
+            )
+        return _pool
+
+
+def _reset_search_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died, so the next search starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=32)
+def _compile(pattern: str, flags: int) -> re.Pattern[bytes]:
+    return re.compile(pattern.encode(), flags | re.MULTILINE)
+
+
+def _search_data(
+    data: bytes | mmap.mmap,
+    regex: re.Pattern[bytes],
+    rel_path: str,
+    matches: list[GrepMatch],
+    limit: int,
+) -> None:
+    """Append one match per matching line of a buffer."""
+    line_number = 1
+    counted_to = 0
+    pos = 0
+    size = len(data)
+    while len(matches) < limit and pos <= size:
+        match = regex.search(data, pos)
+        if match is None:
+            break
+        line_start = data.rfind(b"\n", 0, match.start()) + 1
+        line_end = data.find(b"\n", match.start())
+        if line_end == -1:
+            line_end = size
+        line_number += data[counted_to:line_start].count(b"\n")
+        counted_to = line_start
+        line = data[line_start:line_end][: MAX_LINE_CHARS * 4]
+        text = line.decode("utf-8", errors="replace").rstrip("\r")
+        matches.append((rel_path, line_number, text[:MAX_LINE_CHARS]))
+        pos = line_end + 1
+
+
+def search_files(
+    root: str, rel_paths: list[str], pattern: str, flags: int, limit: int
+) -> list[GrepMatch]:
+    """Search files for a regex, skipping binary files.
+
+    Runs in worker processes, so it only takes picklable arguments. Files
+    are mapped rather than read, so matches near the start of a large file
+    don't pull the whole file into memory.
+
+    Args:
+        root: The working directory.
+        rel_paths: Files to search, relative to root.
+        pattern: The regular expression.
+        flags: `re` flags.
+        limit: Stop after this many matches.
+
+    Returns:
+        Matches in file order, at most `limit`.
+    """
+    regex = _compile(pattern, flags)
+    matches: list[GrepMatch] = []
+    for rel_path in rel_paths:
+        try:
+            with open(os.path.join(root, rel_path), "rb") as f:
+                head = f.read(BINARY_SNIFF_BYTES)
+                if not head or b"\0" in head:
+                    continue
+                if len(head) < BINARY_SNIFF_BYTES:
+                    _search_data(head, regex, rel_path, matches, limit)
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        _search_data(data, regex, rel_path, matches, limit)
+        except (OSError, ValueError):
+            continue
+        if len(matches) >= limit:
+            break
+    return matches
+
+
+class GrepTool:
+    """Tool for searching file contents with a regular expression.
+
+    Files come from the `WorkspaceIndex` (so .gitignore is respected).
+    Indexed directories are real ones inside the working directory, so only
+    symlinked files need checking with the working directory's
+    `PathResolver`. Large searches fan out over a process pool and stop as
+    soon as enough matches arrived; if a worker of the pool dies, the pool is
+    replaced and the search retried once. An optional `TrigramIndex` skips
+    files that can't contain the pattern's literals.
+    """
+
+    def __init__(
+        self,
+        working_dir: Path,
+        index: WorkspaceIndex | None = None,
+        trigram_index: TrigramIndex | bool | None = None,
+        parallel: bool = True,
+    ) -> None:
+        """Initialize with the working directory.
+
+        Args:
+            working_dir: The directory to search.
+            index: The file index (defaults to the one shared by tools in
+                `working_dir`).
+            trigram_index: A trigram index, True to create one, or None to
+                follow VECNA_TRIGRAM_INDEX=1.
+            parallel: Fan large searches out over the search process pool.
+                Off in a `WorkerPool` worker, which can't start processes
+                of its own.
+        """
+        self.working_dir = working_dir.resolve()
+        self.index = index or get_workspace_index(self.working_dir)
+        self.resolver: PathResolver = get_path_resolver(self.working_dir)
+        if trigram_index is None:
+            trigram_index = os.environ.get("VECNA_TRIGRAM_INDEX") == "1"
+        if trigram_index is True:
+            trigram_index = TrigramIndex(self.working_dir)
+        self.trigram_index = trigram_index or None
+        self.parallel = parallel
+        # Generation of the workspace index the trigram index is synced to
+        self._generation: int | None = None
+
+    @property
+    def name(self) -> str:
+        return "grep"
+
+    @property
+    def description(self) -> str:
+        return (
+            "Search the contents of files in the working directory with a "
+            "regular expression (Python syntax). Returns matching lines as "
+            "'path:line: text'. Binary files and files ignored by .gitignore "
+            "are skipped."
+        )
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "pattern": {
+                    "type": "string",
+                    "description": "Regular expression to search for.",
+                },
+                "path": {
+                    "type": "string",
+                    "description": (
+                        "File or directory to search, relative to the working "
+                        "directory (default: the working directory)."
+                    ),
+                },
+                "glob": {
+                    "type": "string",
+                    "description": (
+                        "Only search files matching this glob, e.g. '*.py'."
+                    ),
+                },
+                "ignore_case": {
+                    "type": "boolean",
+                    "description": "Match case-insensitively.",
+                },
+                "max_results": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": (
+                        f"Maximum matching lines to return "
+                        f"(default {DEFAULT_MAX_RESULTS})."
+                    ),
+                },
+            },
+            "required": ["pattern"],
+        }
+
+    def execute(
+        self,
+        pattern: str,
+        path: str = ".",
+        glob: str = "**/*",
+        ignore_case: bool = False,
+        max_results: int = DEFAULT_MAX_RESULTS,
+    ) -> str:
+        """Search files for a pattern.
+
+        Args:
+            pattern: Regular expression to search for.
+            path: File or directory to search (relative to working directory).
+            glob: Only search files matching this glob (relative to `path`).
+            ignore_case: Match case-insensitively.
+            max_results: Maximum number of matching lines to return.
+
+        Returns:
+            Matching lines, one per line, or an error message.
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        try:
+            _compile(pattern, flags)
+        except re.error as e:
+            return f"Error: Invalid regular expression: {e}"
+        try:
+            files = self._candidate_files(path, glob)
+        except PathSecurityError as e:
+            return str(e)
+
+        limit = max(int(max_results), 1)
+        matches = list(self.iter_matches(pattern, files, flags, limit + 1))
+
+        if not matches:
+            return f"No matches for '{pattern}'"
+        output = [f"{rel}:{line}: {text}" for rel, line, text in matches[:limit]]
+        if len(matches) > limit:
+            output.append(f"... (results capped at {limit} matches)")
+        return "\n".join(output)
+
+    def iter_matches(
+        self, pattern: str, files: list[str], flags: int = 0, limit: int = 100
+    ) -> Iterator[GrepMatch]:
+        """Yield matches as soon as each batch of files has been searched.
+
+        Args:
+            pattern: Regular expression to search for.
+            files: Files to search, relative to the working directory.
+            flags: `re` flags.
+            limit: Stop after this many matches.
+        """
+        parallel = self.parallel and len(files) >= PARALLEL_THRESHOLD
+        if self.trigram_index is not None:
+            self._update_trigrams(self.trigram_index, files, parallel)
+            trigrams = required_trigrams(pattern, flags)
+            files = self.trigram_index.candidates(files, trigrams)
+
+        root = str(self.working_dir)
+        if not parallel or len(files) < PARALLEL_THRESHOLD:
+            yield from search_files(root, files, pattern, flags, limit)
+            return
+
+        # Batches run in parallel but are yielded in file order, so output is
+        # deterministic; each batch's matches stream out as soon as it is done.
+        batches = [files[i : i + BATCH_SIZE] for i in range(0, len(files), BATCH_SIZE)]
+        found = 0
+        done = 0
+        for attempt in range(2):
+            pool = get_search_pool()
+            futures = []
+            try:
+                futures = [
+                    pool.submit(search_files, root, batch, pattern, flags, limit)
+                    for batch in batches[done:]
+                ]
+                for future in futures:
+                    matches = future.result()
+                    # A retry starts after the batches already yielded
+                    done += 1
+                    for match in matches:
+                        yield match
+                        found += 1
+                        if found >= limit:
+                            return
+                return
+            except BrokenProcessPool:
+                _reset_search_pool(pool)
+                if attempt:
+                    raise
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _update_trigrams(
+        self, trigram_index: TrigramIndex, files: list[str], parallel: bool
+    ) -> None:
+        """Bring the trigram index up to date with the files to search.
+
+        Files are validated again only when the workspace index reports them
+        changed since the previous search.
+        """
+        generation, changed = self.index.changes_since(self._generation)
+        for attempt in range(2):
+            pool = get_search_pool() if parallel else None
+            try:
+                trigram_index.update(files, executor=pool, changed=changed)
+                break
+            except BrokenProcessPool:
+                if pool is None or attempt:
+                    raise
+                _reset_search_pool(pool)
+        self._generation = generation
+        trigram_index.save()
+
+    def _candidate_files(self, path: str, glob: str) -> list[str]:
+        """List the files to search, each validated against the working dir."""
+        target = self.resolver.resolve(path)
+        base = target.relative_to(self.working_dir).as_posix()
+        if target.is_file():
+            return [base]
+
+        pattern = glob.removeprefix("./")
+        if "/" not in pattern:
+            # A bare file pattern like "*.py" matches at any depth
+            pattern = f"**/{pattern}"
+        if base != ".":
+            pattern = f"{base}/{pattern}"
+        files = []
+        for rel in self.index.glob(pattern):
+            if self.index.is_symlink(rel):
+                try:
+                    self.resolver.resolve(rel)
+                except PathSecurityError:
+                    continue  # Symlink pointing outside the working directory
+            files.append(rel)
+        return files
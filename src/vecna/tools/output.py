@@ -0,0 +1,125 @@
+"""Tool output budgeting - keeps tool results from flooding the context.
+
+Every tool result is sent back to the model and then resent with every later
+request, so one oversized result (a minified file, a runaway command) costs
+tokens for the rest of the conversation. Results over the budget keep their
+head and tail, which is where the useful parts of most outputs are (a file's
+header, a command's final error), and the middle is replaced by a marker
+saying how much was left out.
+
+Tools may return an iterable of chunks instead of a string. Chunks are
+consumed one at a time and only the head and a bounded tail are held in
+memory, so an oversized output is never built in full.
+"""
+
+from collections import deque
+from collections.abc import Iterable
+
+from vecna.history import CHARS_PER_TOKEN
+
+# Default budget for a single tool result, in tokens
+DEFAULT_OUTPUT_TOKENS = 20_000
+
+# Share of the budget given to the start of an oversized output
+HEAD_FRACTION = 0.6
+
+# A cut may move this far back to land on a line boundary
+_LINE_SLACK = 200
+
+
+def elision_marker(chars: int) -> str:
+    """Return the marker that replaces the middle of a truncated output."""
+    tokens = chars // CHARS_PER_TOKEN
+    return (
+        f"\n\n... [{chars:,} characters (~{tokens:,} tokens) omitted from the "
+        f"middle of this output] ...\n\n"
+    )
+
+
+def _cut_head(text: str, size: int) -> str:
+    """Return at most `size` leading characters, ending at a line break."""
+    head = text[:size]
+    newline = head.rfind("\n", max(size - _LINE_SLACK, 0))
+    return head[: newline + 1] if newline != -1 else head
+
+
+def _cut_tail(text: str, size: int) -> str:
+    """Return at most `size` trailing characters, starting on a new line."""
+    if size <= 0:
+        return ""
+    tail = text[-size:]
+    newline = tail.find("\n", 0, _LINE_SLACK)
+    return tail[newline + 1 :] if newline != -1 else tail
+
+
+def split_budget(sizes: list[int], budget: int) -> list[int]:
+    """Share a budget among several outputs.
+
+    Outputs smaller than an equal share get their full size, and what they
+    leave is shared among the larger ones, so no budget goes unused while
+    any output is cut.
+
+    Args:
+        sizes: The length of each output.
+        budget: The total to share.
+
+    Returns:
+        Each output's share, in the same order as `sizes`.
+    """
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=sizes.__getitem__)
+    for position, i in enumerate(order):
+        shares[i] = min(sizes[i], remaining // (len(sizes) - position))
+        remaining -= shares[i]
+    return shares
+
+
+def truncate_output(output: str | Iterable[str], max_chars: int) -> str:
+    """Fit a tool output into a character budget.
+
+    Args:
+        output: The tool's result, as a string or an iterable of chunks.
+        max_chars: Maximum length of the returned string, excluding the
+            elision marker.
+
+    Returns:
+        The output unchanged if it fits, otherwise its head and tail joined
+        by an elision marker.
+    """
+    if isinstance(output, str):
+        if len(output) <= max_chars:
+            return output
+        head = _cut_head(output, int(max_chars * HEAD_FRACTION))
+        tail = _cut_tail(output, max_chars - len(head))
+        return head + elision_marker(len(output) - len(head) - len(tail)) + tail
+
+    head_budget = int(max_chars * HEAD_FRACTION)
+    head_parts: list[str] = []
+    head_chars = 0
+    tail_parts: deque[str] = deque()
+    tail_chars = 0
+    total = 0
+    for chunk in output:
+        total += len(chunk)
+        if head_chars < head_budget:
+            take = chunk[: head_budget - head_chars]
+            head_parts.append(take)
+            head_chars += len(take)
+            chunk = chunk[len(take) :]
+        if not chunk:
+            continue
+        tail_parts.append(chunk)
+        tail_chars += len(chunk)
+        # Keep just enough of the end to fill the rest of the budget
+        while tail_parts and tail_chars - len(tail_parts[0]) >= max_chars:
+            tail_chars -= len(tail_parts.popleft())
+
+    text = "".join(head_parts) + "".join(tail_parts)
+    if total <= max_chars:
+        return text
+    # The kept head and tail are a prefix and suffix of the full output at
+    # least as long as the cuts, so cutting them matches cutting the whole.
+    head = _cut_head(text, head_budget)
+    tail = _cut_tail(text, max_chars - len(head))
+    return head + elision_marker(total - len(head) - len(tail)) + tail
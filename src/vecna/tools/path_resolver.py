@@ -0,0 +1,123 @@
+"""Path resolver - a caching version of `validate_path`.
+
+`Path.resolve()` issues an lstat/readlink for every component of a path,
+which adds up on deep trees and network filesystems when a turn touches
+hundreds of paths. The resolver resolves each directory once and remembers
+it, so validating a path costs two lstat calls (parent directory and final
+component) however deep it is.
+
+A cached directory is re-validated on every use by comparing the lstat of its
+unresolved path with the one recorded when it was resolved. Re-pointing a
+symlink anywhere along the path changes what that lstat sees (a different
+inode, or a new ctime if the inode number was reused), so the entry is
+resolved again.
+"""
+
+import os
+import stat
+import threading
+from pathlib import Path
+
+from vecna.tools.exceptions import PathSecurityError
+from vecna.tools.utils import validate_path
+
+type DirSignature = tuple[int, int, int, int]
+
+
+def _signature(st: os.stat_result) -> DirSignature:
+    return (st.st_dev, st.st_ino, st.st_mode, st.st_ctime_ns)
+
+
+class PathResolver:
+    """Validates paths against one working directory, caching directories.
+
+    Gives the same guarantees as `validate_path`: the returned path has all
+    symlinks resolved and lies inside the working directory, otherwise
+    `PathSecurityError` is raised.
+    """
+
+    def __init__(self, working_dir: Path) -> None:
+        """Initialize the resolver.
+
+        Args:
+            working_dir: The allowed working directory.
+        """
+        self.working_dir = working_dir.resolve()
+        self._root = str(self.working_dir)
+        self._prefix = self._root.rstrip(os.sep) + os.sep
+        self._dirs: dict[str, tuple[str, DirSignature]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, path: str) -> Path:
+        """Validate that a path is within the working directory.
+
+        Args:
+            path: The path to validate (can be relative or absolute).
+
+        Returns:
+            The resolved absolute path.
+
+        Raises:
+            PathSecurityError: If the path would escape the working directory.
+        """
+        # ".." after a symlink depends on where the link points, so it can't
+        # be normalized lexically; leave those paths to the full resolver.
+        if ".." in path and ".." in Path(path).parts:
+            return validate_path(path, self.working_dir)
+
+        lexical = os.path.normpath(os.path.join(self._root, path))
+        if lexical == self._root:
+            return self.working_dir
+
+        parent, name = os.path.split(lexical)
+        resolved = os.path.join(self._resolve_dir(parent), name)
+
+        # A symlink as the final component is resolved in full
+        try:
+            if stat.S_ISLNK(os.lstat(resolved).st_mode):
+                resolved = os.path.realpath(resolved)
+        except OSError:
+            pass
+
+        if resolved != self._root and not resolved.startswith(self._prefix):
+            raise PathSecurityError(
+                f"Access denied: '{path}' is outside the working directory"
+            )
+
+        return Path(resolved)
+
+    def invalidate(self) -> None:
+        """Forget every cached directory."""
+        with self._lock:
+            self._dirs.clear()
+
+    def _resolve_dir(self, directory: str) -> str:
+        """Resolve a directory, reusing the cached result while it is valid."""
+        try:
+            signature = _signature(os.lstat(directory))
+        except OSError:
+            # Missing directories resolve lexically and are not cached
+            return os.path.realpath(directory)
+
+        cached = self._dirs.get(directory)
+        if cached is not None and cached[1] == signature:
+            return cached[0]
+
+        resolved = os.path.realpath(directory)
+        with self._lock:
+            self._dirs[directory] = (resolved, signature)
+        return resolved
+
+
+_resolvers: dict[Path, PathResolver] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_path_resolver(working_dir: Path) -> PathResolver:
+    """Return the resolver shared by all tools rooted in a working directory."""
+    working_dir = working_dir.resolve()
+    with _resolvers_lock:
+        resolver = _resolvers.get(working_dir)
+        if resolver is None:
+            resolver = _resolvers[working_dir] = PathResolver(working_dir)
+        return resolver
@@ -0,0 +1,248 @@
+"""Multi-file read tool - reads several files in one call.
+
+Exploring a codebase often means reading a handful of related files, and
+reading them one `read_file` call at a time costs a model round trip each.
+`read_files` takes a list of paths and glob patterns, reads the files
+concurrently and returns them as one result.
+
+Reading files that are already in the page cache takes microseconds, less
+than handing them to a thread, so small reads are done in the calling
+thread; the pool is only used once the files add up to `INLINE_READ_BYTES`.
+
+The files share one output budget. Files smaller than an equal share are
+returned in full and the rest of the budget is split among the larger ones,
+which keep their head and tail (see `split_budget` and `truncate_output`).
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from vecna.history import CHARS_PER_TOKEN
+from vecna.tools.exceptions import PathSecurityError
+from vecna.tools.file_cache import FileCache
+from vecna.tools.file_read import FileReadTool
+from vecna.tools.output import (
+    DEFAULT_OUTPUT_TOKENS,
+    elision_marker,
+    split_budget,
+    truncate_output,
+)
+from vecna.tools.path_resolver import get_path_resolver
+from vecna.tools.seen_files import SeenFiles
+from vecna.tools.workspace_index import WorkspaceIndex, get_workspace_index
+
+# Default maximum number of files read by one call
+DEFAULT_MAX_FILES = 50
+
+# Files read at the same time
+MAX_READ_THREADS = 8
+
+# Files smaller than this in total are read one after another in the calling
+# thread instead of in the pool
+INLINE_READ_BYTES = 1024 * 1024
+
+_GLOB_CHARS = frozenset("*?[")
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_read_pool() -> ThreadPoolExecutor:
+    """Return the thread pool shared by all multi-file reads.
+
+    Reads wait on the disk far more than they compute, so threads overlap
+    them well; keeping the threads around spares each call starting them.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=MAX_READ_THREADS, thread_name_prefix="read_files"
+            )
+        return _pool
+
+
+def _is_glob(pattern: str) -> bool:
+    return not _GLOB_CHARS.isdisjoint(pattern)
+
+
+class ReadFilesTool:
+    """Tool for reading several files at once.
+
+    Each file is read like `read_file` reads it (same path checks, line
+    window and cache), then fitted into its share of the output budget.
+    """
+
+    def __init__(
+        self,
+        working_dir: Path,
+        cache: FileCache | None = None,
+        index: WorkspaceIndex | None = None,
+        max_output_tokens: int | None = None,
+        seen: SeenFiles | None = None,
+    ) -> None:
+        """Initialize with the working directory.
+
+        Args:
+            working_dir: The directory to restrict file access to.
+            cache: The file cache to use (defaults to the one shared by
+                tools in `working_dir`).
+            index: The index globs are matched against (defaults to the one
+                shared by tools in `working_dir`).
+            max_output_tokens: Budget for the combined result, in estimated
+                tokens (defaults to VECNA_TOOL_OUTPUT_TOKENS or
+                DEFAULT_OUTPUT_TOKENS, like the registry's own budget).
+            seen: The reads the model has seen in this conversation, shared
+                with `read_file` (see `FileReadTool`).
+        """
+        self.working_dir = working_dir.resolve()
+        self.reader = FileReadTool(self.working_dir, cache, seen)
+        self.index = index or get_workspace_index(self.working_dir)
+        self.resolver = get_path_resolver(self.working_dir)
+        if max_output_tokens is None:
+            max_output_tokens = int(
+                os.environ.get("VECNA_TOOL_OUTPUT_TOKENS", DEFAULT_OUTPUT_TOKENS)
+            )
+        self.max_output_chars = max_output_tokens * CHARS_PER_TOKEN
+
+    @property
+    def name(self) -> str:
+        return "read_files"
+
+    @property
+    def description(self) -> str:
+        return (
+            "Read several files in one call. Takes paths and glob patterns "
+            "(e.g. 'src/app.py' or 'src/**/*.py') relative to the working "
+            f"directory and returns up to {DEFAULT_MAX_FILES} files together. "
+            "Small files are shown in full; when the files don't all fit, the "
+            "largest ones are shortened. Prefer this to several read_file "
+            "calls when you know which files you need."
+        )
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        return {
+            "type": "object",
+            "properties": {
+                "paths": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "minItems": 1,
+                    "description": (
+                        "Files to read: paths or glob patterns, relative to "
+                        "the working directory."
+                    ),
+                },
+                "max_files": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": (
+                        "Maximum number of files to read "
+                        f"(default {DEFAULT_MAX_FILES})."
+                    ),
+                },
+            },
+            "required": ["paths"],
+        }
+
+    def execute(self, paths: list[str], max_files: int = DEFAULT_MAX_FILES) -> str:
+        """Read files and return them as one result.
+
+        Args:
+            paths: Paths and glob patterns, relative to the working directory.
+            max_files: Maximum number of files to read.
+
+        Returns:
+            Each file's formatted contents (or error) under a header naming
+            it, fitted into the output budget.
+        """
+        max_files = max(int(max_files), 1)
+        files, notes = self._expand(paths, max_files)
+        if not files:
+            return "\n".join(notes) or "No files to read"
+
+        if len(files) == 1 or self._total_size(files) < INLINE_READ_BYTES:
+            outputs = [self.reader.execute(rel) for rel in files]
+        else:
+            outputs = list(get_read_pool().map(self.reader.execute, files))
+
+        headers = [f"=== {rel} ===" for rel in files]
+        overhead = sum(len(header) + 3 for header in headers)
+        overhead += sum(len(note) + 1 for note in notes)
+        shares = split_budget(
+            [len(output) for output in outputs],
+            max(self.max_output_chars - overhead, 0),
+        )
+
+        sections = []
+        for rel, header, output, share in zip(files, headers, outputs, shares):
+            if len(output) > share:
+                # The marker doesn't count toward truncate_output's budget
+                share = max(share - len(elision_marker(len(output))), 0)
+                output = truncate_output(output, share)
+                if self.reader.seen is not None:
+                    # The model won't see the whole read, so it can't be
+                    # the base of a later diff
+                    self.reader.seen.forget(self.resolver.resolve(rel))
+            sections.append(f"{header}\n{output}")
+        return "\n\n".join(sections + notes)
+
+    def forget_results(self) -> None:
+        """Forget the reads the model has seen, so the next ones are full."""
+        self.reader.forget_results()
+
+    def _total_size(self, files: list[str]) -> int:
+        """Return the combined size of files (skipping any that can't be read)."""
+        root = str(self.working_dir)
+        total = 0
+        for rel in files:
+            try:
+                total += os.stat(os.path.join(root, rel)).st_size
+            except OSError:
+                pass
+        return total
+
+    def _expand(self, paths: list[str], max_files: int) -> tuple[list[str], list[str]]:
+        """Expand globs and validate paths.
+
+        Returns:
+            The files to read, relative to the working directory and without
+            duplicates, and notes about paths that were refused or left out.
+        """
+        files: list[str] = []
+        seen: set[Path] = set()
+        notes: list[str] = []
+        skipped = 0
+        for path in paths:
+            if _is_glob(path):
+                candidates = self.index.glob(path)
+                if not candidates:
+                    notes.append(f"No files match '{path}'")
+            else:
+                candidates = [path]
+            for candidate in candidates:
+                try:
+                    resolved = self.resolver.resolve(candidate)
+                except PathSecurityError as e:
+                    notes.append(str(e))
+                    continue
+                if resolved in seen:
+                    continue
+                seen.add(resolved)
+                if len(files) >= max_files:
+                    skipped += 1
+                    continue
+                # Resolved paths are inside the working directory, so the
+                # relative path is a suffix (Path.relative_to is much slower)
+                rel = str(resolved)[len(str(self.working_dir)) + 1 :]
+                files.append(rel.replace(os.sep, "/") or ".")
+        if skipped:
+            notes.append(
+                f"... ({skipped} more files not read; raise max_files or "
+                "narrow the patterns)"
+            )
+        return files, notes
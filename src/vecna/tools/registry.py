@@ -1,8 +1,37 @@
 """Tool registry - manages tool registration and execution."""
 
-from typing import Any
+import asyncio
+import copy
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
 
-from vecna.tools.base import Tool, tool_to_anthropic_format
+from vecna.history import CHARS_PER_TOKEN
+from vecna.tools.base import Tool, ToolCall, ToolOutput, tool_to_anthropic_format
+from vecna.tools.exceptions import ToolCancelledError, ToolTimeoutError
+from vecna.tools.output import DEFAULT_OUTPUT_TOKENS, truncate_output
+from vecna.tools.schema import SchemaError, Validator, compile_schema
+
+if TYPE_CHECKING:
+    from vecna.tools.workers import WorkerPool
+
+# Default number of tool calls run at the same time by execute_many
+DEFAULT_MAX_WORKERS = 8
+
+# Called with (tool_use_id, name, seconds) when a call finishes
+type ToolTimer = Callable[[str, str, float], None]
+
+
+def _version(definitions: list[dict[str, Any]]) -> str:
+    """Return a stamp of tool definitions, the same for identical ones."""
+    canonical = json.dumps(definitions, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
 
 
 class ToolRegistry:
@@ -10,21 +39,90 @@ class ToolRegistry:
 
     The registry:
     - Stores tools by name for quick lookup
-    - Converts tools to API format
-    - Executes tool calls
+    - Converts tools to API format, once per registration
+    - Validates tool call arguments against the tool's schema
+    - Executes tool calls, one at a time or concurrently, in this process
+      or in a pool of worker processes
+    - Keeps each result within an output budget
     """
 
-    def __init__(self) -> None:
-        """Initialize an empty registry."""
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_output_tokens: int | None = None,
+        pool: "WorkerPool | None" = None,
+    ) -> None:
+        """Initialize an empty registry.
+
+        Args:
+            max_workers: Maximum number of tool calls run concurrently by
+                `execute_many`.
+            max_output_tokens: Budget for a single tool result, in estimated
+                tokens (defaults to VECNA_TOOL_OUTPUT_TOKENS or
+                DEFAULT_OUTPUT_TOKENS). Larger results keep their head and
+                tail.
+            pool: Worker processes that run the tools registered as
+                isolated (optional).
+        """
         self._tools: dict[str, Tool] = {}
+        self._validators: dict[str, Validator] = {}
+        self._async_tools: set[str] = set()
+        # Tools run in the worker pool rather than in this process
+        self._isolated: set[str] = set()
+        self.pool = pool
+        self._definitions: dict[str, dict[str, Any]] = {}
+        self._tool_list: list[dict[str, Any]] = []
+        # Identifies the current tool list; changes whenever a tool does.
+        # Sessions record it, so a resume can tell the tools changed.
+        self.version = _version(self._tool_list)
+        self.max_workers = max_workers
+        if max_output_tokens is None:
+            max_output_tokens = int(
+                os.environ.get("VECNA_TOOL_OUTPUT_TOKENS", DEFAULT_OUTPUT_TOKENS)
+            )
+        self.max_output_tokens = max_output_tokens
+
+    @property
+    def max_output_chars(self) -> int:
+        """The output budget in characters."""
+        return self.max_output_tokens * CHARS_PER_TOKEN
 
-    def register(self, tool: Tool) -> None:
+    def register(self, tool: Tool, isolated: bool = False) -> None:
         """Register a tool.
 
+        The tool's API definition and argument validator are built here,
+        once. Register the tool again to pick up changes to its schema.
+
         Args:
             tool: The tool to register.
+            isolated: Run the tool in the worker pool. The pool's workers
+                must provide a tool of the same name; this one only supplies
+                the schema.
+
+        Raises:
+            ValueError: If the tool's schema names an unknown type, or the
+                tool is isolated and there is no pool.
         """
+        if isolated and self.pool is None:
+            raise ValueError(f"Can't isolate {tool.name}: the registry has no pool")
+        definition = copy.deepcopy(tool_to_anthropic_format(tool))
+        # Arguments become keyword arguments, so unlisted ones are errors
+        self._validators[tool.name] = compile_schema(
+            definition["input_schema"], additional_properties=False
+        )
         self._tools[tool.name] = tool
+        # A pooled call blocks its thread, whatever kind the tool is
+        if inspect.iscoroutinefunction(tool.execute) and not isolated:
+            self._async_tools.add(tool.name)
+        else:
+            self._async_tools.discard(tool.name)
+        if isolated:
+            self._isolated.add(tool.name)
+        else:
+            self._isolated.discard(tool.name)
+        self._definitions[tool.name] = definition
+        self._tool_list = list(self._definitions.values())
+        self.version = _version(self._tool_list)
 
     def get(self, name: str) -> Tool | None:
         """Get a tool by name.
@@ -40,33 +138,255 @@ class ToolRegistry:
     def to_anthropic_format(self) -> list[dict[str, Any]]:
         """Convert all tools to Anthropic API format.
 
+        The list is built when tools are registered and the same list is
+        returned on every call, so requests carry byte-identical tool
+        definitions and the prompt cache keeps matching them. Don't modify
+        it; `version` changes whenever it does.
+
         Returns:
             List of tool definitions for the API.
         """
-        return [tool_to_anthropic_format(tool) for tool in self._tools.values()]
+        return self._tool_list
 
-    def execute(self, name: str, arguments: dict[str, Any]) -> str:
+    def validate(self, name: str, arguments: Any) -> list[SchemaError]:
+        """Check a tool call's arguments against the tool's schema.
+
+        Args:
+            name: The tool's name (it must be registered).
+            arguments: The arguments the model gave.
+
+        Returns:
+            The problems found, empty when the arguments are valid.
+        """
+        return self._validators[name](arguments)
+
+    def _invalid_arguments(self, name: str, arguments: Any) -> str | None:
+        """Return the error result for invalid arguments, if they are."""
+        errors = self._validators[name](arguments)
+        if not errors:
+            return None
+        lines = "\n".join(f"- {error}" for error in errors)
+        return f"Error: invalid arguments for {name}:\n{lines}"
+
+    def is_async(self, name: str) -> bool:
+        """Check whether a tool's execute method is a coroutine function."""
+        return name in self._async_tools
+
+    def is_isolated(self, name: str) -> bool:
+        """Check whether a tool runs in the worker pool."""
+        return name in self._isolated
+
+    def _run_isolated(
+        self, name: str, arguments: dict[str, Any], cancel: threading.Event | None
+    ) -> Iterator[str]:
+        """Run a tool in the pool, ending with a note if it was stopped."""
+        produced = False
+        try:
+            for chunk in self.pool.run(name, arguments, cancel):
+                produced = produced or bool(chunk)
+                yield chunk
+        except (ToolTimeoutError, ToolCancelledError) as e:
+            if not produced:
+                raise
+            # What the tool had produced is still worth showing
+            yield f"\n\n[{name} {e}; the output above is incomplete]"
+
+    def execute(
+        self,
+        name: str,
+        arguments: dict[str, Any],
+        cancel: threading.Event | None = None,
+    ) -> str:
         """Execute a tool by name with arguments.
 
+        Async tools are run to completion on a fresh event loop; use
+        `aexecute` from inside a running loop.
+
         Args:
             name: The tool's name.
             arguments: The arguments to pass to the tool.
+            cancel: Stops the call when set (only calls run in the pool can
+                be stopped).
 
         Returns:
-            The tool's result as a string.
-
-        Raises:
-            ValueError: If the tool is not found.
+            The tool's result as a string, truncated to the output budget.
         """
+        if self.is_async(name):
+            return asyncio.run(self.aexecute(name, arguments))
+
         tool = self.get(name)
         if tool is None:
             return f"Error: unknown tool'{name}'"
+        invalid = self._invalid_arguments(name, arguments)
+        if invalid is not None:
+            return invalid
+
+        try:
+            # Chunked outputs are consumed here, so errors raised while
+            # producing them are reported like any other tool error.
+            output: ToolOutput
+            if name in self._isolated:
+                output = self._run_isolated(name, arguments, cancel)
+            else:
+                output = tool.execute(**arguments)
+            return truncate_output(output, self.max_output_chars)
+        except Exception as e:
+            return f"Error executing {name}: {e}"
+
+    async def aexecute(
+        self,
+        name: str,
+        arguments: dict[str, Any],
+        cancel: threading.Event | None = None,
+    ) -> str:
+        """Execute a tool without blocking the event loop.
+
+        Async tools are awaited directly; sync tools and tools run in the
+        pool are waited for in a worker thread.
+
+        Args:
+            name: The tool's name.
+            arguments: The arguments to pass to the tool.
+            cancel: Stops the call when set (see `execute`).
+
+        Returns:
+            The tool's result as a string, truncated to the output budget.
+        """
+        if not self.is_async(name):
+            return await asyncio.to_thread(self.execute, name, arguments, cancel)
+        invalid = self._invalid_arguments(name, arguments)
+        if invalid is not None:
+            return invalid
 
         try:
-            return tool.execute(**arguments)
+            output = await self._tools[name].execute(**arguments)
+            return truncate_output(output, self.max_output_chars)
         except Exception as e:
             return f"Error executing {name}: {e}"
 
+    def _timed_execute(
+        self,
+        call: ToolCall,
+        on_done: ToolTimer | None,
+        cancel: threading.Event | None = None,
+    ) -> tuple[str, str]:
+        call_id, name, args = call
+        start = time.perf_counter()
+        result = self.execute(name, args, cancel)
+        if on_done is not None:
+            on_done(call_id, name, time.perf_counter() - start)
+        return call_id, result
+
+    def execute_many(
+        self,
+        calls: list[ToolCall],
+        on_done: ToolTimer | None = None,
+        cancel: threading.Event | None = None,
+    ) -> list[tuple[str, str]]:
+        """Execute several tool calls concurrently.
+
+        Sync tools run on a thread pool bounded by `max_workers`; async tools
+        run together as tasks on one event loop. Each call is isolated like
+        `execute`: a failing tool yields an error string for its own result.
+
+        Args:
+            calls: (tool_use_id, name, arguments) tuples.
+            on_done: Called with (tool_use_id, name, seconds) as each call
+                finishes, possibly from a worker thread.
+            cancel: Stops the calls run in the pool when set. It is also set
+                if waiting is interrupted (e.g. by Ctrl+C), so those calls
+                don't outlive it.
+
+        Returns:
+            (tool_use_id, result) tuples, in the same order as `calls`.
+        """
+        if len(calls) <= 1:
+            return [self._timed_execute(call, on_done, cancel) for call in calls]
+
+        results = [""] * len(calls)
+        async_indices = [i for i, call in enumerate(calls) if self.is_async(call[1])]
+        async_calls = [calls[i] for i in async_indices]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as threads:
+            try:
+                async_future = None
+                if async_calls:
+                    async_future = threads.submit(
+                        asyncio.run, self.aexecute_many(async_calls, on_done, cancel)
+                    )
+                futures = {
+                    i: threads.submit(self._timed_execute, call, on_done, cancel)
+                    for i, call in enumerate(calls)
+                    if i not in async_indices
+                }
+                for i, future in futures.items():
+                    results[i] = future.result()[1]
+                if async_future is not None:
+                    for i, (_, result) in zip(async_indices, async_future.result()):
+                        results[i] = result
+            except BaseException:
+                # The pool is shut down waiting for the calls, so stop them
+                if cancel is not None:
+                    cancel.set()
+                raise
+
+        return [(call[0], result) for call, result in zip(calls, results)]
+
+    async def aexecute_many(
+        self,
+        calls: list[ToolCall],
+        on_done: ToolTimer | None = None,
+        cancel: threading.Event | None = None,
+    ) -> list[tuple[str, str]]:
+        """Execute several tool calls concurrently on the running event loop.
+
+        At most `max_workers` calls run at once.
+
+        Args:
+            calls: (tool_use_id, name, arguments) tuples.
+            on_done: Called with (tool_use_id, name, seconds) as each call
+                finishes.
+            cancel: Stops the calls run in the pool when set.
+
+        Returns:
+            (tool_use_id, result) tuples, in the same order as `calls`.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run(call: ToolCall) -> tuple[str, str]:
+            call_id, name, args = call
+            async with semaphore:
+                start = time.perf_counter()
+                result = await self.aexecute(name, args, cancel)
+                if on_done is not None:
+                    on_done(call_id, name, time.perf_counter() - start)
+                return call_id, result
+
+        try:
+            return list(await asyncio.gather(*(run(call) for call in calls)))
+        except BaseException:
+            # Calls waited for in threads would run on after the task is gone
+            if cancel is not None:
+                cancel.set()
+            raise
+
     def list_tools(self) -> list[str]:
         """List all registered tool names."""
         return list(self._tools.keys())
+
+    def forget_results(self) -> None:
+        """Tell the tools that earlier results may have left the context.
+
+        Called when the history is compacted or a turn is cut short. Tools
+        whose results refer back to earlier ones (such as file re-reads
+        answered with a diff) define `forget_results()` and start afresh.
+        """
+        for tool in self._tools.values():
+            forget = getattr(tool, "forget_results", None)
+            if forget is not None:
+                forget()
+
+    def close(self) -> None:
+        """Stop the worker pool, if there is one."""
+        if self.pool is not None:
+            self.pool.close()
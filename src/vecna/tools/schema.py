@@ -0,0 +1,316 @@
+"""Tool argument validation - JSON Schemas compiled into checks.
+
+Tool arguments are written by the model and can be wrong: a required
+property left out, a string where an integer belongs, an argument the tool
+doesn't take. The registry checks them against the tool's schema before
+dispatch, so the model gets an error naming each problem instead of
+whatever the tool raises deep inside.
+
+`compile_schema` turns a schema into a tree of closures once, when the tool
+is registered, so a call only runs the checks that apply to it and never
+walks the schema. It covers the keywords tool schemas use:
+
+- type (a name or a list of names), enum, const, anyOf
+- properties, required, additionalProperties (a bool or a schema)
+- items, minItems, maxItems
+- minimum, maximum, exclusiveMinimum, exclusiveMaximum
+- minLength, maxLength, pattern
+
+Other keywords (description, default, ...) are not checked.
+"""
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class SchemaError:
+    """One way a value fails its schema."""
+
+    # Where the problem is, e.g. "paths[2]" ("" for the value itself)
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}" if self.path else self.message
+
+
+# Returns the errors of a value, or an empty list when it is valid
+type Validator = Callable[[Any], list[SchemaError]]
+
+# Appends the errors of the value at a path to a list
+type _Check = Callable[[Any, str, list[SchemaError]], None]
+
+
+def _is_integer(value: Any) -> bool:
+    kind = type(value)
+    if kind is int:
+        return True
+    if kind is float:
+        return value.is_integer()
+    return isinstance(value, int) and kind is not bool
+
+
+def _is_number(value: Any) -> bool:
+    kind = type(value)
+    if kind is int or kind is float:
+        return True
+    return isinstance(value, int | float) and kind is not bool
+
+
+_TYPES: dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": _is_integer,
+    "number": _is_number,
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+def _type_name(value: Any) -> str:
+    """Return the JSON type of a value."""
+    if isinstance(value, bool):
+        return "boolean"
+    if value is None:
+        return "null"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def _equal(a: Any, b: Any) -> bool:
+    """Compare JSON values, without treating true as 1."""
+    return a == b and isinstance(a, bool) == isinstance(b, bool)
+
+
+def _key(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+def _accept(value: Any, path: str, errors: list[SchemaError]) -> None:
+    pass
+
+
+def _compile_type(types: str | list[str]) -> Callable[[Any], bool]:
+    names = [types] if isinstance(types, str) else list(types)
+    unknown = [name for name in names if name not in _TYPES]
+    if unknown:
+        raise ValueError(f"Unknown schema type: {', '.join(unknown)}")
+    tests = [_TYPES[name] for name in names]
+    if len(tests) == 1:
+        return tests[0]
+    return lambda value: any(test(value) for test in tests)
+
+
+def _compile_object(schema: dict[str, Any], closed: bool) -> _Check | None:
+    properties = {
+        name: _compile(sub) for name, sub in schema.get("properties", {}).items()
+    }
+    required = list(schema.get("required", ()))
+    additional = schema.get("additionalProperties", not closed)
+    if not properties and not required and additional is True:
+        return None
+    extra = _compile(additional) if isinstance(additional, dict) else None
+    allowed = ", ".join(properties)
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                errors.append(SchemaError(_key(path, name), "required but missing"))
+        for name, item in value.items():
+            sub = properties.get(name)
+            if sub is not None:
+                sub(item, f"{path}.{name}" if path else name, errors)
+            elif extra is not None:
+                extra(item, _key(path, name), errors)
+            elif additional is False:
+                message = "unexpected property"
+                if allowed:
+                    message += f" (expected one of: {allowed})"
+                errors.append(SchemaError(_key(path, name), message))
+
+    return check
+
+
+def _compile_array(schema: dict[str, Any]) -> _Check | None:
+    items = _compile(schema["items"]) if "items" in schema else None
+    min_items = schema.get("minItems")
+    max_items = schema.get("maxItems")
+    if items is None and min_items is None and max_items is None:
+        return None
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not isinstance(value, list):
+            return
+        if min_items is not None and len(value) < min_items:
+            errors.append(SchemaError(path, f"expected at least {min_items} items"))
+        if max_items is not None and len(value) > max_items:
+            errors.append(SchemaError(path, f"expected at most {max_items} items"))
+        if items is not None:
+            for index, item in enumerate(value):
+                items(item, f"{path}[{index}]", errors)
+
+    return check
+
+
+def _compile_bounds(schema: dict[str, Any]) -> _Check | None:
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+    above = schema.get("exclusiveMinimum")
+    below = schema.get("exclusiveMaximum")
+    if minimum is None and maximum is None and above is None and below is None:
+        return None
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not _is_number(value):
+            return
+        if minimum is not None and value < minimum:
+            errors.append(SchemaError(path, f"must be at least {minimum}"))
+        if maximum is not None and value > maximum:
+            errors.append(SchemaError(path, f"must be at most {maximum}"))
+        if above is not None and value <= above:
+            errors.append(SchemaError(path, f"must be greater than {above}"))
+        if below is not None and value >= below:
+            errors.append(SchemaError(path, f"must be less than {below}"))
+
+    return check
+
+
+def _compile_string(schema: dict[str, Any]) -> _Check | None:
+    min_length = schema.get("minLength")
+    max_length = schema.get("maxLength")
+    pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    if min_length is None and max_length is None and pattern is None:
+        return None
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not isinstance(value, str):
+            return
+        if min_length is not None and len(value) < min_length:
+            errors.append(
+                SchemaError(path, f"expected at least {min_length} characters")
+            )
+        if max_length is not None and len(value) > max_length:
+            errors.append(
+                SchemaError(path, f"expected at most {max_length} characters")
+            )
+        if pattern is not None and not pattern.search(value):
+            errors.append(SchemaError(path, f"must match {pattern.pattern!r}"))
+
+    return check
+
+
+def _compile_choices(schema: dict[str, Any]) -> _Check | None:
+    if "const" in schema:
+        choices = [schema["const"]]
+    elif "enum" in schema:
+        choices = list(schema["enum"])
+    else:
+        return None
+    listed = ", ".join(repr(choice) for choice in choices)
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not any(_equal(value, choice) for choice in choices):
+            errors.append(SchemaError(path, f"must be one of: {listed}"))
+
+    return check
+
+
+def _compile_any_of(schema: dict[str, Any]) -> _Check | None:
+    if "anyOf" not in schema:
+        return None
+    options = [_compile(option) for option in schema["anyOf"]]
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        for option in options:
+            option_errors: list[SchemaError] = []
+            option(value, path, option_errors)
+            if not option_errors:
+                return
+        errors.append(SchemaError(path, "matches none of the allowed forms"))
+
+    return check
+
+
+def _compile(schema: dict[str, Any], closed: bool = False) -> _Check:
+    """Compile a schema into a check; `closed` rejects unlisted properties."""
+    type_test = _compile_type(schema["type"]) if "type" in schema else None
+    checks = [
+        check
+        for check in (
+            _compile_object(schema, closed),
+            _compile_array(schema),
+            _compile_bounds(schema),
+            _compile_string(schema),
+            _compile_choices(schema),
+            _compile_any_of(schema),
+        )
+        if check is not None
+    ]
+    if not checks:
+        rest = None
+    elif len(checks) == 1:
+        rest = checks[0]
+    else:
+
+        def rest(value: Any, path: str, errors: list[SchemaError]) -> None:
+            for run in checks:
+                run(value, path, errors)
+
+    if type_test is None:
+        return rest or _accept
+    expected = schema["type"]
+    if isinstance(expected, list):
+        expected = " or ".join(expected)
+
+    def check(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not type_test(value):
+            errors.append(
+                SchemaError(path, f"expected {expected}, got {_type_name(value)}")
+            )
+        elif rest is not None:
+            rest(value, path, errors)
+
+    return check
+
+
+def compile_schema(
+    schema: dict[str, Any], additional_properties: bool = True
+) -> Validator:
+    """Compile a JSON Schema into a validator.
+
+    Args:
+        schema: The schema.
+        additional_properties: Whether the top-level object may have
+            properties its schema doesn't list, when the schema lists some
+            and doesn't say.
+
+    Returns:
+        A function that returns the errors of a value (empty when valid).
+
+    Raises:
+        ValueError: If the schema names an unknown type.
+    """
+    closed = not additional_properties and bool(schema.get("properties"))
+    check = _compile(schema, closed)
+
+    def validate(value: Any) -> list[SchemaError]:
+        errors: list[SchemaError] = []
+        check(value, "", errors)
+        return errors
+
+    return validate
@@ -0,0 +1,193 @@
+"""Seen files - answers re-reads of a file with what changed.
+
+The agent often reads a file again after editing it or on a later turn, and
+every read sends the whole formatted window again, although the model still
+has the earlier copy in its context. `SeenFiles` remembers the output last
+returned for each file and line window, identified by a content hash. A
+repeated read is answered with:
+
+- A short note if the output is unchanged.
+- A unified diff against the earlier output if it changed, with hunk line
+  numbers matching the file's.
+- The full output when the diff wouldn't be shorter.
+
+The model has to still see the earlier output for this to work, so the
+record must be dropped with `forget()` whenever that may no longer be true:
+when the history is compacted, when a turn is cut short, and when an output
+is truncated before it reaches the model. It also means one record must
+never serve several conversations.
+"""
+
+import difflib
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from pathlib import Path
+
+from vecna.history import CHARS_PER_TOKEN
+from vecna.tools.output import DEFAULT_OUTPUT_TOKENS
+
+# Default memory budget of the remembered outputs, in characters
+DEFAULT_SEEN_CHARS = 8 * 1024 * 1024
+
+# Lines of context around each change in a diff
+DIFF_CONTEXT = 3
+
+UNCHANGED_NOTE = "(unchanged since you last read it; see that earlier result)"
+CHANGED_NOTE = (
+    "Changed since you last read it. The differences from that read "
+    "(- removed, + added):"
+)
+
+# A window line as written by `format_lines`: "  12 │ text"
+_NUMBERED_LINE = re.compile(r" *(\d+) │ ")
+_HUNK_HEADER = re.compile(r"@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@")
+
+
+def _digest(output: str) -> bytes:
+    return hashlib.sha256(output.encode("utf-8", "surrogatepass")).digest()
+
+
+def _parse(output: str) -> tuple[str, int, list[str], list[str]]:
+    """Split a formatted read into header, first line number, lines and footer."""
+    rows = output.split("\n")
+    start = 1
+    lines: list[str] = []
+    footer: list[str] = []
+    # Skip the header and the separator under it
+    for row in rows[2:]:
+        match = _NUMBERED_LINE.match(row) if not footer else None
+        if match is None:
+            footer.append(row)
+            continue
+        if not lines:
+            start = int(match.group(1))
+        lines.append(row[match.end() :])
+    return rows[0], start, lines, footer
+
+
+def _shift_hunk(line: str, old_start: int, new_start: int) -> str:
+    """Renumber a hunk header from window lines to file lines."""
+    match = _HUNK_HEADER.match(line)
+    if match is None:
+        return line
+    old, old_count, new, new_count = match.groups()
+    return (
+        f"@@ -{int(old) + old_start - 1}{old_count or ''} "
+        f"+{int(new) + new_start - 1}{new_count or ''} @@"
+    )
+
+
+def diff_reads(name: str, before: str, after: str) -> str:
+    """Describe how a formatted read changed since an earlier one.
+
+    Args:
+        name: The file's name (for the diff's file lines).
+        before: The earlier output of `format_lines`.
+        after: The current output.
+
+    Returns:
+        The current header followed by a unified diff of the window lines,
+        or by `UNCHANGED_NOTE` when they are the same, and then the current
+        footer.
+    """
+    _, old_start, old_lines, _ = _parse(before)
+    header, new_start, new_lines, footer = _parse(after)
+    diff = [
+        _shift_hunk(line, old_start, new_start)
+        for line in difflib.unified_diff(
+            old_lines,
+            new_lines,
+            f"{name} (earlier read)",
+            f"{name} (now)",
+            n=DIFF_CONTEXT,
+            lineterm="",
+        )
+    ]
+    body = [CHANGED_NOTE, *diff] if diff else [UNCHANGED_NOTE]
+    return "\n".join([header, *body, *footer])
+
+
+class SeenFiles:
+    """The file reads the model has seen in one conversation.
+
+    Thread-safe, so reads running concurrently can share it.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = DEFAULT_SEEN_CHARS,
+        max_output_chars: int = DEFAULT_OUTPUT_TOKENS * CHARS_PER_TOKEN,
+    ) -> None:
+        """Initialize an empty record.
+
+        Args:
+            max_chars: Memory budget for the remembered outputs; the least
+                recently read are forgotten first.
+            max_output_chars: Outputs longer than this are not remembered,
+                since the registry shortens them before the model sees them.
+        """
+        self.max_chars = max_chars
+        self.max_output_chars = max_output_chars
+        self._outputs: OrderedDict[tuple[Path, Hashable], tuple[bytes, str]] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def report(self, path: Path, window: Hashable, output: str) -> str:
+        """Remember a read, and return what to send the model for it.
+
+        Args:
+            path: The resolved file path.
+            window: What distinguishes this read of the file (e.g. the
+                line window).
+            output: The formatted read (anything else, such as an error or a
+                binary file summary, is passed through and not remembered).
+
+        Returns:
+            `output` for a first read, otherwise an unchanged note or a diff
+            against the previous read when either is shorter.
+        """
+        key = (path, window)
+        with self._lock:
+            earlier = self._pop(key)
+            if not output.startswith("File: ") or len(output) > self.max_output_chars:
+                return output
+            digest = _digest(output)
+            self._outputs[key] = (digest, output)
+            self._size += len(output)
+            self._evict()
+        if earlier is None:
+            return output
+        if earlier[0] == digest:
+            header, _, _, footer = _parse(output)
+            reply = "\n".join([header, UNCHANGED_NOTE, *footer])
+        else:
+            reply = diff_reads(path.name, earlier[1], output)
+        return reply if len(reply) < len(output) else output
+
+    def forget(self, path: Path | None = None) -> None:
+        """Forget a file's reads, or every read when no path is given."""
+        with self._lock:
+            if path is None:
+                self._outputs.clear()
+                self._size = 0
+                return
+            for key in [key for key in self._outputs if key[0] == path]:
+                self._pop(key)
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+    def _pop(self, key: tuple[Path, Hashable]) -> tuple[bytes, str] | None:
+        entry = self._outputs.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+        return entry
+
+    def _evict(self) -> None:
+        while self._size > self.max_chars and self._outputs:
+            self._pop(next(iter(self._outputs)))
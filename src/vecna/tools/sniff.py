@@ -0,0 +1,245 @@
+"""File sniffing - tells text from binary by looking at a file's first bytes.
+
+Decoding a file is the only sure way to know it's text, but it means reading
+all of it, which for a multi-gigabyte archive read by mistake takes seconds
+and as much memory. The first few KB are almost always enough to tell:
+
+- A byte order mark gives the encoding outright.
+- Most binary formats start with a magic number (archives, images,
+  executables, databases). Magic numbers that are printable ASCII ("BZh",
+  "OggS", "GIF89a") only count if the head also holds a byte text doesn't
+  have, so a text file that happens to start with one is still read.
+- Text never contains NUL bytes, except as UTF-16 without a BOM, where they
+  fall on every other byte.
+- Text is not mostly control characters.
+- Text that isn't UTF-8 is decoded with the locale's encoding, or failing
+  that a Windows/Latin-1 code page.
+
+`sniff_bytes` decides from the head of a file; `sniff_file` reads the head
+itself. Neither ever reads more than BINARY_SNIFF_BYTES.
+
+The head can't vouch for the rest of a text file, though: a file that is
+ASCII for its first 8 KB may have a Latin-1 "é" further on. `decode_text`
+decodes with the sniffed encoding and, where that fails, runs the same
+fallback chain over all of the data.
+"""
+
+import codecs
+import locale
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+# Bytes inspected to decide whether a file is binary
+BINARY_SNIFF_BYTES = 8192
+
+# Bytes shown in a binary file's summary
+SUMMARY_BYTES = 32
+
+# Share of control characters above which data counts as binary, measured
+# over a sample of the head
+MAX_CONTROL_FRACTION = 0.3
+CONTROL_SAMPLE_BYTES = 1024
+
+# Byte order marks and the codecs that decode (and drop) them. UTF-32 LE
+# starts with the UTF-16 LE mark, so it's checked first.
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_BOM_ENCODINGS = frozenset(encoding for _, encoding in _BOMS)
+
+# (offset, magic number, description) of common binary formats. Short
+# printable magics ("MZ", "ID3") are left to the NUL check, so a text file
+# that happens to start with them isn't refused; longer printable ones need
+# a non-text byte in the head as well (see `_magic`).
+_MAGIC = (
+    (0, b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (0, b"\xff\xd8\xff", "JPEG image"),
+    (0, b"GIF87a", "GIF image"),
+    (0, b"GIF89a", "GIF image"),
+    (0, b"%PDF-", "PDF document"),
+    (0, b"PK\x03\x04", "Zip archive"),
+    (0, b"PK\x05\x06", "Zip archive (empty)"),
+    (0, b"\x1f\x8b", "gzip compressed data"),
+    (0, b"BZh", "bzip2 compressed data"),
+    (0, b"\xfd7zXZ\x00", "xz compressed data"),
+    (0, b"\x28\xb5\x2f\xfd", "Zstandard compressed data"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7-Zip archive"),
+    (0, b"Rar!\x1a\x07", "RAR archive"),
+    (257, b"ustar", "tar archive"),
+    (0, b"\x7fELF", "ELF executable"),
+    (0, b"\xcf\xfa\xed\xfe", "Mach-O executable"),
+    (0, b"\xca\xfe\xba\xbe", "Mach-O universal binary or Java class"),
+    (0, b"\x00asm", "WebAssembly module"),
+    (0, b"SQLite format 3\x00", "SQLite database"),
+    (0, b"OggS", "Ogg media"),
+    (0, b"fLaC", "FLAC audio"),
+    (0, b"\x1aE\xdf\xa3", "Matroska/WebM video"),
+    (0, b"wOFF", "WOFF font"),
+    (0, b"wOF2", "WOFF2 font"),
+    (0, b"\x93NUMPY", "NumPy array"),
+    (0, b"PAR1", "Parquet data"),
+    (0, b"\x89HDF\r\n\x1a\n", "HDF5 data"),
+)
+
+# Bytes that occur in text: printable ASCII, common whitespace, escape and
+# everything above 0x7f (which the decoder judges)
+_TEXT_BYTES = bytes(
+    {7, 8, 9, 10, 11, 12, 13, 27} | set(range(0x20, 0x7F)) | set(range(0x80, 0x100))
+)
+
+
+@dataclass(frozen=True)
+class Sniffed:
+    """What a file's first bytes say about it."""
+
+    # The codec to decode the file with, or None for a binary file
+    encoding: str | None
+    # What kind of binary file it is (None for text)
+    kind: str | None = None
+
+    @property
+    def binary(self) -> bool:
+        """Whether the file is binary."""
+        return self.encoding is None
+
+
+def _printable(magic: bytes) -> bool:
+    return magic.isascii() and magic.decode("ascii").isprintable()
+
+
+def _magic(head: bytes) -> str | None:
+    for offset, magic, kind in _MAGIC:
+        if not head.startswith(magic, offset):
+            continue
+        # A printable magic is also how some text starts ("OggS is...")
+        if _printable(magic) and not head.translate(None, _TEXT_BYTES):
+            continue
+        return kind
+    return None
+
+
+def _utf16_without_bom(head: bytes) -> str | None:
+    """Recognize mostly-ASCII UTF-16 text by its every-other-byte NULs."""
+    if len(head) < 4:
+        return None
+    even, odd = head[0::2], head[1::2]
+    if not even.count(0) and odd.count(0) >= len(odd) * 0.9:
+        return "utf-16-le"
+    if not odd.count(0) and even.count(0) >= len(even) * 0.9:
+        return "utf-16-be"
+    return None
+
+
+def _decodes(head: bytes, encoding: str, final: bool) -> bool:
+    """Check that a head decodes (a character cut at its end is allowed)."""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(head, final)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=1)
+def _locale_encoding() -> str:
+    return codecs.lookup(locale.getpreferredencoding(False)).name
+
+
+def _fallback_encoding(data: bytes, complete: bool, tried: str | None = None) -> str:
+    """Pick the first encoding of the fallback chain that decodes data."""
+    for encoding in ("utf-8", _locale_encoding(), "cp1252"):
+        if encoding != tried and _decodes(data, encoding, complete):
+            return encoding
+    # Every byte is a Latin-1 character
+    return "latin-1"
+
+
+def sniff_bytes(head: bytes, complete: bool = False) -> Sniffed:
+    """Decide whether data is text, and in which encoding.
+
+    Args:
+        head: The first bytes of a file (up to BINARY_SNIFF_BYTES).
+        complete: Whether `head` is the whole file, so a character cut off
+            at its end is an error rather than the read stopping short.
+
+    Returns:
+        The encoding to read the file with, or the kind of binary file.
+    """
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return Sniffed(encoding)
+    kind = _magic(head)
+    if kind is not None:
+        return Sniffed(None, kind)
+    if b"\0" in head:
+        encoding = _utf16_without_bom(head)
+        return Sniffed(encoding) if encoding else Sniffed(None, "data")
+    sample = head[:CONTROL_SAMPLE_BYTES]
+    if len(sample.translate(None, _TEXT_BYTES)) > len(sample) * MAX_CONTROL_FRACTION:
+        return Sniffed(None, "data")
+    return Sniffed(_fallback_encoding(head, complete))
+
+
+def decode_text(data: bytes, encoding: str) -> str:
+    """Decode text in the encoding sniffed from its head, or the best fallback.
+
+    Data the sniffed encoding can't decode (the head wasn't representative)
+    is decoded with the first encoding of the sniffing fallback chain that
+    decodes all of it. An encoding that came from a byte order mark, or from
+    the NUL pattern of UTF-16, leaves no doubt, so it is kept and the bytes
+    it can't decode are replaced.
+
+    Args:
+        data: The text, or a complete part of it such as a window of lines.
+        encoding: The encoding `sniff_bytes` found.
+
+    Returns:
+        The decoded text.
+    """
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError:
+        if encoding in _BOM_ENCODINGS or not is_ascii_compatible(encoding):
+            return data.decode(encoding, errors="replace")
+        return data.decode(_fallback_encoding(data, True, tried=encoding))
+
+
+def sniff_file(path: Path) -> tuple[Sniffed, bytes]:
+    """Sniff a file from its first BINARY_SNIFF_BYTES bytes.
+
+    Returns:
+        What the head says about the file, and the head itself.
+    """
+    with path.open("rb") as f:
+        head = f.read(BINARY_SNIFF_BYTES)
+    return sniff_bytes(head, complete=len(head) < BINARY_SNIFF_BYTES), head
+
+
+def describe_binary(path: Path | str, kind: str | None, size: int, head: bytes) -> str:
+    """Summarize a binary file instead of showing its contents.
+
+    Args:
+        path: The file path (for the header).
+        kind: What kind of file it is, if known.
+        size: The file's size in bytes.
+        head: The file's first bytes.
+
+    Returns:
+        The file's kind and size, and its first bytes in hex.
+    """
+    first = head[:SUMMARY_BYTES]
+    return (
+        f"Binary file: {path} ({kind or 'data'}, {size:,} bytes); "
+        "its contents are not shown\n"
+        f"First {len(first)} bytes: {first.hex(' ')}"
+    )
+
+
+@lru_cache(maxsize=32)
+def is_ascii_compatible(encoding: str) -> bool:
+    """Check whether an encoding writes ASCII as single bytes, "\\n" included."""
+    return "a\n".encode(encoding).endswith(b"a\n")
@@ -0,0 +1,260 @@
+"""Trigram index - narrows the files a regex search has to read.
+
+For every indexed file the index records which 3-byte sequences (trigrams)
+it contains, lowercased. A regex that requires a literal such as "parse_args"
+can only match files containing all of that literal's trigrams, so a search
+intersects a few posting sets instead of reading every file.
+
+The index is persisted under the user's cache directory and validated
+against each file's (st_mtime_ns, st_size), so it survives restarts and
+only changed files are re-indexed. Validating means a stat call per file, so
+after a file has been validated once it is only checked again when the
+workspace index's journal reports it changed.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Executor
+from pathlib import Path
+from re import _parser as sre_parse
+
+from vecna.tools.sniff import BINARY_SNIFF_BYTES
+
+# Files larger than this are not indexed (they are always searched)
+MAX_INDEXED_BYTES = 4 * 1024 * 1024
+
+# Share of the indexed files that must have changed before `save` rewrites
+# the index (which takes about as long as indexing a thousand files)
+SAVE_FRACTION = 0.01
+
+_FORMAT_VERSION = 1
+
+
+def default_index_path(root: Path) -> Path:
+    """Return where the index for a working directory is stored."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    digest = hashlib.sha256(str(root).encode()).hexdigest()[:16]
+    return Path(cache_home) / "vecna" / "trigrams" / f"{digest}.pickle"
+
+
+def file_trigrams(path: str) -> frozenset[bytes] | None:
+    """Return the lowercased trigrams of a text file.
+
+    Returns:
+        The trigrams, or None for binary, oversized or unreadable files.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read(MAX_INDEXED_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > MAX_INDEXED_BYTES or b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    data = data.lower()
+    return frozenset(data[i : i + 3] for i in range(len(data) - 2))
+
+
+def _index_batch(paths: list[str]) -> list[frozenset[bytes] | None]:
+    """Compute trigrams for a batch of files (runs in worker processes)."""
+    return [file_trigrams(path) for path in paths]
+
+
+def required_trigrams(pattern: str, flags: int = 0) -> set[bytes]:
+    """Return trigrams every match of a regex must contain.
+
+    Only literal runs at the top level of the pattern are used; anything
+    inside alternations, optional groups or classes breaks a run, and so do
+    non-ASCII characters in case-insensitive patterns, since only ASCII is
+    lowercased. An empty result means the pattern can't be narrowed.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return set()
+
+    runs: list[bytes] = []
+    current = bytearray()
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL and not (flags & re.IGNORECASE and arg > 127):
+            current += chr(arg).encode()
+        else:
+            runs.append(bytes(current))
+            current = bytearray()
+    runs.append(bytes(current))
+
+    trigrams = set()
+    for run in runs:
+        run = run.lower()
+        trigrams.update(run[i : i + 3] for i in range(len(run) - 2))
+    return trigrams
+
+
+class TrigramIndex:
+    """A persistent trigram index over the files of a working directory.
+
+    Files are identified by path relative to the root. Re-indexed or removed
+    files leave their old ids behind in the posting sets; those ids are
+    filtered on lookup and dropped when the index is saved.
+    """
+
+    def __init__(self, root: Path, path: Path | None = None) -> None:
+        """Initialize the index, loading it from disk if present.
+
+        Args:
+            root: The working directory.
+            path: Where to persist the index (defaults to the cache dir).
+        """
+        self.root = root.resolve()
+        self.path = path or default_index_path(self.root)
+        # rel path -> (file id, st_mtime_ns, st_size); id -1 means unindexable
+        self._files: dict[str, tuple[int, int, int]] = {}
+        # Files validated since the caller's changes started being tracked
+        self._checked: set[str] = set()
+        self._postings: dict[bytes, set[int]] = {}
+        self._next_id = 0
+        # Files re-indexed or dropped since the index was last saved
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        """Load the index from disk, starting empty if it is missing or stale."""
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        if state.get("version") != _FORMAT_VERSION or state.get("root") != str(
+            self.root
+        ):
+            return
+        self._files = state["files"]
+        self._postings = state["postings"]
+        self._next_id = state["next_id"]
+
+    def save(self, force: bool = False) -> None:
+        """Persist the index if it changed, dropping ids of stale versions.
+
+        A few changed files are not worth rewriting the whole index for: a
+        restart validates every file anyway and re-indexes those. So unless
+        forced, the index is only saved once `SAVE_FRACTION` of it changed.
+
+        Args:
+            force: Save any change.
+        """
+        with self._lock:
+            threshold = 1 if force else max(len(self._files) * SAVE_FRACTION, 1)
+            if self._unsaved < threshold:
+                return
+            live = {file_id for file_id, _, _ in self._files.values()}
+            postings = {}
+            for trigram, ids in self._postings.items():
+                ids &= live
+                if ids:
+                    postings[trigram] = ids
+            self._postings = postings
+            state = {
+                "version": _FORMAT_VERSION,
+                "root": str(self.root),
+                "files": self._files,
+                "postings": self._postings,
+                "next_id": self._next_id,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+
+    def update(
+        self,
+        rel_paths: Iterable[str],
+        executor: Executor | None = None,
+        batch_size: int = 256,
+        changed: set[str] | None = None,
+    ) -> None:
+        """Index new or changed files among `rel_paths`.
+
+        Args:
+            rel_paths: Candidate files, relative to the root.
+            executor: Pool used to compute trigrams (in-process if None).
+            batch_size: Files per task sent to the executor.
+            changed: Every path that may have changed since the previous
+                update (see `WorkspaceIndex.changes_since`). Files validated
+                before and not among them are taken as unchanged; None
+                validates every file.
+        """
+        if changed is None:
+            self._checked.clear()
+        else:
+            self._checked -= changed
+        root = str(self.root)
+        stale = []
+        signatures = {}
+        for rel in rel_paths:
+            if rel in self._checked:
+                continue
+            try:
+                st = os.stat(os.path.join(root, rel))
+            except OSError:
+                with self._lock:
+                    if self._files.pop(rel, None) is not None:
+                        self._unsaved += 1
+                continue
+            signature = (st.st_mtime_ns, st.st_size)
+            signatures[rel] = signature
+            known = self._files.get(rel)
+            if known is None or known[1:] != signature:
+                stale.append(rel)
+        if not stale:
+            self._checked.update(signatures)
+            return
+
+        full_paths = [os.path.join(root, rel) for rel in stale]
+        batches = [
+            full_paths[i : i + batch_size]
+            for i in range(0, len(full_paths), batch_size)
+        ]
+        if executor is None or len(batches) == 1:
+            results = [_index_batch(batch) for batch in batches]
+        else:
+            results = list(executor.map(_index_batch, batches))
+
+        with self._lock:
+            for rel, trigrams in zip(stale, (t for batch in results for t in batch)):
+                signature = signatures[rel]
+                if trigrams is None:
+                    self._files[rel] = (-1, *signature)
+                    continue
+                file_id = self._next_id
+                self._next_id += 1
+                self._files[rel] = (file_id, *signature)
+                for trigram in trigrams:
+                    self._postings.setdefault(trigram, set()).add(file_id)
+            self._unsaved += len(stale)
+        self._checked.update(signatures)
+
+    def candidates(self, rel_paths: list[str], trigrams: set[bytes]) -> list[str]:
+        """Filter files down to those that may contain all the trigrams.
+
+        Files that could not be indexed (too large, unreadable) are always
+        kept, as are files the index has not seen.
+        """
+        if not trigrams:
+            return rel_paths
+        with self._lock:
+            postings = [self._postings.get(trigram, set()) for trigram in trigrams]
+        postings.sort(key=len)
+        matching = set.intersection(*postings) if postings else set()
+
+        kept = []
+        for rel in rel_paths:
+            known = self._files.get(rel)
+            if known is None or known[0] == -1 or known[0] in matching:
+                kept.append(rel)
+        return kept
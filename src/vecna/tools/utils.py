@@ -1,8 +1,21 @@
 """Utility functions for tools."""
 
+import locale
+import mmap
+import os
 from pathlib import Path
 
 from vecna.tools.exceptions import PathSecurityError
+from vecna.tools.sniff import decode_text, is_ascii_compatible
+
+# Default number of lines returned by a file read
+DEFAULT_MAX_LINES = 500
+
+# Files at least this large are read through mmap instead of into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Total line counts are only computed automatically up to this size
+COUNT_LINES_LIMIT = 8 * 1024 * 1024
 
 
 def validate_path(path: str, working_dir: Path) -> Path:
@@ -35,42 +48,185 @@ def validate_path(path: str, working_dir: Path) -> Path:
     return resolved
 
 
-def format_file_contents(path: Path, contents: str, max_lines: int = 500) -> str:
-    """Format file contents with line numbers.
+def split_lines(text: str) -> list[str]:
+    """Split text into lines the way the windowed readers do.
+
+    Only "\n" ends a line (a "\r" before it is dropped), unlike
+    `str.splitlines`, which also splits on form feeds, vertical tabs, "\r"
+    alone and Unicode separators. The line numbers of a small file then match
+    those of the same file read in windows.
+    """
+    lines = text.split("\n")
+    if lines[-1] == "":
+        # A trailing newline ends the last line rather than starting one
+        lines.pop()
+    if "\r" not in text:
+        return lines
+    return [line.removesuffix("\r") for line in lines]
+
+
+def _line_window(
+    data: bytes | mmap.mmap, offset: int, limit: int
+) -> tuple[list[bytes], bool]:
+    """Slice a window of lines out of a buffer, scanning only as far as needed."""
+    pos = 0
+    size = len(data)
+
+    # Skip to the first requested line
+    for _ in range(offset - 1):
+        newline = data.find(b"\n", pos)
+        if newline == -1:
+            return [], False
+        pos = newline + 1
+
+    lines = []
+    while len(lines) < limit and pos < size:
+        newline = data.find(b"\n", pos)
+        end = size if newline == -1 else newline
+        lines.append(data[pos:end])
+        pos = end + 1
+
+    return lines, pos < size
+
+
+def read_lines(
+    path: Path,
+    offset: int = 1,
+    limit: int = DEFAULT_MAX_LINES,
+    encoding: str | None = None,
+) -> tuple[list[str], bool]:
+    """Read a window of lines from a file without reading past it.
+
+    Files of MMAP_THRESHOLD bytes or more are mapped instead of read, so
+    reading the start of a huge file only touches the pages it needs. Files
+    in encodings whose line breaks aren't "\\n" bytes (UTF-16, UTF-32) are
+    decoded from the start up to the end of the window instead.
+
+    Args:
+        path: The file to read.
+        offset: The first line to return (1-based).
+        limit: Maximum number of lines to return.
+        encoding: Text encoding (defaults to the locale encoding).
+
+    Returns:
+        The decoded lines (without line endings) and whether more lines
+        follow the window. A window `encoding` can't decode is decoded as
+        `decode_text` does.
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    if not is_ascii_compatible(encoding):
+        return _read_text_lines(path, offset, limit, encoding)
+    with path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [], False
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                raw_lines, more = _line_window(data, offset, limit)
+        else:
+            raw_lines, more = _line_window(f.read(), offset, limit)
+
+    # Decoded as one, so every line of the window gets the same fallback
+    text = decode_text(b"\n".join(raw_lines), encoding)
+    lines = text.split("\n") if raw_lines else []
+    return [line.removesuffix("\r") for line in lines], more
+
+
+def _read_text_lines(
+    path: Path, offset: int, limit: int, encoding: str
+) -> tuple[list[str], bool]:
+    """Read a window of lines by decoding the file as a stream."""
+    lines: list[str] = []
+    with path.open(encoding=encoding, errors="replace", newline="\n") as f:
+        for number, line in enumerate(f, 1):
+            if number < offset:
+                continue
+            if len(lines) >= limit:
+                return lines, True
+            lines.append(line.removesuffix("\n").removesuffix("\r"))
+    return lines, False
+
+
+def count_file_lines(path: Path, chunk_size: int = MMAP_THRESHOLD) -> int:
+    """Count the lines in a file, reading it in fixed-size chunks."""
+    lines = 0
+    last = b"\n"
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    # A final line without a trailing newline still counts
+    return lines + (last != b"\n")
+
+
+def format_lines(
+    path: Path | str,
+    lines: list[str],
+    start: int = 1,
+    total_lines: int | None = None,
+    more: bool = False,
+) -> str:
+    """Format a window of file lines with line numbers.
 
     Args:
         path: The file path (for the header).
-        contents: The file contents.
-        max_lines: Maximum lines to show (truncate after this).
+        lines: The lines in the window.
+        start: Line number of the first line in the window.
+        total_lines: Total lines in the file, if known.
+        more: Whether lines follow the window.
 
     Returns:
         Formatted string with line numbers.
     """
-    lines = contents.splitlines()
-    total_lines = len(lines)
-
-    # Truncate if too long
-    truncated = False
-    if len(lines) > max_lines:
-        lines = lines[:max_lines]
-        truncated = True
+    end = start + len(lines) - 1
 
     # Calculate width needed for line numbers
-    width = len(str(total_lines))
+    width = len(str(max(total_lines or 0, end)))
 
     # Format each line with line number
-    formatted_lines = []
-    for i, line in enumerate(lines, 1):
-        formatted_lines.append(f"{i:>{width}} │ {line}")
+    formatted_lines = [f"{i:>{width}} │ {line}" for i, line in enumerate(lines, start)]
 
     # Build output
-    header = f"File: {path} ({total_lines} lines)"
+    if total_lines is not None:
+        header = f"File: {path} ({total_lines} lines)"
+    else:
+        header = f"File: {path} (lines {start}-{end} shown, total not counted)"
     separator = "-" * min(len(header), 50)
     output_parts = [header, separator] + formatted_lines
 
-    if truncated:
+    if not lines and start > 1:
+        output_parts.append(f"(no lines at offset {start})")
+    elif more and start == 1 and total_lines is not None:
         output_parts.append(
-            f"... (truncated, showing {max_lines} of {total_lines} lines)"
+            f"... (truncated, showing {len(lines)} of {total_lines} lines)"
+        )
+    elif more:
+        of_total = f" of {total_lines}" if total_lines is not None else ""
+        output_parts.append(
+            f"... (showing lines {start}-{end}{of_total}; "
+            f"use offset={end + 1} to read more)"
         )
 
     return "\n".join(output_parts)
+
+
+def format_file_contents(path: Path, contents: str, max_lines: int = 500) -> str:
+    """Format file contents with line numbers.
+
+    Args:
+        path: The file path (for the header).
+        contents: The file contents.
+        max_lines: Maximum lines to show (truncate after this).
+
+    Returns:
+        Formatted string with line numbers.
+    """
+    lines = contents.splitlines()
+    total_lines = len(lines)
+
+    return format_lines(
+        path,
+        lines[:max_lines],
+        total_lines=total_lines,
+        more=total_lines > max_lines,
+    )
@@ -0,0 +1,337 @@
+"""Worker pool - runs tools in separate processes.
+
+A tool run in the agent's own process can freeze it (a search of a huge
+tree, a hung filesystem) or take it down (a crash in native code, memory
+exhaustion). A `WorkerPool` runs tools in a set of worker processes instead.
+The workers are started ahead of time from a fork server that has already
+imported the tool modules, and each builds its tools once with the pool's
+factory, so a call costs a message over a pipe rather than a process start.
+
+For every call the parent waits on the worker's pipe, which is what makes
+the call controllable:
+
+- A tool that runs past its timeout is killed, and its worker replaced.
+- A call is cancelled by setting its `threading.Event` (the agent's own
+  cancel flag), or by interrupting the waiting thread (Ctrl+C); either kills
+  the worker.
+- A memory limit (RLIMIT_AS) is set in the worker for the duration of the
+  call, so a runaway tool fails with an error instead of exhausting memory.
+- Output is streamed back in chunks as the tool produces it, so the
+  registry's output budget applies as it arrives, and a tool stopped by its
+  timeout or a cancel still returns what it had produced.
+
+A worker that dies is replaced, so the pool stays warm. The CLI runs the
+search tools in a pool of VECNA_TOOL_WORKERS workers (0 runs them in
+process). Limits, when not given to the pool, are read from the environment:
+
+    VECNA_TOOL_TIMEOUT=120       # seconds a tool may run
+    VECNA_TOOL_MEMORY_MB=0       # address space a tool may use (0: no limit)
+"""
+
+import asyncio
+import inspect
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any
+
+from vecna.tools.exceptions import (
+    ToolCancelledError,
+    ToolTimeoutError,
+    ToolWorkerError,
+)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from vecna.tools.registry import ToolRegistry
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TOOL_TIMEOUT = 120.0
+
+# How often a waiting call checks its cancel flag, in seconds
+CANCEL_POLL_INTERVAL = 0.05
+
+# Output is sent to the parent in chunks of about this many characters, or
+# sooner when the tool is slow to produce more
+CHUNK_CHARS = 64 * 1024
+CHUNK_INTERVAL = 0.1
+
+MB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ToolLimits:
+    """How long a tool may run and how much memory it may use."""
+
+    # Seconds (None for no limit)
+    timeout: float | None = DEFAULT_TOOL_TIMEOUT
+    # Bytes of address space (None for no limit)
+    memory: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "ToolLimits":
+        """Read the limits from VECNA_TOOL_TIMEOUT and VECNA_TOOL_MEMORY_MB."""
+        timeout = float(os.environ.get("VECNA_TOOL_TIMEOUT", DEFAULT_TOOL_TIMEOUT))
+        memory_mb = int(os.environ.get("VECNA_TOOL_MEMORY_MB", 0))
+        return cls(timeout=timeout or None, memory=memory_mb * MB or None)
+
+
+def _context() -> multiprocessing.context.BaseContext:
+    """The fork server where available: fast starts without forking threads."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _set_memory_limit(limit: int | None) -> None:
+    """Limit the worker's address space (None lifts the limit)."""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if limit is None or (hard != resource.RLIM_INFINITY and limit > hard):
+        limit = hard
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _send_output(conn: Connection, output: Any) -> None:
+    """Send a tool's output, batching small chunks."""
+    if isinstance(output, str):
+        conn.send(("chunk", output))
+        return
+    buffer: list[str] = []
+    size = 0
+    # The first chunk goes out at once
+    last_sent = 0.0
+    for chunk in output:
+        buffer.append(chunk)
+        size += len(chunk)
+        now = time.monotonic()
+        if size >= CHUNK_CHARS or now - last_sent >= CHUNK_INTERVAL:
+            conn.send(("chunk", "".join(buffer)))
+            buffer, size, last_sent = [], 0, now
+    if buffer:
+        conn.send(("chunk", "".join(buffer)))
+
+
+def _serve(
+    conn: Connection, factory: Callable[..., "ToolRegistry"], args: tuple
+) -> None:
+    """Worker process main loop: build the tools, then run calls."""
+    # Ctrl+C reaches the whole process group; the parent decides what stops
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    registry = factory(*args)
+    while True:
+        try:
+            name, arguments, memory = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            tool = registry.get(name)
+            if tool is None:
+                raise LookupError(f"unknown tool '{name}'")
+            _set_memory_limit(memory)
+            output = tool.execute(**arguments)
+            if inspect.iscoroutine(output):
+                output = asyncio.run(output)
+            _send_output(conn, output)
+            conn.send(("done", None))
+        except MemoryError:
+            limit = f" (limit {memory // MB} MB)" if memory else ""
+            conn.send(("error", f"out of memory{limit}"))
+        except Exception as e:
+            conn.send(("error", str(e)))
+        finally:
+            _set_memory_limit(None)
+
+
+class _Worker:
+    """A worker process and the parent's end of its pipe."""
+
+    def __init__(
+        self,
+        context: multiprocessing.context.BaseContext,
+        factory: Callable[..., "ToolRegistry"],
+        args: tuple,
+    ) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_serve, args=(child_conn, factory, args), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """A warm pool of worker processes that run tools.
+
+    The workers build their tools by calling `factory(*args)`, which must be
+    picklable (a module-level function, such as `default_tools`). Give the
+    pool to a `ToolRegistry` and register the tools that should run in it
+    with `isolated=True`.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., "ToolRegistry"],
+        *args: Any,
+        size: int = DEFAULT_POOL_SIZE,
+        limits: ToolLimits | None = None,
+        tool_limits: dict[str, ToolLimits] | None = None,
+    ) -> None:
+        """Start the workers.
+
+        Args:
+            factory: Builds the tool registry in each worker.
+            *args: Arguments for the factory (e.g. the working directory).
+            size: How many workers to run, and so how many tools at once.
+            limits: Limits of every tool (defaults to `ToolLimits.from_env()`).
+            tool_limits: Limits of particular tools, by name.
+        """
+        if size < 1:
+            raise ValueError("A worker pool needs at least one worker")
+        self.factory = factory
+        self.args = args
+        self.size = size
+        self.limits = limits or ToolLimits.from_env()
+        self.tool_limits = dict(tool_limits or {})
+        self._context = _context()
+        if self._context.get_start_method() == "forkserver":
+            # Workers fork from a server that already imported the tools
+            self._context.set_forkserver_preload([factory.__module__])
+        self._changed = threading.Condition()
+        self._idle: list[_Worker] = []
+        self._workers: set[_Worker] = set()
+        self._closed = False
+        for _ in range(size):
+            self._add_worker()
+
+    def limits_for(self, name: str) -> ToolLimits:
+        """Return the limits that apply to a tool."""
+        return self.tool_limits.get(name, self.limits)
+
+    def _add_worker(self) -> None:
+        worker = _Worker(self._context, self.factory, self.args)
+        with self._changed:
+            self._workers.add(worker)
+            self._idle.append(worker)
+            self._changed.notify()
+
+    def _acquire(self, cancel: threading.Event | None) -> _Worker:
+        with self._changed:
+            while not self._idle:
+                if self._closed:
+                    raise ToolWorkerError("the worker pool is closed")
+                if cancel is not None and cancel.is_set():
+                    raise ToolCancelledError("cancelled")
+                self._changed.wait(CANCEL_POLL_INTERVAL if cancel else None)
+            return self._idle.pop()
+
+    def _release(self, worker: _Worker) -> None:
+        with self._changed:
+            self._idle.append(worker)
+            self._changed.notify()
+
+    def _replace(self, worker: _Worker) -> None:
+        """Kill a worker that can't be reused and start a fresh one."""
+        worker.kill()
+        with self._changed:
+            self._workers.discard(worker)
+            if self._closed:
+                return
+        self._add_worker()
+
+    def run(
+        self,
+        name: str,
+        arguments: dict[str, Any],
+        cancel: threading.Event | None = None,
+    ) -> Iterator[str]:
+        """Run a tool in a worker, yielding its output as it arrives.
+
+        Args:
+            name: The tool's name.
+            arguments: The arguments to call it with.
+            cancel: Stops the call when set.
+
+        Yields:
+            Chunks of the tool's output.
+
+        Raises:
+            ToolTimeoutError: If the tool ran past its timeout.
+            ToolCancelledError: If `cancel` was set.
+            ToolWorkerError: If the tool raised an error or its worker died.
+        """
+        limits = self.limits_for(name)
+        worker = self._acquire(cancel)
+        finished = False
+        try:
+            worker.conn.send((name, arguments, limits.memory))
+            deadline = (
+                time.monotonic() + limits.timeout
+                if limits.timeout is not None
+                else None
+            )
+            while True:
+                wait = CANCEL_POLL_INTERVAL if cancel is not None else None
+                if deadline is not None:
+                    remaining = max(deadline - time.monotonic(), 0.0)
+                    wait = remaining if wait is None else min(wait, remaining)
+                if worker.conn.poll(wait):
+                    try:
+                        kind, value = worker.conn.recv()
+                    except EOFError:
+                        worker.process.join(1)
+                        raise ToolWorkerError(
+                            f"worker process died (exit code {worker.process.exitcode})"
+                        ) from None
+                    if kind == "chunk":
+                        yield value
+                        continue
+                    finished = True
+                    if kind == "error":
+                        raise ToolWorkerError(value)
+                    return
+                if cancel is not None and cancel.is_set():
+                    raise ToolCancelledError("cancelled")
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise ToolTimeoutError(f"timed out after {limits.timeout:g}s")
+        finally:
+            # A worker still busy with the call is killed, not reused
+            if finished:
+                self._release(worker)
+            else:
+                self._replace(worker)
+
+    def close(self) -> None:
+        """Stop all workers; calls in progress fail."""
+        with self._changed:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            busy = self._workers.difference(idle)
+            self._workers.clear()
+            self._changed.notify_all()
+        for worker in idle:
+            worker.kill()
+        for worker in busy:
+            # Their calls see the worker die and clean up after it
+            worker.process.kill()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
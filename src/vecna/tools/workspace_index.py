@@ -0,0 +1,621 @@
+"""Workspace index - an in-memory table of the files in the working directory.
+
+The tree is walked once, in parallel, skipping everything `.gitignore` files
+exclude. The result is a sorted table of relative paths, so glob queries
+only scan the slice of the table that shares the pattern's literal prefix
+instead of walking the tree again.
+
+The index is kept current incrementally, re-scanning only the directories
+whose entries changed (or whose `.gitignore` changed). On Linux every indexed
+directory is watched with inotify (see `vecna.tools.dir_watch`), so a query
+learns of changes by reading the kernel's event queue, however big the tree.
+Elsewhere every directory's mtime is recorded and compared, which costs a
+stat call per directory, so those refreshes are throttled to one per
+`refresh_interval` seconds and back-to-back queries share one.
+
+Each change also goes into a journal, which `changes_since` reads to tell
+other indexes built on this one (such as the trigram index) which paths to
+look at again.
+"""
+
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from vecna.tools.dir_watch import DirectoryWatcher
+
+# Directories that are never indexed
+ALWAYS_IGNORED = frozenset({".git"})
+
+# Seconds between automatic refreshes
+DEFAULT_REFRESH_INTERVAL = 2.0
+
+# Above this many changed paths, the table is re-sorted instead of patched
+_REBUILD_THRESHOLD = 1_000
+
+# Changed paths remembered by the journal
+_MAX_JOURNAL_PATHS = 100_000
+
+
+def translate_glob(pattern: str) -> str:
+    """Translate a glob pattern into a regular expression.
+
+    `*` and `?` do not match "/", while `**` matches across directories:
+    "**/" matches zero or more leading directories and "/**" everything
+    below a directory.
+    """
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        char = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif char == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif char == "?":
+            parts.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body.replace('\\', '\\\\')}]")
+                i = end + 1
+        elif char == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return "".join(parts)
+
+
+def literal_prefix(pattern: str) -> str:
+    """Return the part of a glob pattern before its first wildcard."""
+    match = re.search(r"[*?\[\\]", pattern)
+    return pattern if match is None else pattern[: match.start()]
+
+
+class IgnoreRule:
+    """One pattern line from a .gitignore file."""
+
+    def __init__(self, line: str) -> None:
+        self.negate = line.startswith("!")
+        if self.negate:
+            line = line[1:]
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # Patterns with a slash are relative to the .gitignore's directory,
+        # others match a name at any depth
+        anchored = "/" in line
+        line = line.lstrip("/")
+        prefix = "" if anchored else "(?:.*/)?"
+        self.regex = re.compile(prefix + translate_glob(line))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        """Check a path relative to the .gitignore's directory.
+
+        Paths inside an ignored directory are never checked, since the walk
+        does not descend into it (as in git, they can't be re-included).
+        """
+        if self.dir_only and not is_dir:
+            return False
+        return self.regex.fullmatch(rel_path) is not None
+
+
+def parse_gitignore(text: str) -> list[IgnoreRule]:
+    """Parse the contents of a .gitignore file."""
+    rules = []
+    for line in text.splitlines():
+        if line.endswith("\\ "):
+            line = line.rstrip() + " "
+        else:
+            line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith(("\\#", "\\!")):
+            line = line[1:]
+        rules.append(IgnoreRule(line))
+    return rules
+
+
+# Rules in effect for a directory: (directory the .gitignore is in, rules)
+type RuleStack = tuple[tuple[str, list[IgnoreRule]], ...]
+
+
+def is_ignored(rel_path: str, is_dir: bool, rules: RuleStack) -> bool:
+    """Check a path against every .gitignore above it; the last match wins."""
+    ignored = False
+    for base, base_rules in rules:
+        if base:
+            local = rel_path[len(base) + 1 :]
+        else:
+            local = rel_path
+        for rule in base_rules:
+            if rule.matches(local, is_dir):
+                ignored = not rule.negate
+    return ignored
+
+
+def _join(rel_dir: str, name: str) -> str:
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+class _Directory:
+    """What the index knows about one scanned directory."""
+
+    def __init__(
+        self,
+        rel: str,
+        mtime_ns: int,
+        gitignore_mtime_ns: int | None,
+        rules: RuleStack,
+        files: list[str],
+        subdirs: list[str],
+        links: set[str],
+    ) -> None:
+        self.rel = rel
+        self.mtime_ns = mtime_ns
+        self.gitignore_mtime_ns = gitignore_mtime_ns
+        self.rules = rules
+        self.files = files
+        self.subdirs = subdirs
+        # Files that are symlinks
+        self.links = links
+
+
+class WorkspaceIndex:
+    """A sorted, gitignore-aware table of the files in a directory tree.
+
+    Paths are relative to the root and use "/" as separator. Symlinked
+    files are indexed; symlinked directories are not followed.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_workers: int = 16,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        watch: bool | None = None,
+    ) -> None:
+        """Initialize an (unbuilt) index.
+
+        Args:
+            root: The directory to index.
+            max_workers: Threads used to walk the tree.
+            refresh_interval: Minimum seconds between automatic refreshes
+                when polling.
+            watch: Learn of changes from inotify where available instead of
+                polling (None follows VECNA_INDEX_WATCH, on unless "0").
+        """
+        self.root = root.resolve()
+        self.max_workers = max_workers
+        self.refresh_interval = refresh_interval
+        if watch is None:
+            watch = os.environ.get("VECNA_INDEX_WATCH") != "0"
+        self.watch = watch
+        self._root = str(self.root)
+        self._dirs: dict[str, _Directory] = {}
+        self._paths: list[str] = []
+        # File name -> sorted paths with that name, built on first use
+        self._names: dict[str, list[str]] | None = None
+        self._watcher: DirectoryWatcher | None = None
+        self._built = False
+        self._last_refresh = 0.0
+        # Every change to the table starts a new generation, and the journal
+        # records which paths each one touched (see `changes_since`)
+        self._generation = 0
+        self._complete_since = 0
+        self._journal: deque[tuple[int, set[str]]] = deque()
+        self._journal_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        self.ensure_fresh()
+        return len(self._paths)
+
+    @property
+    def watching(self) -> bool:
+        """Whether changes are learned of from the kernel rather than polled."""
+        return self._watcher is not None and not self._watcher.failed
+
+    def build(self) -> None:
+        """Walk the whole tree and build the path table."""
+        with self._lock:
+            self._stop_watching()
+            if self.watch:
+                self._watcher = DirectoryWatcher.create()
+            self._dirs = self._scan_tree("", ())
+            self._paths = sorted(self._all_paths(self._dirs.values()))
+            self._names = None
+            self._built = True
+            self._record(None)
+            self._last_refresh = time.monotonic()
+
+    def close(self) -> None:
+        """Stop watching the tree (the index keeps working by polling)."""
+        with self._lock:
+            self._stop_watching()
+
+    def ensure_fresh(self) -> None:
+        """Build the index, or bring it up to date.
+
+        A watched tree is brought up to date on every call, which costs one
+        read of the event queue; a polled one only when the last refresh is
+        older than `refresh_interval`.
+        """
+        with self._lock:
+            if not self._built:
+                self.build()
+            elif (
+                self.watching
+                or time.monotonic() - self._last_refresh >= self.refresh_interval
+            ):
+                self.refresh()
+
+    def refresh(self) -> None:
+        """Re-scan the directories that changed since they were last scanned.
+
+        Watched directories are re-scanned when the kernel reported a change
+        in them. Otherwise (no inotify, a full event queue or too few
+        watches), every directory's mtime is compared with the recorded one.
+        """
+        with self._lock:
+            events = None
+            if self._watcher is not None:
+                if self._watcher.failed:
+                    self._stop_watching()
+                else:
+                    events = self._watcher.read()
+            if events is None:
+                removed, added = self._poll()
+                self._apply_changes(removed - added, added - removed)
+                # Files rewritten in place go unnoticed by polling
+                self._record(None)
+            else:
+                removed, added, written = self._replay(*events)
+                self._apply_changes(removed - added, added - removed)
+                self._record((removed ^ added) | written)
+            self._last_refresh = time.monotonic()
+
+    def changes_since(self, generation: int | None) -> tuple[int, set[str] | None]:
+        """Tell which paths changed since an earlier generation of the index.
+
+        Args:
+            generation: A generation returned by an earlier call, or None.
+
+        Returns:
+            The current generation, and the paths added, removed or written
+            since `generation`, or None when that is not known (the first
+            call, a polled refresh, or a journal that no longer reaches back
+            that far).
+        """
+        with self._lock:
+            self.ensure_fresh()
+            if generation is None or generation < self._complete_since:
+                return self._generation, None
+            changed: set[str] = set()
+            for entry_generation, paths in reversed(self._journal):
+                if entry_generation <= generation:
+                    break
+                changed |= paths
+            return self._generation, changed
+
+    def is_symlink(self, rel_path: str) -> bool:
+        """Check whether an indexed path is a symlink."""
+        rel_dir, _, name = rel_path.rpartition("/")
+        with self._lock:
+            directory = self._dirs.get(rel_dir)
+            return directory is not None and name in directory.links
+
+    def glob(self, pattern: str, limit: int | None = None) -> list[str]:
+        """Return indexed paths matching a glob pattern, in sorted order.
+
+        Args:
+            pattern: A glob pattern relative to the root, e.g. "src/**/*.py".
+            limit: Maximum number of paths to return.
+        """
+        pattern = pattern.removeprefix("./").lstrip("/")
+        regex = re.compile(translate_glob(pattern))
+        prefix = literal_prefix(pattern)
+        name = pattern.rpartition("/")[2]
+        matches = []
+        with self._lock:
+            self.ensure_fresh()
+            if prefix != pattern and literal_prefix(name) == name:
+                # "**/setup.py": only paths with that name can match
+                candidates = self._named(name, prefix)
+            else:
+                candidates = self._with_prefix(prefix)
+            for path in candidates:
+                if regex.fullmatch(path):
+                    matches.append(path)
+                    if limit is not None and len(matches) >= limit:
+                        break
+        return matches
+
+    def list_files(self, directory: str = "") -> list[str]:
+        """Return every indexed path below a directory."""
+        prefix = directory.strip("/")
+        with self._lock:
+            self.ensure_fresh()
+            return list(self._with_prefix(f"{prefix}/" if prefix else ""))
+
+    def _with_prefix(self, prefix: str):
+        """Iterate over the paths starting with prefix."""
+        paths = self._paths
+        for i in range(bisect.bisect_left(paths, prefix), len(paths)):
+            if not paths[i].startswith(prefix):
+                break
+            yield paths[i]
+
+    def _named(self, name: str, prefix: str) -> list[str]:
+        """Return the paths of files with a given name under a prefix."""
+        if self._names is None:
+            self._names = {}
+            for path in self._paths:
+                self._names.setdefault(path.rpartition("/")[2], []).append(path)
+        return [path for path in self._names.get(name, ()) if path.startswith(prefix)]
+
+    def _dir_path(self, rel: str) -> str:
+        return os.path.join(self._root, rel) if rel else self._root
+
+    def _stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def _record(self, paths: set[str] | None) -> None:
+        """Start a new generation for changed paths (None: unknown changes)."""
+        if paths is None:
+            self._generation += 1
+            self._complete_since = self._generation
+            self._journal.clear()
+            self._journal_size = 0
+            return
+        if not paths:
+            return
+        self._generation += 1
+        self._journal.append((self._generation, paths))
+        self._journal_size += len(paths)
+        while self._journal_size > _MAX_JOURNAL_PATHS:
+            generation, dropped = self._journal.popleft()
+            self._journal_size -= len(dropped)
+            self._complete_since = generation
+
+    def _scan_dir(
+        self, rel: str, rules: RuleStack
+    ) -> tuple[_Directory, list[tuple[str, RuleStack]]]:
+        """Scan one directory; return it and the subdirectories to scan next."""
+        path = self._dir_path(rel)
+        if self._watcher is not None:
+            # Watched before listing, so no change after the listing is missed
+            self._watcher.watch(path, rel)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        gitignore_mtime_ns = None
+        gitignore = os.path.join(path, ".gitignore")
+        try:
+            gitignore_mtime_ns = os.stat(gitignore).st_mtime_ns
+            with open(gitignore, errors="replace") as f:
+                text = f.read()
+            rules = (*rules, (rel, parse_gitignore(text)))
+        except OSError:
+            pass
+
+        files = []
+        subdirs = []
+        links = set()
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+                if name in ALWAYS_IGNORED or not (is_dir or is_file):
+                    continue
+                if is_ignored(_join(rel, name), is_dir, rules):
+                    continue
+                (subdirs if is_dir else files).append(name)
+                if is_file and entry.is_symlink():
+                    links.add(name)
+
+        directory = _Directory(
+            rel, mtime_ns, gitignore_mtime_ns, rules, files, subdirs, links
+        )
+        return directory, [(_join(rel, name), rules) for name in subdirs]
+
+    def _scan_tree(self, rel: str, rules: RuleStack) -> dict[str, _Directory]:
+        """Scan a directory and everything below it on a thread pool."""
+        scanned: dict[str, _Directory] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending: set[Future] = {pool.submit(self._scan_dir, rel, rules)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        directory, children = future.result()
+                    except OSError:
+                        continue  # Vanished or unreadable directory
+                    scanned[directory.rel] = directory
+                    for child in children:
+                        pending.add(pool.submit(self._scan_dir, *child))
+        return scanned
+
+    @staticmethod
+    def _all_paths(directories) -> list[str]:
+        return [
+            _join(directory.rel, name)
+            for directory in directories
+            for name in directory.files
+        ]
+
+    def _subtree(self, rel: str) -> list[_Directory]:
+        """Return a directory and all indexed directories below it."""
+        prefix = f"{rel}/" if rel else ""
+        return [
+            directory
+            for key, directory in self._dirs.items()
+            if key == rel or key.startswith(prefix)
+        ]
+
+    def _drop_subtree(self, rel: str) -> set[str]:
+        """Forget a directory and everything below it; return its file paths."""
+        subtree = self._subtree(rel)
+        for directory in subtree:
+            del self._dirs[directory.rel]
+            if self._watcher is not None:
+                self._watcher.unwatch(directory.rel)
+        return set(self._all_paths(subtree))
+
+    def _poll(self) -> tuple[set[str], set[str]]:
+        """Check every directory's mtime; return (removed, added) paths."""
+        removed: set[str] = set()
+        added: set[str] = set()
+        for rel in list(self._dirs):
+            directory = self._dirs.get(rel)
+            if directory is None:
+                continue  # Dropped with a parent during this refresh
+            changes = self._refresh_dir(directory)
+            if changes is not None:
+                removed |= changes[0]
+                added |= changes[1]
+        return removed, added
+
+    def _replay(
+        self, changed: set[str], written: set[tuple[str, str]]
+    ) -> tuple[set[str], set[str], set[str]]:
+        """Re-scan the directories the watcher reported.
+
+        Returns:
+            The paths removed, added and written to.
+        """
+        removed: set[str] = set()
+        added: set[str] = set()
+        edited_rules = {rel for rel, name in written if name == ".gitignore"}
+        # Parents first, so a dropped directory's children are skipped
+        for rel in sorted(changed | edited_rules):
+            directory = self._dirs.get(rel)
+            if directory is None:
+                continue
+            changes = self._refresh_dir(
+                directory, force=True, rules_changed=rel in edited_rules
+            )
+            if changes is not None:
+                removed |= changes[0]
+                added |= changes[1]
+        files = set()
+        for rel, name in written:
+            directory = self._dirs.get(rel)
+            if directory is not None and name in directory.files:
+                files.add(_join(rel, name))
+        return removed, added, files
+
+    def _refresh_dir(
+        self, directory: _Directory, force: bool = False, rules_changed: bool = False
+    ) -> tuple[set[str], set[str]] | None:
+        """Re-scan a directory if it changed; return (removed, added) paths.
+
+        Args:
+            directory: The directory to check.
+            force: Re-scan it even if its mtime is unchanged (the watcher
+                reported a change, which a coarse mtime may not show).
+            rules_changed: Its .gitignore was written to.
+        """
+        path = self._dir_path(directory.rel)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return self._drop_subtree(directory.rel), set()
+        try:
+            gitignore_mtime_ns = os.stat(os.path.join(path, ".gitignore")).st_mtime_ns
+        except OSError:
+            gitignore_mtime_ns = None
+
+        parent_rules = directory.rules
+        if directory.gitignore_mtime_ns is not None:
+            parent_rules = parent_rules[:-1]
+        if rules_changed or gitignore_mtime_ns != directory.gitignore_mtime_ns:
+            # Ignore rules changed: everything below may be affected
+            removed = self._drop_subtree(directory.rel)
+            scanned = self._scan_tree(directory.rel, parent_rules)
+            self._dirs.update(scanned)
+            return removed, set(self._all_paths(scanned.values()))
+
+        if not force and mtime_ns == directory.mtime_ns:
+            return None
+
+        try:
+            updated, _ = self._scan_dir(directory.rel, parent_rules)
+        except OSError:
+            return self._drop_subtree(directory.rel), set()
+        self._dirs[directory.rel] = updated
+
+        removed = {
+            _join(directory.rel, name)
+            for name in set(directory.files) - set(updated.files)
+        }
+        added = {
+            _join(directory.rel, name)
+            for name in set(updated.files) - set(directory.files)
+        }
+        for name in set(directory.subdirs) - set(updated.subdirs):
+            removed |= self._drop_subtree(_join(directory.rel, name))
+        for name in set(updated.subdirs) - set(directory.subdirs):
+            scanned = self._scan_tree(_join(directory.rel, name), updated.rules)
+            self._dirs.update(scanned)
+            added |= set(self._all_paths(scanned.values()))
+        return removed, added
+
+    def _apply_changes(self, removed: set[str], added: set[str]) -> None:
+        """Patch the sorted path table, or rebuild it after large changes."""
+        if len(removed) + len(added) > _REBUILD_THRESHOLD:
+            self._paths = sorted(self._all_paths(self._dirs.values()))
+            self._names = None
+            return
+        paths = self._paths
+        for path in removed:
+            i = bisect.bisect_left(paths, path)
+            if i < len(paths) and paths[i] == path:
+                del paths[i]
+            if self._names is not None:
+                named = self._names.get(path.rpartition("/")[2], [])
+                if path in named:
+                    named.remove(path)
+        for path in added:
+            bisect.insort(paths, path)
+            if self._names is not None:
+                named = self._names.setdefault(path.rpartition("/")[2], [])
+                bisect.insort(named, path)
+
+
+_indexes: dict[Path, WorkspaceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_workspace_index(working_dir: Path) -> WorkspaceIndex:
+    """Return the index shared by all tools rooted in a working directory."""
+    working_dir = working_dir.resolve()
+    with _indexes_lock:
+        index = _indexes.get(working_dir)
+        if index is None:
+            index = _indexes[working_dir] = WorkspaceIndex(working_dir)
+        return index
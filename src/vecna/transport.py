@@ -0,0 +1,519 @@
+"""HTTP transport for the API clients - connection pooling and retries.
+
+The client factories in `vecna.utils` return one client per configuration
+for the whole process, so all agents share a keep-alive connection pool and
+pay for a TLS handshake only when the pool grows. Underneath the client sits
+a `RetryTransport`, which replaces the SDK's own retries (the clients are
+built with `max_retries=0`):
+
+- Rate limit, overload and transient server errors are retried, as are
+  connections that failed before a response arrived. A `retry-after-ms` or
+  `retry-after` header sets the wait; otherwise the wait grows
+  exponentially, with jitter so that clients don't retry in lockstep.
+- Every request passes through one `AdaptiveLimiter` shared by the process.
+  A 429 or 529 halves how many requests may be in flight and holds back new
+  ones until the retry-after time has passed. Each run of successes raises
+  the limit by one again, up to its maximum.
+- Retries are counted per status, for the process (`RetryPolicy.counts`) and
+  for the agent turn that made the request (`TurnStats.retries`).
+
+Settings are read from the environment:
+
+    VECNA_MAX_CONNECTIONS=100     # connections in the pool
+    VECNA_MAX_KEEPALIVE=20        # idle connections kept open
+    VECNA_KEEPALIVE_EXPIRY=120    # seconds an idle connection is kept
+    VECNA_TIMEOUT=600             # seconds to wait for a response
+    VECNA_CONNECT_TIMEOUT=10      # seconds to wait for a connection
+    VECNA_MAX_RETRIES=4           # retries of a request
+    VECNA_MAX_CONCURRENCY=32      # requests in flight at most
+"""
+
+import asyncio
+import email.utils
+import os
+import random
+import socket
+import threading
+import time
+import urllib.request
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from vecna.stats import record_retry
+
+# Status codes worth retrying, and those that mean "slow down"
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+THROTTLE_STATUSES = frozenset({429, 529})
+
+# Backoff between retries, in seconds
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+# Longer retry-after times are capped to this
+MAX_RETRY_AFTER = 60.0
+
+# Transport errors that are retried, as the SDK's own retries would (clients
+# are built with those turned off). Only connect errors are sure to happen
+# before the server saw the request: after a read or write timeout, or a
+# dropped connection (RemoteProtocolError, typically a keep-alive connection
+# the server had closed), a request the server already accepted, POSTs
+# included, may be sent again.
+_RETRY_ERRORS = (
+    httpx.ConnectError,
+    httpx.TimeoutException,
+    httpx.RemoteProtocolError,
+)
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """Connection pool, timeout and retry settings of the API clients."""
+
+    max_connections: int = 100
+    max_keepalive: int = 20
+    keepalive_expiry: float = 120.0
+    timeout: float = 600.0
+    connect_timeout: float = 10.0
+    max_retries: int = 4
+    max_concurrency: int = 32
+
+    @classmethod
+    def from_env(cls) -> "ClientConfig":
+        """Read the settings from VECNA_* environment variables."""
+        env = os.environ
+        default = cls()
+        return cls(
+            max_connections=int(
+                env.get("VECNA_MAX_CONNECTIONS", default.max_connections)
+            ),
+            max_keepalive=int(env.get("VECNA_MAX_KEEPALIVE", default.max_keepalive)),
+            keepalive_expiry=float(
+                env.get("VECNA_KEEPALIVE_EXPIRY", default.keepalive_expiry)
+            ),
+            timeout=float(env.get("VECNA_TIMEOUT", default.timeout)),
+            connect_timeout=float(
+                env.get("VECNA_CONNECT_TIMEOUT", default.connect_timeout)
+            ),
+            max_retries=int(env.get("VECNA_MAX_RETRIES", default.max_retries)),
+            max_concurrency=int(
+                env.get("VECNA_MAX_CONCURRENCY", default.max_concurrency)
+            ),
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeouts(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+
+def _socket_options() -> list[tuple[int, int, int]]:
+    """TCP keep-alive probes, so idle pooled connections aren't dropped."""
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (
+        ("TCP_KEEPIDLE", 60),
+        ("TCP_KEEPINTVL", 60),
+        ("TCP_KEEPCNT", 5),
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+def _env_proxy(base_url: str) -> httpx.Proxy | None:
+    """Return the proxy the environment sets for `base_url`, if any.
+
+    httpx ignores the proxy variables once a transport is given, so the
+    pooled transports pick the proxy up themselves.
+    """
+    url = httpx.URL(base_url)
+    if urllib.request.proxy_bypass(url.host):
+        return None
+    proxies = urllib.request.getproxies()
+    proxy = proxies.get(url.scheme) or proxies.get("all")
+    return httpx.Proxy(proxy) if proxy else None
+
+
+def http_transport(config: ClientConfig, base_url: str) -> httpx.HTTPTransport:
+    """Create a pooled network transport for requests to `base_url`."""
+    return httpx.HTTPTransport(
+        limits=config.limits,
+        socket_options=_socket_options(),
+        proxy=_env_proxy(base_url),
+    )
+
+
+def async_http_transport(
+    config: ClientConfig, base_url: str
+) -> httpx.AsyncHTTPTransport:
+    """Create a pooled async network transport for requests to `base_url`."""
+    return httpx.AsyncHTTPTransport(
+        limits=config.limits,
+        socket_options=_socket_options(),
+        proxy=_env_proxy(base_url),
+    )
+
+
+def _set_result(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveLimiter:
+    """Limits work in flight, backing off when the server pushes back.
+
+    The limit starts at `max_concurrency`. A throttled request halves it and
+    holds back new starts until the retry-after time has passed; each run of
+    `limit` successes raises it by one again. Threads wait with `acquire`
+    and tasks with `aacquire`; both share the same slots.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        """Initialize the limiter.
+
+        Args:
+            max_concurrency: The most allowed in flight at once.
+        """
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._changed = threading.Condition()
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _try_acquire(self) -> float | None:
+        """Take a slot, or return how long to wait (0 until one is freed)."""
+        pause = self._resume_at - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.active < self.limit:
+            self.active += 1
+            return None
+        return 0.0
+
+    def acquire(self) -> None:
+        """Wait for a free slot."""
+        with self._changed:
+            while (wait := self._try_acquire()) is not None:
+                self._changed.wait(wait or None)
+
+    async def aacquire(self) -> None:
+        """Wait for a free slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._changed:
+                wait = self._try_acquire()
+                if wait is None:
+                    return
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            try:
+                await asyncio.wait_for(future, wait or None)
+            except TimeoutError:
+                pass
+
+    def release(self, throttled_for: float | None = None, success: bool = True) -> None:
+        """Free a slot.
+
+        Args:
+            throttled_for: If the work was throttled, how long to hold back
+                new starts for.
+            success: Whether the work succeeded (only successes raise the
+                limit).
+        """
+        with self._changed:
+            self.active -= 1
+            if throttled_for is not None:
+                self.limit = max(self.limit // 2, 1)
+                self._successes = 0
+                self._resume_at = max(self._resume_at, time.monotonic() + throttled_for)
+            elif success:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._changed.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_set_result, future)
+            except RuntimeError:
+                # The waiter's loop has closed
+                pass
+
+
+def retry_after(headers: httpx.Headers) -> float | None:
+    """Return the wait a response asks for, in seconds, if any."""
+    try:
+        return float(headers["retry-after-ms"]) / 1000
+    except (KeyError, ValueError):
+        pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+def interrupt(response: httpx.Response) -> None:
+    """Wake a thread blocked reading a streamed response, from another thread.
+
+    Closing the response alone would leave a read in progress waiting until
+    more data arrives. Shutting its socket down ends the read right away; the
+    reading thread then fails with a read error and closes the response (and
+    its connection) itself.
+    """
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        # Already closed
+        pass
+
+
+class RetryPolicy:
+    """When and how long to retry, shared by every client of a process."""
+
+    def __init__(
+        self,
+        max_retries: int = ClientConfig.max_retries,
+        max_concurrency: int = ClientConfig.max_concurrency,
+    ) -> None:
+        """Initialize the policy.
+
+        Args:
+            max_retries: Retries of a single request.
+            max_concurrency: Requests in flight at most.
+        """
+        self.max_retries = max_retries
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        # Retries made, by status code (0 for failed connections)
+        self.counts: Counter[int] = Counter()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def retries(self) -> int:
+        """Retries made so far."""
+        return self.counts.total()
+
+    def should_retry(self, response: httpx.Response) -> bool:
+        """Whether a response is worth retrying, ignoring the attempt count."""
+        header = response.headers.get("x-should-retry")
+        if header in ("true", "false"):
+            return header == "true"
+        return response.status_code in RETRY_STATUSES
+
+    def backoff(self, attempt: int, response: httpx.Response | None = None) -> float:
+        """Seconds to wait before retry number `attempt` (from 1)."""
+        if response is not None:
+            wait = retry_after(response.headers)
+            if wait is not None:
+                return min(wait, MAX_RETRY_AFTER)
+        wait = min(BASE_BACKOFF * 2 ** (attempt - 1), MAX_BACKOFF)
+        return wait * random.uniform(0.5, 1.0)
+
+    def count(self, status: int) -> None:
+        """Count a retry of a request that got `status` (0: no response)."""
+        with self._lock:
+            self.counts[status] += 1
+        record_retry(status)
+
+    def _started(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the request and retry counts and the current limit."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.counts.total(),
+                "retries_by_status": dict(self.counts),
+                "concurrency_limit": self.limiter.limit,
+            }
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """A response body that frees its limiter slot when closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """Async version of `_ReleasingStream`."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+def _once(func: Callable[[], None]) -> Callable[[], None]:
+    done = False
+
+    def wrapper() -> None:
+        nonlocal done
+        if not done:
+            done = True
+            func()
+
+    return wrapper
+
+
+def _wrap(response: httpx.Response, stream: Any) -> httpx.Response:
+    return httpx.Response(
+        status_code=response.status_code,
+        headers=response.headers,
+        stream=stream,
+        extensions=response.extensions,
+    )
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Retries failed requests and limits how many are in flight.
+
+    A request holds a limiter slot until its response body is closed, so a
+    long stream counts as in flight for as long as it runs.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, policy: RetryPolicy) -> None:
+        """Initialize the transport.
+
+        Args:
+            transport: The transport that sends the requests.
+            policy: The retry policy (and limiter) to follow.
+        """
+        self.transport = transport
+        self.policy = policy
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy._started()
+        attempt = 0
+        while True:
+            attempt += 1
+            policy.limiter.acquire()
+            try:
+                response = self.transport.handle_request(request)
+            except _RETRY_ERRORS:
+                policy.limiter.release(success=False)
+                if attempt > policy.max_retries:
+                    raise
+                policy.count(0)
+                time.sleep(policy.backoff(attempt))
+                continue
+            except BaseException:
+                policy.limiter.release(success=False)
+                raise
+
+            if attempt > policy.max_retries or not policy.should_retry(response):
+                release = _once(
+                    lambda ok=response.is_success: policy.limiter.release(success=ok)
+                )
+                return _wrap(response, _ReleasingStream(response.stream, release))
+
+            wait = policy.backoff(attempt, response)
+            response.close()
+            throttled = response.status_code in THROTTLE_STATUSES
+            policy.limiter.release(wait if throttled else None, success=False)
+            policy.count(response.status_code)
+            if not throttled:
+                # A throttled retry waits in the limiter instead
+                time.sleep(wait)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async version of `RetryTransport`."""
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, policy: RetryPolicy
+    ) -> None:
+        """Initialize the transport.
+
+        Args:
+            transport: The transport that sends the requests.
+            policy: The retry policy (and limiter) to follow.
+        """
+        self.transport = transport
+        self.policy = policy
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy._started()
+        attempt = 0
+        while True:
+            attempt += 1
+            await policy.limiter.aacquire()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except _RETRY_ERRORS:
+                policy.limiter.release(success=False)
+                if attempt > policy.max_retries:
+                    raise
+                policy.count(0)
+                await asyncio.sleep(policy.backoff(attempt))
+                continue
+            except BaseException:
+                policy.limiter.release(success=False)
+                raise
+
+            if attempt > policy.max_retries or not policy.should_retry(response):
+                release = _once(
+                    lambda ok=response.is_success: policy.limiter.release(success=ok)
+                )
+                return _wrap(response, _AsyncReleasingStream(response.stream, release))
+
+            wait = policy.backoff(attempt, response)
+            await response.aclose()
+            throttled = response.status_code in THROTTLE_STATUSES
+            policy.limiter.release(wait if throttled else None, success=False)
+            policy.count(response.status_code)
+            if not throttled:
+                await asyncio.sleep(wait)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
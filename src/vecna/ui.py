@@ -1,10 +1,15 @@
 """UI utilities for terminal output using Rick."""
 
+from typing import TYPE_CHECKING, Any
+
 from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
 from rich.theme import Theme
 
+from vecna import __version__
+
+if TYPE_CHECKING:
+    from vecna.stats import TurnStats
+
 # Create a custom theme for consisten styling
 custom_theme = Theme(
     {
@@ -23,13 +28,15 @@ console = Console(theme=custom_theme)
 def print_welcome() -> None:
     """Print the welcome message."""
     console.print()
-    console.print("[bold blue]Vecna[/bold blue] v0.1.0 - AI Coding Assistant")
+    console.print(f"[bold blue]Vecna[/bold blue] v{__version__} - AI Coding Assistant")
     console.print("[dim]Type 'exit' to quit[/dim]")
     console.print()
 
 
 def print_response(text: str) -> None:
     """Print an assistant response with markdown formatting."""
+    from rich.markdown import Markdown
+
     md = Markdown(text)
     console.print(md)
     console.print()
@@ -42,6 +49,7 @@ def print_help() -> None:
 
     - **exit** or **quit**: Exit Vecna
     - **help**: Show this help message
+    - **stats**: Show latency, throughput and token statistics
     - **clear**: Clear the screen
 
     ## Usage
@@ -49,6 +57,8 @@ def print_help() -> None:
     Just type your request and press Enter. For example:
     - "Read the main.py file"
     - "Add type hints to the greet function"
+
+    Press Ctrl+C while a reply is streaming to stop it.
     """
     print_response(help_text)
 
@@ -71,10 +81,81 @@ def print_tool_call(tool_name: str, args: dict) -> None:
 
 def print_tool_result(result: str, success: bool = True) -> None:
     """Print a tool result in a panel."""
+    from rich.panel import Panel
+
     style = "green" if success else "red"
     console.print(Panel(result, border_style=style, padding=(0, 1)))
 
 
+def print_usage(usage: dict[str, int]) -> None:
+    """Print a turn's token usage, including prompt cache reads and writes."""
+    console.print(
+        f"[dim]tokens: {usage['input_tokens']:,} in "
+        f"({usage['cache_read_input_tokens']:,} cache read, "
+        f"{usage['cache_creation_input_tokens']:,} cache write) · "
+        f"{usage['output_tokens']:,} out[/dim]"
+    )
+
+
+def _seconds(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:,.0f} ms"
+
+
+def print_stats(last: "TurnStats | None", summary: dict[str, Any]) -> None:
+    """Print the latest turn's timings and a summary of the session."""
+    from rich.table import Table
+
+    if last is None:
+        console.print("[dim]No turns yet.[/dim]")
+        return
+
+    turn = Table(title=f"Turn {last.turn}", show_header=False, box=None)
+    turn.add_column(style="dim")
+    turn.add_column(justify="right")
+    turn.add_row("latency", _seconds(last.latency))
+    turn.add_row("time to first token", _seconds(last.ttft))
+    rate = last.tokens_per_second
+    turn.add_row("output tokens/s", "-" if rate is None else f"{rate:,.1f}")
+    turn.add_row("API calls", f"{last.api_calls} ({_seconds(last.api_time)})")
+    if last.retries:
+        turn.add_row("retries", str(last.retries))
+    turn.add_row(
+        "tokens in / out",
+        f"{last.input_tokens:,} / {last.output_tokens:,}",
+    )
+    turn.add_row(
+        "cache read / write",
+        f"{last.cache_read_input_tokens:,} / {last.cache_creation_input_tokens:,}",
+    )
+    for tool in last.tools:
+        turn.add_row(f"tool {tool.name}", _seconds(tool.seconds))
+    turn.add_row("render", _seconds(last.render_time))
+    console.print(turn)
+
+    session = Table(title=f"Session ({summary['turns']} turns)", box=None)
+    session.add_column("", style="dim")
+    for column in ("mean", "p50", "p95", "max"):
+        session.add_column(column, justify="right")
+    for label, key in (("latency", "latency"), ("ttft", "ttft")):
+        dist = summary[key]
+        if dist is not None:
+            session.add_row(
+                label, *(_seconds(dist[c]) for c in ("mean", "p50", "p95", "max"))
+            )
+    dist = summary["tokens_per_second"]
+    if dist is not None:
+        session.add_row(
+            "tokens/s", *(f"{dist[c]:,.1f}" for c in ("mean", "p50", "p95", "max"))
+        )
+    console.print(session)
+    if summary["retries"]:
+        console.print(f"[dim]retried requests: {summary['retries']}[/dim]")
+    for name, tool in summary["tools"].items():
+        console.print(
+            f"[dim]{name}: {tool['calls']} calls, {_seconds(tool['seconds'])}[/dim]"
+        )
+
+
 def get_prompt() -> str:
     """Get the input prompt string."""
     return "[prompt]>[/prompt] "
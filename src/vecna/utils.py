@@ -1,20 +1,48 @@
-"""Utility functions for Vecna."""
+"""Utility functions for Vecna.
 
+The Anthropic SDK and python-dotenv are imported on first use rather than at
+module load, so commands that never talk to the API start quickly.
+
+Clients are shared: every agent in the process that uses the same settings
+gets the same client, and so the same connection pool and retry policy (see
+`vecna.transport`).
+"""
+
+import functools
 import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
+
+    from vecna.transport import RetryPolicy
+
+# Shared clients and retry policies, by their settings
+_clients_lock = threading.RLock()
+_clients: dict[tuple, "Anthropic"] = {}
+_async_clients: weakref.WeakKeyDictionary[Any, dict[tuple, "AsyncAnthropic"]] = (
+    weakref.WeakKeyDictionary()
+)
+_policies: dict[tuple[int, int], "RetryPolicy"] = {}
+
 
-from anthropic import Anthropic
-from dotenv import load_dotenv
+@functools.cache
+def load_env() -> None:
+    """Load environment variables from the .env file, once per process."""
+    from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+    load_dotenv()
 
 
-def get_client() -> Anthropic:
-    """Create and return an Anthropic client.
+def get_api_key() -> str:
+    """Return the Anthropic API key from the environment.
 
     Raises:
         ValueError: If ANTHROPIC_API_KEY is not set.
     """
+    load_env()
     api_key = os.environ.get("ANTHROPIC_API_KEY")
 
     if not api_key:
@@ -24,4 +52,138 @@ def get_client() -> Anthropic:
             "Then add it to your .env file: ANTHROPIC_API_KEY=sk-ant-..."
         )
 
-    return Anthropic(api_key=api_key)
+    return api_key
+
+
+def _client_api_key() -> str:
+    """Return the API key for a new client.
+
+    Replaying a cassette never reaches the API, so no key is needed then.
+    """
+    from vecna.replay import replay_mode
+
+    load_env()
+    if replay_mode() == "replay" and not os.environ.get("ANTHROPIC_API_KEY"):
+        return "replay"
+    return get_api_key()
+
+
+def _client_key(api_key: str) -> tuple:
+    """Everything a client is built from, so changed settings get a new one."""
+    from vecna.transport import ClientConfig
+
+    env = os.environ
+    return (
+        api_key,
+        ClientConfig.from_env(),
+        env.get("ANTHROPIC_BASE_URL"),
+        env.get("VECNA_CASSETTE"),
+        env.get("VECNA_CASSETTE_MODE"),
+        env.get("VECNA_REPLAY_SPEED"),
+    )
+
+
+def _base_url() -> str:
+    return os.environ.get("ANTHROPIC_BASE_URL") or "https://api.anthropic.com"
+
+
+def get_retry_policy() -> "RetryPolicy":
+    """Return the retry policy shared by every client of this process.
+
+    One policy (and so one concurrency limiter) is kept per retry setting.
+    """
+    from vecna.transport import ClientConfig, RetryPolicy
+
+    config = ClientConfig.from_env()
+    key = (config.max_retries, config.max_concurrency)
+    with _clients_lock:
+        policy = _policies.get(key)
+        if policy is None:
+            policy = _policies[key] = RetryPolicy(*key)
+    return policy
+
+
+def _new_client(api_key: str) -> "Anthropic":
+    from anthropic import Anthropic, DefaultHttpxClient
+
+    from vecna.replay import transport_from_env
+    from vecna.transport import ClientConfig, RetryTransport, http_transport
+
+    config = ClientConfig.from_env()
+    network = http_transport(config, _base_url())
+    transport = RetryTransport(
+        transport_from_env(network) or network, get_retry_policy()
+    )
+    return Anthropic(
+        api_key=api_key,
+        max_retries=0,
+        timeout=config.timeouts,
+        http_client=DefaultHttpxClient(transport=transport, timeout=config.timeouts),
+    )
+
+
+def _new_async_client(api_key: str) -> "AsyncAnthropic":
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+    from vecna.replay import async_transport_from_env
+    from vecna.transport import AsyncRetryTransport, ClientConfig, async_http_transport
+
+    config = ClientConfig.from_env()
+    network = async_http_transport(config, _base_url())
+    transport = AsyncRetryTransport(
+        async_transport_from_env(network) or network, get_retry_policy()
+    )
+    return AsyncAnthropic(
+        api_key=api_key,
+        max_retries=0,
+        timeout=config.timeouts,
+        http_client=DefaultAsyncHttpxClient(
+            transport=transport, timeout=config.timeouts
+        ),
+    )
+
+
+def get_client() -> "Anthropic":
+    """Return the Anthropic client shared by this process.
+
+    Clients are pooled (see `vecna.transport`): every caller with the same
+    settings gets the same client and so the same connections. When
+    VECNA_CASSETTE is set, the client records to or replays from that
+    cassette (see `vecna.replay`).
+
+    Raises:
+        ValueError: If ANTHROPIC_API_KEY is not set.
+    """
+    api_key = _client_api_key()
+    key = _client_key(api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _new_client(api_key)
+    return client
+
+
+def get_async_client() -> "AsyncAnthropic":
+    """Return the async Anthropic client shared by the running event loop.
+
+    Uses the same configuration as `get_client()`. An async connection pool
+    belongs to one event loop, so each loop gets its own client; called
+    outside a running loop, this returns a new client.
+
+    Raises:
+        ValueError: If ANTHROPIC_API_KEY is not set.
+    """
+    import asyncio
+
+    api_key = _client_api_key()
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _new_async_client(api_key)
+    key = _client_key(api_key)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = _new_async_client(api_key)
+    return client
@@ -0,0 +1,446 @@
+"""Tests for the agent."""
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from vecna.agent import INTERRUPTED_NOTE, Agent, AsyncAgent
+from vecna.session import Session
+from vecna.tools import ToolRegistry
+from vecna.tools.file_read import FileReadTool
+
+USAGE = SimpleNamespace(
+    input_tokens=10,
+    output_tokens=5,
+    cache_read_input_tokens=100,
+    cache_creation_input_tokens=0,
+)
+
+
+def text_block(text: str) -> SimpleNamespace:
+    return SimpleNamespace(type="text", text=text)
+
+
+def tool_use_block(call_id: str, name: str, arguments: dict) -> SimpleNamespace:
+    return SimpleNamespace(type="tool_use", id=call_id, name=name, input=arguments)
+
+
+class FakeStream:
+    """Stand-in for the SDK's message stream context manager."""
+
+    def __init__(self, content: list) -> None:
+        self.content = content
+        text = "".join(block.text for block in content if block.type == "text")
+        self.chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+        self.response = SimpleNamespace(extensions={})
+
+    def __enter__(self):
+        self.text_stream = iter(self.chunks)
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    async def __aenter__(self):
+        async def text_stream():
+            for chunk in self.chunks:
+                yield chunk
+
+        self.text_stream = text_stream()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def get_final_message(self):
+        return SimpleNamespace(content=self.content, usage=USAGE)
+
+
+class FakeMessages:
+    """Records requests and replies with canned content.
+
+    Each reply is either a string (a text-only answer) or a list of blocks.
+    """
+
+    def __init__(self, replies: list) -> None:
+        self.replies = list(replies)
+        self.requests: list[dict] = []
+
+    def _record(self, kwargs: dict) -> list:
+        kwargs["messages"] = list(kwargs["messages"])
+        self.requests.append(kwargs)
+        reply = self.replies.pop(0)
+        return [text_block(reply)] if isinstance(reply, str) else reply
+
+    def create(self, **kwargs):
+        return SimpleNamespace(content=self._record(kwargs), usage=USAGE)
+
+    def stream(self, **kwargs):
+        return FakeStream(self._record(kwargs))
+
+
+class FakeAsyncStream(FakeStream):
+    async def get_final_message(self):
+        return FakeStream.get_final_message(self)
+
+
+class FakeAsyncMessages(FakeMessages):
+    async def create(self, **kwargs):
+        return FakeMessages.create(self, **kwargs)
+
+    def stream(self, **kwargs):
+        return FakeAsyncStream(self._record(kwargs))
+
+
+def fake_client(replies: list, messages_cls=FakeMessages):
+    return SimpleNamespace(messages=messages_cls(replies))
+
+
+def test_agent_chat_records_history():
+    """Test that chat sends the history and records both turns."""
+    client = fake_client(["Hi there", "Still here"])
+    agent = Agent(client=client)
+
+    assert agent.chat("Hello") == "Hi there"
+    assert agent.chat("Again") == "Still here"
+
+    assert [m["role"] for m in agent.messages] == [
+        "user",
+        "assistant",
+        "user",
+        "assistant",
+    ]
+    assert len(client.messages.requests[1]["messages"]) == 3
+
+
+def test_agent_chat_stream_yields_chunks():
+    """Test that chat_stream yields the response and stores it in history."""
+    agent = Agent(client=fake_client(["Streaming reply"]))
+
+    chunks = list(agent.chat_stream("Hello"))
+
+    assert "".join(chunks) == "Streaming reply"
+    assert agent.messages[-1] == {"role": "assistant", "content": "Streaming reply"}
+
+
+async def test_async_agent_chat():
+    """Test the async chat round trip."""
+    agent = AsyncAgent(client=fake_client(["Async hi"], FakeAsyncMessages))
+
+    assert await agent.chat("Hello") == "Async hi"
+    assert agent.messages[-1]["content"] == "Async hi"
+
+
+async def test_async_agent_chat_stream():
+    """Test that the async stream yields chunks and records history."""
+    agent = AsyncAgent(client=fake_client(["Async stream"], FakeAsyncMessages))
+
+    chunks = [chunk async for chunk in agent.chat_stream("Hello")]
+
+    assert "".join(chunks) == "Async stream"
+    assert agent.messages[-1]["content"] == "Async stream"
+
+
+def test_agent_chat_runs_tool_calls(tmp_path: Path):
+    """Test that tool_use blocks are executed and their results sent back."""
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "b.txt").write_text("beta")
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(
+        [
+            [
+                text_block("Reading."),
+                tool_use_block("t1", "read_file", {"path": "a.txt"}),
+                tool_use_block("t2", "read_file", {"path": "b.txt"}),
+            ],
+            "Done.",
+        ]
+    )
+    agent = Agent(client=client, tools=registry)
+
+    assert agent.chat("Read both") == "Reading.\n\nDone."
+
+    assert client.messages.requests[0]["tools"][0]["name"] == "read_file"
+    tool_results = agent.messages[2]["content"]
+    assert [r["tool_use_id"] for r in tool_results] == ["t1", "t2"]
+    assert "alpha" in tool_results[0]["content"]
+    assert "beta" in tool_results[1]["content"]
+    assert agent.messages[-1] == {"role": "assistant", "content": "Done."}
+
+
+def test_agent_chat_stream_runs_tool_calls(tmp_path: Path):
+    """Test that streaming continues after executing tool calls."""
+    (tmp_path / "a.txt").write_text("alpha")
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(
+        [
+            [
+                text_block("Let me look."),
+                tool_use_block("t1", "read_file", {"path": "a.txt"}),
+            ],
+            "It says alpha.",
+        ]
+    )
+    agent = Agent(client=client, tools=registry)
+
+    text = "".join(agent.chat_stream("What is in a.txt?"))
+
+    assert text == "Let me look.\n\nIt says alpha."
+    assert [m["role"] for m in agent.messages] == [
+        "user",
+        "assistant",
+        "user",
+        "assistant",
+    ]
+
+
+async def test_async_agent_chat_runs_tool_calls(tmp_path: Path):
+    """Test the async tool loop."""
+    (tmp_path / "a.txt").write_text("alpha")
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(
+        [[tool_use_block("t1", "read_file", {"path": "a.txt"})], "alpha it is"],
+        FakeAsyncMessages,
+    )
+    agent = AsyncAgent(client=client, tools=registry)
+
+    assert await agent.chat("Read a.txt") == "alpha it is"
+    assert "alpha" in agent.messages[2]["content"][0]["content"]
+
+
+def test_agent_marks_cache_breakpoints(tmp_path: Path):
+    """Test that system, tools and the newest message carry cache_control."""
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(["First", "Second"])
+    agent = Agent(client=client, tools=registry)
+
+    agent.chat("Hello")
+    agent.chat("Again")
+
+    request = client.messages.requests[1]
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert request["tools"][-1]["cache_control"] == {"type": "ephemeral"}
+    last_block = request["messages"][-1]["content"][-1]
+    assert last_block == {
+        "type": "text",
+        "text": "Again",
+        "cache_control": {"type": "ephemeral"},
+    }
+    # Only the request copy carries breakpoints, history stays plain
+    assert agent.messages[2] == {"role": "user", "content": "Again"}
+    assert "cache_control" not in registry.to_anthropic_format()[0]
+
+
+def test_agent_prompt_cache_disabled(monkeypatch):
+    """Test that VECNA_PROMPT_CACHE=0 sends the plain system prompt."""
+    monkeypatch.setenv("VECNA_PROMPT_CACHE", "0")
+    client = fake_client(["Hi"])
+    agent = Agent(client=client)
+
+    agent.chat("Hello")
+
+    assert isinstance(client.messages.requests[0]["system"], str)
+
+
+def test_agent_reports_turn_usage(tmp_path: Path):
+    """Test that usage is summed over every API call in a turn."""
+    (tmp_path / "a.txt").write_text("alpha")
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(
+        [[tool_use_block("t1", "read_file", {"path": "a.txt"})], "Done", "Next"]
+    )
+    agent = Agent(client=client, tools=registry)
+
+    agent.chat("Read a.txt")
+    assert agent.last_usage["cache_read_input_tokens"] == 200
+    assert agent.last_usage["output_tokens"] == 10
+
+    agent.chat("And now?")
+    assert agent.last_usage["cache_read_input_tokens"] == 100
+
+
+def test_agent_compacts_history_over_budget():
+    """Test that the agent summarizes old turns once over its budget."""
+    client = fake_client(["One", "Summary text", "Two"])
+    agent = Agent(client=client)
+    agent.history.max_tokens = 20
+    agent.history.keep_recent_turns = 1
+
+    agent.chat("First " * 20)
+    agent.chat("Second")
+
+    summary_request = client.messages.requests[1]
+    assert "First" in summary_request["messages"][0]["content"]
+    assert agent.messages[0]["content"].endswith("Summary text")
+    assert agent.messages[2:] == [
+        {"role": "user", "content": "Second"},
+        {"role": "assistant", "content": "Two"},
+    ]
+    assert agent.history.tokens_saved > 0
+
+
+def test_agent_records_turn_stats(tmp_path: Path, monkeypatch):
+    """Test that a streamed turn records TTFT, tool timings and usage."""
+    trace_file = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("VECNA_TRACE_FILE", str(trace_file))
+    (tmp_path / "a.txt").write_text("alpha")
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(
+        [
+            [
+                text_block("Reading."),
+                tool_use_block("t1", "read_file", {"path": "a.txt"}),
+            ],
+            "Done.",
+        ]
+    )
+    agent = Agent(client=client, tools=registry)
+    turns = []
+    agent.stats.add_hook(turns.append)
+
+    list(agent.chat_stream("Read a.txt"))
+
+    (turn,) = turns
+    assert turn is agent.stats.last
+    assert turn.api_calls == 2
+    assert 0 <= turn.ttft <= turn.latency
+    assert turn.output_tokens == 10
+    assert turn.tokens_per_second > 0
+    assert [(tool.call_id, tool.name) for tool in turn.tools] == [("t1", "read_file")]
+    assert json.loads(trace_file.read_text())["tools"][0]["name"] == "read_file"
+
+
+async def test_async_agent_records_turn_stats():
+    """Test that the async agent publishes stats for each turn."""
+    agent = AsyncAgent(client=fake_client(["One", "Two"], FakeAsyncMessages))
+
+    await agent.chat("Hello")
+    [chunk async for chunk in agent.chat_stream("Again")]
+
+    assert [turn.turn for turn in agent.stats.turns] == [1, 2]
+    assert agent.stats.turns[0].ttft is None
+    assert agent.stats.turns[1].ttft is not None
+
+
+def test_agent_saves_and_resumes(tmp_path: Path):
+    """Test that an agent saves every turn and a new agent picks it up."""
+    session = Session.create(tmp_path)
+    agent = Agent(client=fake_client(["One", "Two"]), session=session)
+    agent.chat("First")
+    agent.chat("Second")
+
+    client = fake_client(["Three"])
+    resumed = Agent(client=client, session=Session.open("latest", tmp_path))
+    assert resumed.messages == agent.messages
+    resumed.chat("Third")
+
+    assert len(client.messages.requests[0]["messages"]) == 5
+    assert len(Session.open(session.id, tmp_path).load_messages()) == 6
+
+
+def test_agent_cancel_keeps_streamed_text(tmp_path: Path):
+    """Test that cancel() ends the stream and keeps what was shown."""
+    (tmp_path / "a.txt").write_text("alpha")
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    client = fake_client(
+        [[tool_use_block("t1", "read_file", {"path": "a.txt"})], "It says alpha."]
+    )
+    session = Session.create(tmp_path / "sessions")
+    agent = Agent(client=client, tools=registry, session=session)
+
+    chunks = []
+    for chunk in agent.chat_stream("Read a.txt"):
+        chunks.append(chunk)
+        agent.cancel()
+
+    assert chunks == ["It "]
+    assert agent.cancelled
+    assert [m["role"] for m in agent.messages] == [
+        "user",
+        "assistant",
+        "user",
+        "assistant",
+    ]
+    assert agent.messages[-1]["content"] == f"It\n\n{INTERRUPTED_NOTE}"
+    assert agent.stats.last.cancelled
+    assert session.load_messages() == agent.messages
+
+    # The next turn starts afresh
+    client.messages.replies.append("Again")
+    assert "".join(agent.chat_stream("Hello")) == "Again"
+    assert not agent.cancelled
+
+
+def test_agent_interrupt_drops_unanswered_tool_calls():
+    """Test that Ctrl+C while tools run settles the history."""
+    client = fake_client(
+        [[text_block("Let me look."), tool_use_block("t1", "read_file", {})]]
+    )
+    agent = Agent(client=client, tools=ToolRegistry())
+
+    def interrupted(calls, on_timing, cancel):
+        raise KeyboardInterrupt
+
+    agent.tools.execute_many = interrupted
+    forgotten = []
+    agent.tools.forget_results = lambda: forgotten.append(True)
+
+    with pytest.raises(KeyboardInterrupt):
+        list(agent.chat_stream("Hello"))
+
+    assert agent.messages == [
+        {"role": "user", "content": "Hello"},
+        {"role": "assistant", "content": f"Let me look.\n\n{INTERRUPTED_NOTE}"},
+    ]
+    # Results of the dropped calls may have been recorded as seen
+    assert forgotten
+
+
+def test_agent_closed_stream_keeps_partial_text():
+    """Test that closing the generator early ends the turn."""
+    agent = Agent(client=fake_client(["Hello there"]))
+
+    reply = agent.chat_stream("Hello")
+    next(reply)
+    reply.close()
+
+    assert agent.messages[-1]["content"] == f"Hel\n\n{INTERRUPTED_NOTE}"
+    assert agent.stats.last.cancelled
+
+
+def test_agent_interrupted_before_output_forgets_prompt():
+    """Test that a turn cut short before any output leaves no trace."""
+
+    class InterruptedMessages(FakeMessages):
+        def stream(self, **kwargs):
+            raise KeyboardInterrupt
+
+    agent = Agent(client=fake_client([], InterruptedMessages))
+
+    with pytest.raises(KeyboardInterrupt):
+        list(agent.chat_stream("Hello"))
+
+    assert agent.messages == []
+    assert agent.stats.last.cancelled
+
+
+async def test_async_agent_cancel():
+    """Test that the async stream stops on cancel() or task cancellation."""
+    agent = AsyncAgent(client=fake_client(["Async stream"], FakeAsyncMessages))
+
+    chunks = []
+    async for chunk in agent.chat_stream("Hello"):
+        chunks.append(chunk)
+        agent.cancel()
+
+    assert chunks == ["Asy"]
+    assert agent.messages[-1]["content"] == f"Asy\n\n{INTERRUPTED_NOTE}"
@@ -0,0 +1,227 @@
+"""Tests for batch mode."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+
+from vecna.batch import load_completed, run_batch
+from vecna.tools import ToolRegistry
+
+
+def reply(text: str) -> dict:
+    return {
+        "id": "msg_1",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-test",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 5},
+    }
+
+
+class FakeAPI:
+    """Answers each prompt, after `errors[prompt]` error responses."""
+
+    def __init__(self, errors: dict[str, list[int]] | None = None) -> None:
+        self.errors = errors or {}
+        self.active = 0
+        self.max_active = 0
+        # Most requests in flight at once after the first error response
+        self.max_active_after_error = 0
+        self.errored = False
+        self.requests = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        if isinstance(prompt, list):
+            prompt = prompt[0]["text"]
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        if self.errored:
+            self.max_active_after_error = max(self.max_active_after_error, self.active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.active -= 1
+        if self.errors.get(prompt):
+            status = self.errors[prompt].pop(0)
+            self.errored = True
+            return httpx.Response(
+                status,
+                headers={"retry-after": "0"},
+                json={"type": "error", "error": {"type": "error", "message": "no"}},
+            )
+        return httpx.Response(200, json=reply(f"Done: {prompt}"))
+
+    def client(self) -> AsyncAnthropic:
+        return AsyncAnthropic(
+            api_key="sk-test",
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handle)),
+            max_retries=0,
+        )
+
+
+def write_input(path: Path, records: list) -> Path:
+    lines = [r if isinstance(r, str) else json.dumps(r) for r in records]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def read_output(path: Path) -> dict[str, dict]:
+    return {r["id"]: r for r in map(json.loads, path.read_text().splitlines())}
+
+
+async def run(api: FakeAPI, input_path: Path, output: Path, **kwargs):
+    return await run_batch(
+        input_path,
+        output,
+        client=api.client(),
+        tools_factory=lambda cwd: ToolRegistry(),
+        **kwargs,
+    )
+
+
+async def test_runs_items_concurrently(tmp_path: Path):
+    """Test that every item runs, at most `concurrency` at a time."""
+    items = [{"id": f"item-{i}", "prompt": f"task {i}"} for i in range(10)]
+    input_path = write_input(tmp_path / "in.jsonl", items)
+    output = tmp_path / "out.jsonl"
+    api = FakeAPI()
+
+    summary = await run(api, input_path, output, concurrency=3)
+
+    results = read_output(output)
+    assert summary.succeeded == 10 and summary.failed == 0
+    assert results["item-4"]["response"] == "Done: task 4"
+    assert results["item-4"]["usage"]["output_tokens"] == 5
+    assert 1 < api.max_active <= 3
+
+
+async def test_invalid_items_are_reported(tmp_path: Path):
+    """Test that bad lines, duplicate ids and missing directories fail alone."""
+    input_path = write_input(
+        tmp_path / "in.jsonl",
+        [
+            {"prompt": "fine"},
+            "{oops",
+            {"id": "x"},
+            {"id": "a", "prompt": "one"},
+            {"id": "a", "prompt": "two"},
+            {"id": "b", "prompt": "three", "cwd": str(tmp_path / "missing")},
+        ],
+    )
+    output = tmp_path / "out.jsonl"
+
+    summary = await run(FakeAPI(), input_path, output)
+
+    results = read_output(output)
+    assert (summary.succeeded, summary.failed) == (2, 4)
+    assert results["line-1"]["status"] == "ok"
+    assert "Invalid JSON" in results["line-2"]["error"]
+    assert results["line-3"]["status"] == "error"
+    assert results["a"]["response"] == "Done: one"  # the first line with the id
+    assert "No such directory" in results["b"]["error"]
+
+
+async def test_retries_transient_errors(tmp_path: Path):
+    """Test that rate limits are retried and client errors are not."""
+    input_path = write_input(
+        tmp_path / "in.jsonl",
+        [
+            {"id": "limited", "prompt": "limited"},
+            {"id": "overloaded", "prompt": "overloaded"},
+            {"id": "bad", "prompt": "bad"},
+            {"id": "flaky", "prompt": "flaky"},
+        ],
+    )
+    output = tmp_path / "out.jsonl"
+    api = FakeAPI(
+        {"limited": [429, 429], "overloaded": [529], "bad": [400], "flaky": [429] * 5}
+    )
+
+    summary = await run(api, input_path, output, retries=2)
+
+    results = read_output(output)
+    assert (summary.succeeded, summary.failed) == (2, 2)
+    assert results["limited"]["attempts"] == 3
+    assert results["overloaded"]["attempts"] == 2
+    assert results["bad"]["attempts"] == 1
+    assert "RateLimitError" in results["flaky"]["error"]
+    assert results["flaky"]["attempts"] == 3
+
+
+async def test_retried_items_keep_the_concurrency(tmp_path: Path):
+    """Test that an item that failed with a rate limit is only retried later.
+
+    Reacting to the throttle (cutting the request limit) is left to the
+    client's transport, which saw the same response.
+    """
+    items = [{"id": str(i), "prompt": f"task {i}"} for i in range(24)]
+    input_path = write_input(tmp_path / "in.jsonl", items)
+    output = tmp_path / "out.jsonl"
+    api = FakeAPI({"task 0": [429]})
+
+    summary = await run(api, input_path, output, concurrency=8)
+
+    assert summary.succeeded == 24
+    assert read_output(output)["0"]["attempts"] == 2
+    assert api.max_active_after_error == 8
+
+
+async def test_concurrency_must_be_positive(tmp_path: Path):
+    """Test that a concurrency below 1 is refused rather than running nothing."""
+    input_path = write_input(tmp_path / "in.jsonl", [{"prompt": "task"}])
+
+    with pytest.raises(ValueError, match="at least 1"):
+        await run(FakeAPI(), input_path, tmp_path / "out.jsonl", concurrency=0)
+
+
+async def test_tools_are_closed_after_the_run(tmp_path: Path):
+    """Test that every registry made for a directory is closed at the end."""
+    (tmp_path / "a").mkdir()
+    items = [
+        {"prompt": "one", "cwd": str(tmp_path)},
+        {"prompt": "two", "cwd": str(tmp_path / "a")},
+        {"prompt": "three", "cwd": str(tmp_path)},
+    ]
+    input_path = write_input(tmp_path / "in.jsonl", items)
+    closed = []
+
+    def tools_factory(cwd: Path) -> ToolRegistry:
+        registry = ToolRegistry()
+        registry.close = lambda: closed.append(cwd)
+        return registry
+
+    await run_batch(
+        input_path,
+        tmp_path / "out.jsonl",
+        client=FakeAPI().client(),
+        tools_factory=tools_factory,
+    )
+
+    assert sorted(closed) == [tmp_path, tmp_path / "a"]
+
+
+async def test_resume_skips_completed_items(tmp_path: Path):
+    """Test that a rerun only runs the items without a successful result."""
+    items = [{"id": str(i), "prompt": f"task {i}"} for i in range(4)]
+    input_path = write_input(tmp_path / "in.jsonl", items)
+    output = tmp_path / "out.jsonl"
+    done = {"id": "0", "status": "ok"}
+    failed = {"id": "1", "status": "error"}
+    # The last line was cut short by the interruption
+    output.write_text(f'{json.dumps(done)}\n{json.dumps(failed)}\n{{"id": "2", "st')
+
+    api = FakeAPI()
+    summary = await run(api, input_path, output)
+
+    assert (summary.succeeded, summary.skipped) == (3, 1)
+    assert api.requests == 3
+    assert load_completed(output) == {"0", "1", "2", "3"}
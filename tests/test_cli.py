@@ -0,0 +1,60 @@
+"""Tests for the command-line entry point."""
+
+import subprocess
+import sys
+
+import pytest
+
+from vecna import __version__
+from vecna.cli import build_parser, main
+
+
+def test_version_flag(capsys):
+    """Test that --version prints the version and exits."""
+    with pytest.raises(SystemExit) as exc:
+        main(["--version"])
+
+    assert exc.value.code == 0
+    assert capsys.readouterr().out.strip() == f"vecna {__version__}"
+
+
+def test_help_flag(capsys):
+    """Test that --help prints usage and exits."""
+    with pytest.raises(SystemExit) as exc:
+        main(["--help"])
+
+    assert exc.value.code == 0
+    assert capsys.readouterr().out.startswith("usage: vecna")
+
+
+def test_fast_path_skips_heavy_imports():
+    """Test that importing the CLI loads neither the SDK nor rich."""
+    code = (
+        "import sys, vecna.cli\n"
+        "heavy = ('anthropic', 'rich', 'dotenv', 'httpx', 'asyncio')\n"
+        "print(sorted(m for m in heavy if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_resume_flag():
+    """Test that --resume defaults to the latest session."""
+    parser = build_parser()
+    assert parser.parse_args(["--resume"]).resume == "latest"
+    assert parser.parse_args(["--resume", "abc"]).resume == "abc"
+    assert parser.parse_args([]).resume is None
+
+
+def test_batch_arguments():
+    """Test the batch subcommand's arguments and defaults."""
+    args = build_parser().parse_args(["batch", "prompts.jsonl", "-j", "4"])
+    assert (args.command, args.input.name) == ("batch", "prompts.jsonl")
+    assert (args.concurrency, args.retries, args.output) == (4, 3, None)
+
+    for bad in ("0", "-2", "many"):
+        with pytest.raises(SystemExit):
+            build_parser().parse_args(["batch", "prompts.jsonl", "-j", bad])
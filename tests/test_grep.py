@@ -0,0 +1,259 @@
+"""Tests for the grep tool and the trigram index."""
+
+import os
+import re
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+
+from vecna.tools import grep as grep_module
+from vecna.tools.grep import GrepTool
+from vecna.tools.trigram_index import TrigramIndex, required_trigrams
+from vecna.tools.workspace_index import WorkspaceIndex
+
+
+@pytest.fixture(autouse=True)
+def _no_user_cache(tmp_path: Path, monkeypatch):
+    """Keep trigram indexes out of the real cache directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def make_tree(root: Path, files: dict[str, str | bytes]) -> None:
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            path.write_bytes(content)
+        else:
+            path.write_text(content)
+
+
+def make_tool(root: Path, **kwargs) -> GrepTool:
+    kwargs.setdefault("trigram_index", False)
+    return GrepTool(working_dir=root, index=WorkspaceIndex(root), **kwargs)
+
+
+def test_grep_reports_paths_and_line_numbers(tmp_path: Path):
+    """Test that matches are reported as path:line: text in file order."""
+    make_tree(
+        tmp_path,
+        {
+            "a.py": "import os\n\ndef main():\n    os.exit(0)\n",
+            "pkg/b.py": "x = 1\ndef helper():\n    pass\n",
+            "notes.txt": "  def indented, so no match\n",
+        },
+    )
+    tool = make_tool(tmp_path)
+
+    result = tool.execute(pattern=r"^def \w+")
+
+    assert result.splitlines() == [
+        "a.py:3: def main():",
+        "pkg/b.py:2: def helper():",
+    ]
+
+
+def test_grep_glob_and_path_filters(tmp_path: Path):
+    """Test that the glob and path parameters narrow the searched files."""
+    make_tree(
+        tmp_path,
+        {"a.py": "TODO one\n", "b.txt": "TODO two\n", "sub/c.py": "TODO three\n"},
+    )
+    tool = make_tool(tmp_path)
+
+    assert tool.execute(pattern="TODO", glob="*.py").splitlines() == [
+        "a.py:1: TODO one",
+        "sub/c.py:1: TODO three",
+    ]
+    assert tool.execute(pattern="TODO", path="sub") == "sub/c.py:1: TODO three"
+    assert tool.execute(pattern="TODO", path="b.txt") == "b.txt:1: TODO two"
+
+
+def test_grep_ignore_case_and_no_matches(tmp_path: Path):
+    """Test case-insensitive search and the no-match message."""
+    make_tree(tmp_path, {"a.txt": "Hello World\n"})
+    tool = make_tool(tmp_path)
+
+    assert tool.execute(pattern="hello") == "No matches for 'hello'"
+    assert tool.execute(pattern="hello", ignore_case=True) == "a.txt:1: Hello World"
+
+
+def test_grep_skips_binary_and_ignored_files(tmp_path: Path):
+    """Test that binary files and .gitignored files are not searched."""
+    make_tree(
+        tmp_path,
+        {
+            ".gitignore": "build/\n",
+            "data.bin": b"needle\0\x01\x02",
+            "build/out.txt": "needle\n",
+            "src.txt": "needle\n",
+        },
+    )
+    tool = make_tool(tmp_path)
+
+    assert tool.execute(pattern="needle") == "src.txt:1: needle"
+
+
+def test_grep_caps_results(tmp_path: Path):
+    """Test that output stops at max_results with a note."""
+    make_tree(tmp_path, {"a.txt": "match\n" * 50})
+    tool = make_tool(tmp_path)
+
+    lines = tool.execute(pattern="match", max_results=5).splitlines()
+
+    assert len(lines) == 6
+    assert lines[4] == "a.txt:5: match"
+    assert "capped at 5" in lines[-1]
+
+
+def test_grep_errors(tmp_path: Path):
+    """Test invalid patterns and paths outside the working directory."""
+    tool = make_tool(tmp_path)
+
+    assert "Invalid regular expression" in tool.execute(pattern="(unclosed")
+    assert "Access denied" in tool.execute(pattern="x", path="/etc")
+
+
+def test_grep_large_file_uses_mmap(tmp_path: Path):
+    """Test matches beyond the sniffed head of a file are found."""
+    make_tree(tmp_path, {"big.txt": "filler line\n" * 5000 + "the needle\n"})
+    tool = make_tool(tmp_path)
+
+    assert tool.execute(pattern="needle") == "big.txt:5001: the needle"
+
+
+def test_grep_parallel_matches_serial(tmp_path: Path, monkeypatch):
+    """Test that a search fanned out over worker processes keeps file order."""
+    files = {f"d{i // 10}/f{i:03}.txt": f"line\nvalue {i}\n" for i in range(40)}
+    make_tree(tmp_path, files)
+    tool = make_tool(tmp_path)
+    serial = tool.execute(pattern=r"value \d+")
+
+    monkeypatch.setattr(grep_module, "PARALLEL_THRESHOLD", 2)
+    monkeypatch.setattr(grep_module, "BATCH_SIZE", 7)
+    parallel = tool.execute(pattern=r"value \d+")
+
+    assert parallel == serial
+    assert len(parallel.splitlines()) == 40
+    capped = tool.execute(pattern=r"value \d+", max_results=3).splitlines()
+    assert capped[:3] == serial.splitlines()[:3]
+
+
+def test_grep_recovers_from_a_broken_pool(tmp_path: Path, monkeypatch):
+    """Test that a search pool whose worker died is replaced."""
+    files = {f"f{i:03}.txt": f"value {i}\n" for i in range(20)}
+    make_tree(tmp_path, files)
+    monkeypatch.setattr(grep_module, "PARALLEL_THRESHOLD", 2)
+    monkeypatch.setattr(grep_module, "BATCH_SIZE", 7)
+    tool = make_tool(tmp_path)
+
+    broken = grep_module.get_search_pool()
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+
+    assert len(tool.execute(pattern=r"value \d+").splitlines()) == 20
+    assert grep_module.get_search_pool() is not broken
+
+
+def test_grep_skips_symlinks_leaving_the_working_dir(tmp_path: Path):
+    """Test that only symlinks into the working directory are searched."""
+    root = tmp_path / "repo"
+    make_tree(root, {"a.py": "needle\n"})
+    make_tree(tmp_path, {"secret.txt": "needle\n"})
+    (root / "inside.py").symlink_to(root / "a.py")
+    (root / "outside.txt").symlink_to(tmp_path / "secret.txt")
+
+    assert make_tool(root).execute(pattern="needle") == (
+        "a.py:1: needle\ninside.py:1: needle"
+    )
+
+
+def test_required_trigrams():
+    """Test literal extraction from regular expressions."""
+    assert required_trigrams("parse") == {b"par", b"ars", b"rse"}
+    assert required_trigrams(r"def \w+_Args") == {
+        b"def",
+        b"ef ",
+        b"_ar",
+        b"arg",
+        b"rgs",
+    }
+    # Alternations and short literals give nothing to narrow on
+    assert required_trigrams("foo|bar") == set()
+    assert required_trigrams("a.b") == set()
+    assert required_trigrams("Été", re.IGNORECASE) == set()
+
+
+def test_trigram_index_narrows_and_persists(tmp_path: Path):
+    """Test that the index drops files lacking the literals and is reused."""
+    root = tmp_path / "repo"
+    make_tree(
+        root,
+        {"a.py": "def parse_args(): pass\n", "b.py": "x = 1\n", "c.bin": b"\0parse"},
+    )
+    index_path = tmp_path / "index.pickle"
+    files = ["a.py", "b.py", "c.bin"]
+
+    index = TrigramIndex(root, path=index_path)
+    index.update(files)
+    index.save()
+
+    trigrams = required_trigrams("PARSE_ARGS", re.IGNORECASE)
+    # Binary files can't be indexed, so they are always candidates
+    assert index.candidates(files, trigrams) == ["a.py", "c.bin"]
+
+    reloaded = TrigramIndex(root, path=index_path)
+    assert reloaded.candidates(files, trigrams) == ["a.py", "c.bin"]
+
+    # A changed file is re-indexed
+    (root / "b.py").write_text("parse_args = None\n")
+    reloaded.update(files)
+    assert reloaded.candidates(files, trigrams) == ["a.py", "b.py", "c.bin"]
+
+
+def test_trigram_index_checks_only_changed_files(tmp_path: Path):
+    """Test that validated files are only checked again once reported changed."""
+    root = tmp_path / "repo"
+    make_tree(root, {"a.py": "x = 1\n", "b.py": "y = 2\n"})
+    files = ["a.py", "b.py"]
+    trigrams = required_trigrams("parse_args")
+    index = TrigramIndex(root, path=tmp_path / "index.pickle")
+    index.update(files)
+
+    (root / "a.py").write_text("parse_args = None\n")
+    (root / "b.py").write_text("parse_args = None\n")
+    index.update(files, changed={"a.py"})
+    assert index.candidates(files, trigrams) == ["a.py"]
+    # Without a change set every file is validated
+    index.update(files)
+    assert index.candidates(files, trigrams) == ["a.py", "b.py"]
+
+
+def test_grep_with_trigram_index_sees_edits(tmp_path: Path):
+    """Test that files edited between searches are searched again."""
+    root = tmp_path / "repo"
+    make_tree(root, {"a.py": "needle = 1\n", "b.py": "hay = 2\n"})
+    trigram_index = TrigramIndex(root, path=tmp_path / "index.pickle")
+    tool = make_tool(root, trigram_index=trigram_index)
+    assert tool.execute(pattern="needle") == "a.py:1: needle = 1"
+
+    # Rewritten in place, which leaves the directory's mtime alone
+    (root / "b.py").write_text("needle = 2\n")
+    make_tree(root, {"c.py": "needle = 3\n"})
+    tool.index.refresh()
+    assert tool.execute(pattern="needle") == (
+        "a.py:1: needle = 1\nb.py:1: needle = 2\nc.py:1: needle = 3"
+    )
+
+
+def test_grep_with_trigram_index(tmp_path: Path):
+    """Test that searching through the trigram index gives the same output."""
+    root = tmp_path / "repo"
+    make_tree(root, {"a.py": "needle = 1\n", "b.py": "hay = 2\n"})
+    trigram_index = TrigramIndex(root, path=tmp_path / "index.pickle")
+    tool = make_tool(root, trigram_index=trigram_index)
+
+    assert tool.execute(pattern="needle") == "a.py:1: needle = 1"
+    assert tool.execute(pattern="NEEDLE", ignore_case=True) == "a.py:1: needle = 1"
+    assert (tmp_path / "index.pickle").exists()
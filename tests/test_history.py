@@ -0,0 +1,151 @@
+"""Tests for the conversation history manager."""
+
+from vecna.history import (
+    SUMMARY_HEADER,
+    HistoryManager,
+    estimate_tokens,
+    is_turn_start,
+)
+
+
+def tool_turn(index: int, result_size: int) -> list[dict]:
+    """A turn in which the assistant reads a file before answering."""
+    call_id = f"t{index}"
+    return [
+        {"role": "user", "content": f"Question {index}"},
+        {
+            "role": "assistant",
+            "content": [
+                {
+                    "type": "tool_use",
+                    "id": call_id,
+                    "name": "read_file",
+                    "input": {"path": f"f{index}.py"},
+                }
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": call_id,
+                    "content": f"File: f{index}.py\n" + "x" * result_size,
+                }
+            ],
+        },
+        {"role": "assistant", "content": f"Answer {index}"},
+    ]
+
+
+def conversation(turns: int, result_size: int = 8_000) -> list[dict]:
+    messages = []
+    for i in range(turns):
+        messages.extend(tool_turn(i, result_size))
+    return messages
+
+
+def assert_tool_pairs_intact(messages: list[dict]) -> None:
+    """Every tool_result must directly follow its tool_use."""
+    for i, message in enumerate(messages):
+        if isinstance(message["content"], str):
+            continue
+        for block in message["content"]:
+            if block["type"] == "tool_result":
+                previous = messages[i - 1]["content"]
+                ids = [b["id"] for b in previous if b["type"] == "tool_use"]
+                assert block["tool_use_id"] in ids
+
+
+def test_estimate_tokens_counts_all_block_types():
+    """Test that the estimator sees text, tool calls and tool results."""
+    small = estimate_tokens(conversation(1, result_size=0))
+    large = estimate_tokens(conversation(1, result_size=4_000))
+
+    assert large - small == 1_000
+
+
+def test_is_turn_start():
+    """Test that tool result messages do not start a turn."""
+    messages = tool_turn(0, 10)
+
+    assert [is_turn_start(m) for m in messages] == [True, False, False, False]
+
+
+def test_compact_under_budget_does_nothing():
+    """Test that a history within budget is left alone."""
+    messages = conversation(3)
+    manager = HistoryManager(max_tokens=100_000)
+
+    manager.compact(messages)
+
+    assert messages == conversation(3)
+    assert manager.compactions == []
+
+
+def test_compact_calls_on_compact():
+    """Test that each compaction is announced, and only compactions."""
+    calls = []
+    manager = HistoryManager(
+        max_tokens=100_000, on_compact=lambda: calls.append(len(manager.compactions))
+    )
+    manager.compact(conversation(4))
+    assert calls == []
+
+    manager.max_tokens = 5_000
+    manager.compact(conversation(4))
+    assert calls == [1]
+
+
+def test_compact_stubs_old_tool_results_first():
+    """Test that large old tool results are stubbed before summarizing."""
+    messages = conversation(4)
+    manager = HistoryManager(max_tokens=5_000, keep_recent_turns=2)
+
+    def summarize(transcript: str) -> str:
+        raise AssertionError("stubbing alone should be enough")
+
+    manager.compact(messages, summarize)
+
+    old_result = messages[2]["content"][0]["content"]
+    recent_result = messages[-2]["content"][0]["content"]
+    assert old_result.startswith("File: f0.py\n[Earlier tool result removed")
+    assert len(recent_result) > 8_000
+    assert manager.compactions[0]["strategy"] == "stub_tool_results"
+    assert manager.tokens_saved > 3_000
+    assert_tool_pairs_intact(messages)
+
+
+def test_compact_summarizes_old_turns():
+    """Test that old turns are replaced by a summary at a turn boundary."""
+    messages = conversation(6, result_size=100)
+    manager = HistoryManager(max_tokens=100, keep_recent_turns=2)
+    transcripts = []
+
+    def summarize(transcript: str) -> str:
+        transcripts.append(transcript)
+        return "The user asked six questions."
+
+    manager.compact(messages, summarize)
+
+    assert messages[0]["content"].startswith(SUMMARY_HEADER)
+    assert messages[1]["role"] == "assistant"
+    assert messages[2] == {"role": "user", "content": "Question 4"}
+    assert len(messages) == 2 + 2 * 4
+    assert "Question 0" in transcripts[0]
+    assert "Question 4" not in transcripts[0]
+    assert manager.compactions[-1]["strategy"] == "summarize"
+    assert manager.compactions[-1]["tokens_saved"] > 0
+    assert_tool_pairs_intact(messages)
+
+
+def test_compact_does_not_resummarize_summary_alone():
+    """Test that a lone summary plus protected turns is not summarized again."""
+    messages = conversation(6, result_size=100)
+    manager = HistoryManager(max_tokens=10, keep_recent_turns=2)
+    manager.compact(messages, lambda transcript: "summary")
+    count = len(manager.compactions)
+
+    manager.compact(messages, lambda transcript: "summary again")
+
+    assert len(manager.compactions) == count
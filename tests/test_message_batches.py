@@ -0,0 +1,157 @@
+"""Tests for the Message Batches backend, against the local stand-in."""
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from anthropic import (
+    AnthropicError,
+    APIStatusError,
+    AsyncAnthropic,
+    InternalServerError,
+    RateLimitError,
+)
+
+from vecna.agent import AsyncAgent
+from vecna.batch import run_batch
+from vecna.batch_server import BatchServer, last_user_text, message
+from vecna.message_batches import BatchingClient
+from vecna.tools import ToolRegistry
+from vecna.tools.echo import EchoTool
+
+
+@pytest.fixture
+def server():
+    with BatchServer(processing_time=0.05) as server:
+        yield server
+
+
+def batching_client(server: BatchServer, **kwargs) -> BatchingClient:
+    client = AsyncAnthropic(api_key="sk-test", base_url=server.url, max_retries=0)
+    return BatchingClient(client, linger=0.05, poll_interval=0.02, **kwargs)
+
+
+def echo_tools() -> ToolRegistry:
+    tools = ToolRegistry()
+    tools.register(EchoTool())
+    return tools
+
+
+async def test_concurrent_agents_share_a_batch(server: BatchServer):
+    """Test that requests made together are sent as one batch."""
+    client = batching_client(server)
+    agents = [AsyncAgent(client=client, tools=echo_tools()) for _ in range(5)]
+
+    replies = await asyncio.gather(
+        *(agent.chat(f"prompt {i}") for i, agent in enumerate(agents))
+    )
+
+    assert replies == [f"Echo: prompt {i}" for i in range(5)]
+    (batch,) = server.batches.values()
+    assert client.batch_ids == [batch.id]
+    # The same system prompt and tool schemas as a live request
+    params = batch.requests[0]["params"]
+    expected = agents[0]._request_params(int(agents[0].max_tokens))
+    assert params["system"] == expected["system"]
+    assert params["tools"] == expected["tools"]
+    assert agents[3].messages[-1]["content"] == "Echo: prompt 3"
+
+
+async def test_tool_calls_join_the_next_batch(server: BatchServer):
+    """Test a tool loop running over two batches."""
+
+    def responder(params: dict) -> dict:
+        last = params["messages"][-1]["content"]
+        if isinstance(last, list) and last[0]["type"] == "tool_result":
+            return message(f"Tool said {last[0]['content']}")
+        reply = message("")
+        reply["content"] = [
+            {
+                "type": "tool_use",
+                "id": "toolu_1",
+                "name": "echo",
+                "input": {"message": last_user_text(params)},
+            }
+        ]
+        reply["stop_reason"] = "tool_use"
+        return reply
+
+    server.responder = responder
+    agent = AsyncAgent(client=batching_client(server), tools=echo_tools())
+
+    assert await agent.chat("ping") == "Tool said Echo: ping"
+    assert len(server.batches) == 2
+    assert agent.stats.last.api_calls == 2
+
+
+async def test_errored_results_raise_sdk_errors(server: BatchServer):
+    """Test that a failed request raises the error a live call would."""
+
+    errors = {
+        "limited": "rate_limit_error",
+        "busy": "overloaded_error",
+        "unpaid": "billing_error",
+    }
+
+    def responder(params: dict) -> dict:
+        error_type = errors.get(last_user_text(params))
+        if error_type is not None:
+            error = {"type": error_type, "message": "Request failed"}
+            return {"type": "error", "error": error}
+        return message("fine")
+
+    server.responder = responder
+    client = batching_client(server)
+    prompts = [*errors, "other"]
+    results = await asyncio.gather(
+        *(AsyncAgent(client=client).chat(prompt) for prompt in prompts),
+        return_exceptions=True,
+    )
+
+    limited, busy, unpaid, fine = results
+    assert isinstance(limited, RateLimitError)
+    assert isinstance(busy, InternalServerError) and busy.status_code == 529
+    assert type(unpaid) is APIStatusError and unpaid.status_code == 402
+    assert fine == "fine"
+
+
+def test_streaming_is_refused(server: BatchServer):
+    """Test that streaming raises an SDK error, which batches can't do."""
+    with pytest.raises(AnthropicError, match="Streaming is not available"):
+        batching_client(server).messages.stream(model="m", messages=[])
+
+
+async def test_full_batches_are_submitted_early(server: BatchServer):
+    """Test that a batch is submitted once it holds max_requests."""
+    client = batching_client(server, max_requests=2)
+    agents = [AsyncAgent(client=client) for _ in range(5)]
+
+    await asyncio.gather(*(agent.chat("hi") for agent in agents))
+
+    assert sorted(len(b.requests) for b in server.batches.values()) == [1, 2, 2]
+
+
+async def test_batch_mode_with_batches_backend(server: BatchServer, tmp_path: Path):
+    """Test `vecna batch` end to end through the stand-in."""
+    input_path = tmp_path / "in.jsonl"
+    input_path.write_text(
+        "".join(
+            json.dumps({"id": str(i), "prompt": f"task {i}"}) + "\n" for i in range(6)
+        )
+    )
+    output = tmp_path / "out.jsonl"
+
+    summary = await run_batch(
+        input_path,
+        output,
+        concurrency=10,
+        client=batching_client(server),
+        tools_factory=lambda cwd: ToolRegistry(),
+        backend="batches",
+    )
+
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert summary.succeeded == 6
+    assert {r["response"] for r in results} == {f"Echo: task {i}" for i in range(6)}
+    assert len(server.batches) == 1
@@ -0,0 +1,111 @@
+"""Tests for incremental Markdown rendering."""
+
+import io
+
+from rich.console import Console
+from rich.markdown import Markdown
+
+from vecna.render import (
+    DEFAULT_REFRESH_RATE,
+    StreamingMarkdown,
+    get_refresh_rate,
+    stream_markdown,
+)
+
+DOCUMENT = """# Title
+
+Some paragraph with **bold** text
+spanning two lines.
+
+- item one
+- item two
+
+  nested paragraph in item two
+
+```python
+def f():
+
+    return 1
+```
+After code.
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+Final words."""
+
+
+def render(renderable) -> str:
+    console = Console(
+        file=io.StringIO(), width=60, force_terminal=True, color_system=None
+    )
+    console.print(renderable)
+    return console.file.getvalue()
+
+
+def feed_in_chunks(text: str, size: int) -> StreamingMarkdown:
+    renderer = StreamingMarkdown()
+    for i in range(0, len(text), size):
+        renderer.feed(text[i : i + size])
+    return renderer
+
+
+def test_streaming_markdown_matches_full_render():
+    """Test that incremental rendering matches rendering the whole text."""
+    for size in (1, 4, 50):
+        renderer = feed_in_chunks(DOCUMENT, size)
+        renderer.finish()
+        assert render(renderer) == render(Markdown(DOCUMENT))
+
+
+def test_streaming_markdown_caches_completed_blocks():
+    """Test that closed blocks are cached while the last block stays open."""
+    renderer = feed_in_chunks("First paragraph.\n\nSecond paragraph\n", 3)
+    assert renderer.block_count == 1
+
+    renderer.finish()
+    assert renderer.block_count == 2
+
+
+def test_streaming_markdown_keeps_code_fence_open():
+    """Test that blank lines inside a code fence do not split the block."""
+    renderer = feed_in_chunks("```\nline one\n\nline two\n", 2)
+    assert renderer.block_count == 0
+
+    renderer.feed("```\n")
+    assert renderer.block_count == 1
+
+
+def test_stream_markdown_returns_full_text():
+    """Test that the live renderer returns the complete response."""
+    console = Console(file=io.StringIO(), width=60)
+    chunks = ["Hello", ", ", "world", "!\n\nBye"]
+
+    result = stream_markdown(iter(chunks), console, refresh_per_second=1000)
+
+    assert result == "Hello, world!\n\nBye"
+
+
+def test_streaming_markdown_keeps_loose_lists_together():
+    """Test that blank lines between items of one list do not split it."""
+    for text in (
+        "Steps:\n\n1. one\n\n2. two\n\nAfter.",
+        "Items:\n\n- a\n\n- b\n\n  more b\n\n- c",
+        "Intro:\n- a\n\n- b",
+    ):
+        renderer = feed_in_chunks(text, 3)
+        renderer.finish()
+        assert render(renderer) == render(Markdown(text))
+
+    renderer = feed_in_chunks("- a\n\n- b\n\n* c\n\n1. d\n", 3)
+    assert renderer.block_count == 2
+
+
+def test_stream_markdown_ignores_invalid_refresh_rates(monkeypatch):
+    """Test that a refresh rate of zero or garbage falls back to the default."""
+    console = Console(file=io.StringIO(), width=60)
+    for value in ("0", "-5", "nan", "fast"):
+        monkeypatch.setenv("VECNA_REFRESH_RATE", value)
+        assert get_refresh_rate() == DEFAULT_REFRESH_RATE
+        assert stream_markdown(iter(["a", "b"]), console) == "ab"
@@ -0,0 +1,249 @@
+"""Tests for the record/replay transports."""
+
+import json
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from anthropic import Anthropic, AsyncAnthropic
+
+from vecna.agent import Agent, AsyncAgent
+from vecna.replay import (
+    AsyncRecordingTransport,
+    AsyncReplayTransport,
+    RecordingTransport,
+    ReplayError,
+    ReplayTransport,
+    load_cassette,
+)
+from vecna.tools import ToolRegistry
+from vecna.tools.echo import EchoTool
+from vecna.utils import get_client
+
+USAGE = {"input_tokens": 10, "output_tokens": 5}
+
+
+def sse_events(text_parts: list[str]) -> list[bytes]:
+    """Build the server-sent events of a streamed text reply."""
+    events = [
+        (
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "id": "msg_1",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": "claude-test",
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": USAGE,
+                },
+            },
+        ),
+        (
+            "content_block_start",
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            },
+        ),
+        *(
+            (
+                "content_block_delta",
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": part},
+                },
+            )
+            for part in text_parts
+        ),
+        ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        (
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": 5},
+            },
+        ),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+    return [
+        f"event: {name}\ndata: {json.dumps(data)}\n\n".encode() for name, data in events
+    ]
+
+
+def message_json(content: list[dict], stop_reason: str = "end_turn") -> dict:
+    """Build a non-streamed Messages API response."""
+    return {
+        "id": "msg_1",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-test",
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": USAGE,
+    }
+
+
+def fake_api(replies: list, delay: float = 0.0) -> httpx.MockTransport:
+    """Stand in for the API: serve replies in order, streaming SSE lists."""
+    remaining = list(replies)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        reply = remaining.pop(0)
+        if isinstance(reply, dict):
+            return httpx.Response(200, json=reply)
+
+        def body():
+            for event in reply:
+                time.sleep(delay)
+                yield event
+
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=body()
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def client_for(transport: httpx.BaseTransport) -> Anthropic:
+    return Anthropic(
+        api_key="sk-test", http_client=httpx.Client(transport=transport), max_retries=0
+    )
+
+
+def test_record_then_replay_stream(tmp_path: Path):
+    """Test that a recorded stream replays byte for byte, without the key."""
+    cassette = tmp_path / "cassette.jsonl"
+    events = sse_events(["Hel", "lo"])
+    recorder = RecordingTransport(cassette, transport=fake_api([events], 0.01))
+
+    with httpx.Client(transport=recorder) as client:
+        with client.stream(
+            "POST",
+            "https://api.test/v1/messages",
+            json={"a": 1},
+            headers={"x-api-key": "sk-secret"},
+        ) as response:
+            body = b"".join(response.iter_bytes())
+
+    (exchange,) = load_cassette(cassette)
+    assert exchange["request"]["body"] == {"a": 1}
+    assert "sk-secret" not in cassette.read_text()
+    delays = [delay for delay, _ in exchange["response"]["chunks"]]
+    assert delays == sorted(delays) and delays[-1] >= 0.05
+
+    with httpx.Client(transport=ReplayTransport(cassette)) as client:
+        replayed = client.post("https://api.test/v1/messages", json={"a": 1})
+    assert replayed.content == body == b"".join(events)
+    assert replayed.headers["content-type"] == "text/event-stream"
+
+
+def test_replay_speed(tmp_path: Path):
+    """Test replay at recorded timing and as fast as possible."""
+    cassette = tmp_path / "cassette.jsonl"
+    recorder = RecordingTransport(cassette, transport=fake_api([[b"a", b"b"]], 0.1))
+    with httpx.Client(transport=recorder) as client:
+        client.post("https://api.test/v1/messages")
+
+    for speed, check in ((1.0, lambda s: s >= 0.18), (0.0, lambda s: s < 0.05)):
+        with httpx.Client(transport=ReplayTransport(cassette, speed=speed)) as client:
+            start = time.perf_counter()
+            assert client.post("https://api.test/v1/messages").content == b"ab"
+            assert check(time.perf_counter() - start)
+
+
+def test_replay_errors(tmp_path: Path):
+    """Test strict body matching and running out of exchanges."""
+    cassette = tmp_path / "cassette.jsonl"
+    recorder = RecordingTransport(cassette, transport=fake_api([message_json([])]))
+    with httpx.Client(transport=recorder) as client:
+        client.post("https://api.test/v1/messages", json={"n": 1})
+
+    with httpx.Client(transport=ReplayTransport(cassette, strict=True)) as client:
+        with pytest.raises(ReplayError):
+            client.post("https://api.test/v1/messages", json={"n": 2})
+        client.post("https://api.test/v1/messages", json={"n": 1})
+        with pytest.raises(ReplayError):
+            client.post("https://api.test/v1/messages", json={"n": 1})
+
+
+def test_agent_replays_tool_loop_and_stream(tmp_path: Path):
+    """Test the agent end to end against a recording of the real API."""
+    cassette = tmp_path / "cassette.jsonl"
+    replies = [
+        message_json(
+            [
+                {
+                    "type": "tool_use",
+                    "id": "toolu_1",
+                    "name": "echo",
+                    "input": {"message": "ping"},
+                }
+            ],
+            stop_reason="tool_use",
+        ),
+        message_json([{"type": "text", "text": "Echoed."}]),
+        sse_events(["Streamed ", "reply."]),
+    ]
+
+    def run(transport: httpx.BaseTransport) -> tuple[str, str, list]:
+        tools = ToolRegistry()
+        tools.register(EchoTool())
+        agent = Agent(client=client_for(transport), tools=tools)
+        reply = agent.chat("Echo ping")
+        streamed = "".join(agent.chat_stream("Now stream"))
+        return reply, streamed, agent.messages
+
+    recorded = run(RecordingTransport(cassette, transport=fake_api(replies)))
+    replayed = run(ReplayTransport(cassette, strict=True))
+
+    assert replayed == recorded
+    assert replayed[:2] == ("Echoed.", "Streamed reply.")
+    assert replayed[2][2]["content"][0]["content"] == "Echo: ping"
+
+
+async def test_async_agent_replay(tmp_path: Path):
+    """Test recording and replaying through the async client."""
+    cassette = tmp_path / "cassette.jsonl"
+    events = sse_events(["Async ", "reply."])
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=b"".join(events)
+        )
+
+    async def run(transport: httpx.AsyncBaseTransport) -> str:
+        client = AsyncAnthropic(
+            api_key="sk-test",
+            http_client=httpx.AsyncClient(transport=transport),
+            max_retries=0,
+        )
+        agent = AsyncAgent(client=client)
+        return "".join([chunk async for chunk in agent.chat_stream("Hi")])
+
+    recorder = AsyncRecordingTransport(cassette, transport=httpx.MockTransport(handler))
+    assert await run(recorder) == "Async reply."
+    assert await run(AsyncReplayTransport(cassette)) == "Async reply."
+
+
+def test_get_client_replays_from_env(tmp_path: Path, monkeypatch):
+    """Test that VECNA_CASSETTE selects replay and needs no API key."""
+    cassette = tmp_path / "cassette.jsonl"
+    recorder = RecordingTransport(
+        cassette, transport=fake_api([message_json([{"type": "text", "text": "Hi"}])])
+    )
+    Agent(client=client_for(recorder)).chat("Hello")
+
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.setenv("VECNA_CASSETTE", str(cassette))
+    monkeypatch.setenv("VECNA_CASSETTE_MODE", "replay")
+
+    assert Agent(client=get_client()).chat("Hello") == "Hi"
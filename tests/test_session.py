@@ -0,0 +1,166 @@
+"""Tests for session persistence."""
+
+from pathlib import Path
+
+import pytest
+
+from vecna.session import BLOB_THRESHOLD, Session, SessionError, list_sessions
+
+
+def tool_turn(i: int, result: str) -> list[dict]:
+    return [
+        {"role": "user", "content": f"question {i}"},
+        {
+            "role": "assistant",
+            "content": [
+                {"type": "tool_use", "id": f"t{i}", "name": "read_file", "input": {}}
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "tool_result", "tool_use_id": f"t{i}", "content": result}
+            ],
+        },
+        {"role": "assistant", "content": f"answer {i}"},
+    ]
+
+
+def test_sync_appends_and_load_restores(tmp_path: Path):
+    """Test that each sync appends only new messages and resume restores them."""
+    session = Session.create(tmp_path, meta={"cwd": "/work"})
+    big = "x" * (BLOB_THRESHOLD + 1)
+    messages = tool_turn(0, "small")
+    session.sync(messages)
+
+    messages += tool_turn(1, big) + tool_turn(2, big)
+    session.sync(messages)
+    session.sync(messages)  # Nothing new
+
+    log = session.log_path.read_text()
+    assert log.startswith('{"type": "meta"')
+    assert len(log.splitlines()) == 1 + len(messages)
+    # The large result is stored once, out of line
+    assert big not in log
+    assert len(list(session.blob_dir.iterdir())) == 1
+
+    resumed = Session.open(session.id, tmp_path)
+    assert resumed.load_messages() == messages
+
+
+def test_snapshot_after_compaction(tmp_path: Path):
+    """Test that a compaction writes a snapshot and resume starts from it."""
+    session = Session.create(tmp_path)
+    messages = tool_turn(0, "a") + tool_turn(1, "b")
+    session.sync(messages)
+
+    compacted = [{"role": "user", "content": "Summary"}, *messages[4:]]
+    session.sync(compacted, compactions=1)
+    compacted += tool_turn(2, "c")
+    session.sync(compacted, compactions=1)
+
+    # Records before the snapshot are never decoded
+    data = session.log_path.read_bytes().split(b"\n")
+    data[1] = b"{not json"
+    session.log_path.write_bytes(b"\n".join(data))
+
+    assert Session.open(session.id, tmp_path).load_messages() == compacted
+
+
+def test_load_skips_torn_last_line(tmp_path: Path):
+    """Test that a record cut short by a crash is ignored."""
+    session = Session.create(tmp_path)
+    messages = tool_turn(0, "a")
+    session.sync(messages)
+    with open(session.log_path, "a") as f:
+        f.write('{"type": "message", "mess')
+
+    assert Session.open(session.id, tmp_path).load_messages() == messages
+
+
+def test_load_falls_back_from_a_torn_snapshot(tmp_path: Path):
+    """Test that a snapshot cut short by a crash doesn't lose the history."""
+    session = Session.create(tmp_path)
+    messages = tool_turn(0, "a")
+    session.sync(messages)
+    compacted = [{"role": "user", "content": "Summary"}, *tool_turn(1, "b")]
+    session.sync(compacted, compactions=1)
+    with open(session.log_path, "a") as f:
+        f.write('{"type": "snapshot", "messages": [{"ro')
+
+    resumed = Session.open(session.id, tmp_path)
+    assert resumed.load_messages() == compacted
+    compacted += tool_turn(2, "c")
+    resumed.sync(compacted)
+    assert Session.open(session.id, tmp_path).load_messages() == compacted
+
+    # With no intact snapshot, the whole log is replayed
+    fresh = Session.create(tmp_path)
+    fresh.sync(messages)
+    with open(fresh.log_path, "a") as f:
+        f.write('{"type": "snapshot", "mess')
+    assert Session.open(fresh.id, tmp_path).load_messages() == messages
+
+
+def test_load_meta(tmp_path: Path):
+    """Test that the fields given at creation are read back."""
+    session = Session.create(tmp_path, meta={"cwd": "/work", "tools_version": "v1"})
+    session.sync(tool_turn(0, "result"))
+
+    meta = Session.open(session.id, tmp_path).load_meta()
+    assert meta["id"] == session.id
+    assert meta["tools_version"] == "v1"
+
+    session.log_path.write_text('{"type": "meta", "id"')
+    assert session.load_meta() == {}
+
+
+def test_open_latest_and_missing(tmp_path: Path):
+    """Test resolving "latest" and reporting unknown sessions."""
+    with pytest.raises(SessionError):
+        Session.open("latest", tmp_path)
+    first = Session.create(tmp_path)
+    (tmp_path / "20990101-000000-ffffff").mkdir()  # Not a session
+    assert list_sessions(tmp_path)[0] == first.id
+
+    with pytest.raises(SessionError):
+        Session.open("20990101-000000-ffffff", tmp_path)
+    with pytest.raises(SessionError):
+        Session.open("../elsewhere", tmp_path)
+
+
+def test_checkpoints_without_compaction(tmp_path: Path, monkeypatch):
+    """Test that long sessions get snapshots even if never compacted."""
+    import vecna.session as session_module
+
+    monkeypatch.setattr(session_module, "CHECKPOINT_MESSAGES", 8)
+    session = Session.create(tmp_path)
+    messages: list[dict] = []
+    for i in range(5):
+        messages += tool_turn(i, str(i))
+        session.sync(messages)
+
+    records = session.log_path.read_text().splitlines()
+    assert sum('"type": "snapshot"' in record for record in records) == 2
+
+    resumed = Session.open(session.id, tmp_path)
+    assert resumed.load_messages() == messages
+    messages += tool_turn(5, "5")
+    resumed.sync(messages)
+    assert Session.open(session.id, tmp_path).load_messages() == messages
+
+
+def test_sync_after_torn_last_line(tmp_path: Path):
+    """Test that records appended after a torn line start on a line of their own."""
+    session = Session.create(tmp_path)
+    messages = tool_turn(0, "a")
+    session.sync(messages)
+    with open(session.log_path, "a") as f:
+        f.write('{"type": "message", "mess')
+
+    resumed = Session.open(session.id, tmp_path)
+    assert resumed.load_messages() == messages
+    messages += tool_turn(1, "b")
+    resumed.sync(messages)
+
+    assert Session.open(session.id, tmp_path).load_messages() == messages
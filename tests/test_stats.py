@@ -0,0 +1,94 @@
+"""Tests for turn statistics."""
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from vecna.stats import StatsRecorder
+
+USAGE = {
+    "input_tokens": 100,
+    "output_tokens": 50,
+    "cache_read_input_tokens": 80,
+    "cache_creation_input_tokens": 0,
+}
+
+
+def run_turn(recorder: StatsRecorder, tools: int = 0) -> None:
+    recorder.start_turn()
+    recorder.start_call()
+    time.sleep(0.01)
+    recorder.first_token()
+    recorder.first_token()  # Only the first token of a call counts
+    time.sleep(0.01)
+    recorder.end_call()
+    for i in range(tools):
+        recorder.record_tool(f"t{i}", "read_file", 0.5)
+    recorder.end_turn(USAGE)
+
+
+def test_turn_timings():
+    """Test TTFT, latency, throughput and token counts of a turn."""
+    recorder = StatsRecorder()
+    run_turn(recorder, tools=2)
+
+    turn = recorder.last
+    assert 0.01 <= turn.ttft < turn.latency
+    assert turn.api_calls == 1
+    assert turn.generation_time < turn.api_time
+    assert turn.tokens_per_second == pytest.approx(50 / turn.generation_time)
+    assert turn.cache_read_input_tokens == 80
+    assert turn.tool_time == 1.0
+    assert turn.to_dict()["tool_time"] == 1.0
+
+
+def test_trace_file_and_hooks(tmp_path: Path):
+    """Test that finished turns go to the trace file and every hook."""
+    trace_file = tmp_path / "trace.jsonl"
+    seen = []
+
+    def broken_hook(turn):
+        raise RuntimeError("collector down")
+
+    recorder = StatsRecorder(trace_file=trace_file, hooks=[broken_hook])
+    recorder.add_hook(seen.append)
+
+    with pytest.warns(UserWarning, match="collector down"):
+        run_turn(recorder)
+        run_turn(recorder)
+
+    lines = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [line["turn"] for line in lines] == [1, 2]
+    assert lines[0]["output_tokens"] == 50
+    assert [turn.turn for turn in seen] == [1, 2]
+
+
+def test_deferred_publishing_includes_render_time():
+    """Test that render time added after the turn ends is still published."""
+    seen = []
+    recorder = StatsRecorder(hooks=[seen.append])
+
+    with recorder.deferred():
+        recorder.start_turn()
+        recorder.add_render_time(0.25)
+        recorder.end_turn(USAGE)
+        assert seen == []
+        recorder.add_render_time(0.5)
+
+    assert seen[0].render_time == 0.75
+
+
+def test_summary():
+    """Test the session summary over several turns."""
+    recorder = StatsRecorder()
+    assert recorder.summary()["turns"] == 0
+    for _ in range(3):
+        run_turn(recorder, tools=1)
+
+    summary = recorder.summary()
+    assert summary["turns"] == 3
+    assert summary["output_tokens"] == 150
+    assert summary["ttft"]["p50"] <= summary["latency"]["p50"]
+    assert summary["tools"] == {"read_file": {"calls": 3, "seconds": 1.5}}
@@ -1,13 +1,22 @@
 """Tests for the tools system."""
 
+import asyncio
+import time
+from collections.abc import Iterator
 from pathlib import Path
 
 import pytest
 
-from vecna.tools import ToolRegistry
+from vecna.tools import SchemaError, ToolRegistry, compile_schema
 from vecna.tools.echo import EchoTool
 from vecna.tools.exceptions import PathSecurityError
+from vecna.tools.file_cache import FileCache, get_file_cache
 from vecna.tools.file_read import FileReadTool
+from vecna.tools.output import elision_marker, split_budget, truncate_output
+from vecna.tools.path_resolver import PathResolver
+from vecna.tools.read_files import ReadFilesTool
+from vecna.tools.seen_files import UNCHANGED_NOTE, SeenFiles
+from vecna.tools.sniff import sniff_bytes
 from vecna.tools.utils import validate_path
 
 
@@ -40,9 +49,270 @@ def test_tool_to_anthropic_format():
     assert "input_schema" in tools[0]
 
 
+def test_tool_registry_freezes_definitions():
+    """Test that the tool list is built once and stamped with a version."""
+    registry = ToolRegistry()
+    empty_version = registry.version
+    echo_tool = EchoTool()
+    registry.register(echo_tool)
+
+    tools = registry.to_anthropic_format()
+    assert registry.to_anthropic_format() is tools
+    assert registry.version != empty_version
+
+    # Re-registering an identical tool keeps the stamp; a changed one moves it
+    version = registry.version
+    registry.register(EchoTool())
+    assert registry.version == version
+    registry.register(AsyncSleepTool())
+    assert registry.version != version
+    assert [tool["name"] for tool in registry.to_anthropic_format()] == [
+        "echo",
+        "async_sleep",
+    ]
+
+
+def test_tool_registry_rejects_invalid_arguments(tmp_path: Path):
+    """Test that arguments are checked against the schema before dispatch."""
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path))
+    (tmp_path / "a.txt").write_text("alpha\n")
+
+    result = registry.execute("read_file", {"offset": "2", "lines": 5})
+
+    assert result == (
+        "Error: invalid arguments for read_file:\n"
+        "- path: required but missing\n"
+        "- offset: expected integer, got string\n"
+        "- lines: unexpected property (expected one of: path, offset, limit, "
+        "count_lines)"
+    )
+    assert registry.validate("read_file", {"path": "a.txt", "limit": 0}) == [
+        SchemaError("limit", "must be at least 1")
+    ]
+    assert "alpha" in registry.execute("read_file", {"path": "a.txt", "offset": 1})
+
+
+async def test_tool_registry_validates_async_tools():
+    """Test that async tools get the same checks."""
+
+    class Tool(AsyncSleepTool):
+        parameters = {
+            "type": "object",
+            "properties": {"seconds": {"type": "number", "maximum": 1}},
+            "required": ["seconds"],
+        }
+
+    registry = ToolRegistry()
+    registry.register(Tool())
+
+    assert await registry.aexecute("async_sleep", {"seconds": 0}) == "async slept 0"
+    result = await registry.aexecute("async_sleep", {"seconds": 5})
+    assert result.endswith("- seconds: must be at most 1")
+
+
+def test_compile_schema():
+    """Test the compiled validator on nested values."""
+    validate = compile_schema(
+        {
+            "type": "object",
+            "properties": {
+                "paths": {
+                    "type": "array",
+                    "items": {"type": "string", "minLength": 1},
+                    "maxItems": 3,
+                },
+                "mode": {"enum": ["fast", "full"]},
+                "count": {"type": ["integer", "null"]},
+                "target": {"anyOf": [{"type": "string"}, {"type": "integer"}]},
+            },
+        }
+    )
+
+    assert validate({"paths": ["a"], "mode": "fast", "count": 2.0}) == []
+    assert validate({"count": None, "target": 3, "other": True}) == []
+    errors = validate(
+        {
+            "paths": ["a", "", 3, "b"],
+            "mode": "slow",
+            "count": True,
+            "target": [],
+        }
+    )
+    assert [str(error) for error in errors] == [
+        "paths: expected at most 3 items",
+        "paths[1]: expected at least 1 characters",
+        "paths[2]: expected string, got integer",
+        "mode: must be one of: 'fast', 'full'",
+        "count: expected integer or null, got boolean",
+        "target: matches none of the allowed forms",
+    ]
+    assert [str(e) for e in validate([])] == ["expected object, got array"]
+    with pytest.raises(ValueError):
+        compile_schema({"type": "decimal"})
+
+
+class SleepTool:
+    """A tool that sleeps, standing in for an I/O-bound tool."""
+
+    name = "sleep"
+    description = "Sleeps for a while."
+    parameters = {"type": "object", "properties": {}}
+
+    def execute(self, seconds: float) -> str:
+        if seconds < 0:
+            raise ValueError("negative sleep")
+        time.sleep(seconds)
+        return f"slept {seconds}"
+
+
+class AsyncSleepTool:
+    """An async version of SleepTool."""
+
+    name = "async_sleep"
+    description = "Sleeps for a while without blocking the loop."
+    parameters = {"type": "object", "properties": {}}
+
+    async def execute(self, seconds: float) -> str:
+        await asyncio.sleep(seconds)
+        return f"async slept {seconds}"
+
+
+def test_tool_registry_execute_many_keeps_order():
+    """Test that results come back in call order with their ids."""
+    registry = ToolRegistry()
+    registry.register(EchoTool())
+    registry.register(SleepTool())
+
+    calls = [
+        ("a", "sleep", {"seconds": 0.05}),
+        ("b", "echo", {"message": "hi"}),
+        ("c", "sleep", {"seconds": 0}),
+    ]
+    results = registry.execute_many(calls)
+
+    assert results == [("a", "slept 0.05"), ("b", "Echo: hi"), ("c", "slept 0")]
+
+
+def test_tool_registry_execute_many_isolates_errors():
+    """Test that one failing call does not affect the others."""
+    registry = ToolRegistry()
+    registry.register(SleepTool())
+
+    results = registry.execute_many(
+        [
+            ("a", "sleep", {"seconds": -1}),
+            ("b", "missing", {}),
+            ("c", "sleep", {"seconds": 0}),
+        ]
+    )
+
+    assert results[0] == ("a", "Error executing sleep: negative sleep")
+    assert results[1][1].startswith("Error: unknown tool")
+    assert results[2] == ("c", "slept 0")
+
+
+def test_tool_registry_execute_many_runs_concurrently():
+    """Test that I/O-bound calls overlap instead of running back to back."""
+    registry = ToolRegistry()
+    registry.register(SleepTool())
+    registry.register(AsyncSleepTool())
+
+    calls = [(str(i), "sleep", {"seconds": 0.2}) for i in range(4)]
+    calls += [(f"x{i}", "async_sleep", {"seconds": 0.2}) for i in range(4)]
+    start = time.perf_counter()
+    results = registry.execute_many(calls)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.8
+    assert [call_id for call_id, _ in results] == [call[0] for call in calls]
+    assert results[-1] == ("x3", "async slept 0.2")
+
+
+async def test_tool_registry_aexecute_many():
+    """Test concurrent execution from inside an event loop."""
+    registry = ToolRegistry()
+    registry.register(EchoTool())
+    registry.register(AsyncSleepTool())
+
+    results = await registry.aexecute_many(
+        [("a", "async_sleep", {"seconds": 0}), ("b", "echo", {"message": "x"})]
+    )
+
+    assert results == [("a", "async slept 0"), ("b", "Echo: x")]
+
+
 # === Path Validation Tests ===
 
 
+class ChunkTool:
+    """A tool that streams its output in chunks."""
+
+    name = "chunks"
+    description = "Yields numbered lines."
+    parameters = {"type": "object", "properties": {}}
+
+    def __init__(self) -> None:
+        self.produced = 0
+
+    def execute(self, lines: int, fail: bool = False) -> Iterator[str]:
+        for i in range(lines):
+            self.produced += 1
+            yield f"line {i}\n"
+        if fail:
+            raise RuntimeError("stream broke")
+
+
+def test_truncate_output_keeps_head_and_tail():
+    """Test that oversized outputs keep whole lines from both ends."""
+    text = "".join(f"line {i}\n" for i in range(1000))
+
+    assert truncate_output(text, len(text)) == text
+    result = truncate_output(text, 200)
+
+    head, rest = result.split("\n\n... [")
+    tail = rest.split("] ...\n\n")[1]
+    assert result == head + elision_marker(len(text) - len(head) - len(tail)) + tail
+    assert text.startswith(head)
+    assert text.endswith(tail)
+    assert head.startswith("line 0\n") and tail.endswith("line 999\n")
+    assert tail.startswith("line ")
+    assert len(head) + len(tail) <= 200
+
+
+def test_truncate_output_chunks_matches_string():
+    """Test that chunked outputs are truncated like the joined string."""
+    chunks = [f"row {i} " * (i % 7 + 1) + "\n" for i in range(500)]
+    text = "".join(chunks)
+
+    for budget in (50, 333, 1000, len(text)):
+        assert truncate_output(iter(chunks), budget) == truncate_output(text, budget)
+
+
+def test_tool_registry_truncates_outputs():
+    """Test that the registry applies its budget to string and chunk outputs."""
+    registry = ToolRegistry(max_output_tokens=25)
+    registry.register(EchoTool())
+    tool = ChunkTool()
+    registry.register(tool)
+
+    assert "omitted from the middle" in registry.execute("echo", {"message": "x" * 500})
+    result = registry.execute("chunks", {"lines": 10_000})
+    assert result.startswith("line 0\n")
+    assert result.endswith("line 9999\n")
+    assert len(result) < 250
+    assert tool.produced == 10_000
+
+    result = registry.execute("chunks", {"lines": 3, "fail": True})
+    assert result == "Error executing chunks: stream broke"
+
+
+def test_tool_registry_output_budget_from_env(monkeypatch):
+    """Test that VECNA_TOOL_OUTPUT_TOKENS sets the default budget."""
+    monkeypatch.setenv("VECNA_TOOL_OUTPUT_TOKENS", "10")
+    assert ToolRegistry().max_output_chars == 40
+
+
 def test_validate_path_valid(tmp_path: Path):
     """Test that valid paths within working directory are allowed."""
     # Create a test file
@@ -81,6 +351,66 @@ def test_validate_path_absolute_outside_blocked(tmp_path: Path):
         validate_path("/etc/passwd", tmp_path)
 
 
+def test_path_resolver_matches_validate_path(tmp_path: Path):
+    """Test that the caching resolver agrees with validate_path."""
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+    (tmp_path / "src" / "pkg" / "mod.py").write_text("x = 1")
+    (tmp_path / "link").symlink_to(tmp_path / "src")
+    resolver = PathResolver(tmp_path)
+
+    for path in (
+        "src/pkg/mod.py",
+        "./src/pkg/mod.py",
+        "link/pkg/mod.py",
+        "link/pkg/../pkg/mod.py",
+        "src/missing/file.py",
+        str(tmp_path / "src"),
+        ".",
+    ):
+        assert resolver.resolve(path) == validate_path(path, tmp_path)
+        # Second lookup is served from the directory cache
+        assert resolver.resolve(path) == validate_path(path, tmp_path)
+
+
+def test_path_resolver_blocks_escapes(tmp_path: Path):
+    """Test that traversal and escaping symlinks are still blocked."""
+    outside = tmp_path / "outside"
+    workspace = tmp_path / "workspace"
+    outside.mkdir()
+    workspace.mkdir()
+    (outside / "secret.txt").write_text("secret")
+    (workspace / "escape_dir").symlink_to(outside)
+    (workspace / "escape_file").symlink_to(outside / "secret.txt")
+    resolver = PathResolver(workspace)
+
+    for path in (
+        "../outside/secret.txt",
+        "/etc/passwd",
+        "escape_dir/secret.txt",
+        "escape_file",
+    ):
+        with pytest.raises(PathSecurityError):
+            resolver.resolve(path)
+
+
+def test_path_resolver_notices_retargeted_symlink(tmp_path: Path):
+    """Test that a cached directory is re-resolved when its symlink changes."""
+    workspace = tmp_path / "workspace"
+    (workspace / "inside").mkdir(parents=True)
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    link = workspace / "data"
+    link.symlink_to(workspace / "inside")
+    resolver = PathResolver(workspace)
+    assert resolver.resolve("data/file.txt") == workspace / "inside" / "file.txt"
+
+    link.unlink()
+    link.symlink_to(outside)
+
+    with pytest.raises(PathSecurityError):
+        resolver.resolve("data/file.txt")
+
+
 # === File Read Tool Tests ===
 
 
@@ -126,3 +456,403 @@ def test_file_read_tool_in_registry(tmp_path: Path):
     result = registry.execute("read_file", {"path": "test.py"})
 
     assert "x = 1" in result
+
+
+def test_file_read_tool_offset_and_limit(tmp_path: Path):
+    """Test reading a window of lines from the middle of a file."""
+    test_file = tmp_path / "numbers.txt"
+    test_file.write_text("\n".join(f"line {i}" for i in range(1, 101)))
+
+    tool = FileReadTool(working_dir=tmp_path)
+    result = tool.execute(path="numbers.txt", offset=10, limit=5)
+
+    assert " 10 │ line 10" in result
+    assert " 14 │ line 14" in result
+    assert "line 15" not in result
+    assert "line 9\n" not in result
+    assert "(100 lines)" in result
+    assert "use offset=15" in result
+
+
+def test_file_read_tool_truncates_at_default_limit(tmp_path: Path):
+    """Test that long files are cut at the default window size."""
+    test_file = tmp_path / "long.txt"
+    test_file.write_text("x\n" * 600)
+
+    tool = FileReadTool(working_dir=tmp_path)
+    result = tool.execute(path="long.txt")
+
+    assert "truncated, showing 500 of 600 lines" in result
+
+
+def test_sniff_bytes_tells_text_from_binary():
+    """Test encodings from BOMs and content, and binaries from their head."""
+    assert sniff_bytes(b"plain ascii\n").encoding == "utf-8"
+    assert sniff_bytes("\ufeffwith bom".encode("utf-8")).encoding == "utf-8-sig"
+    assert sniff_bytes("wide text".encode("utf-16")).encoding == "utf-16"
+    assert sniff_bytes("no bom here".encode("utf-16-le")).encoding == "utf-16-le"
+    assert sniff_bytes("caf\xe9 au lait".encode("latin-1"), True).encoding
+    # A multi-byte character cut off by the end of the head is still UTF-8
+    assert sniff_bytes("caf\xe9".encode()[:-1]).encoding == "utf-8"
+
+    gzip = sniff_bytes(b"\x1f\x8b\x08\x00" + bytes(100))
+    assert gzip.binary and gzip.kind == "gzip compressed data"
+    assert sniff_bytes(b"text\0with a nul").kind == "data"
+    assert sniff_bytes(bytes(range(1, 32)) * 10).binary
+
+
+def test_file_read_tool_summarizes_huge_binary(tmp_path: Path):
+    """Test that a huge binary is summarized from its head alone."""
+    archive = tmp_path / "backup.tar.gz"
+    with archive.open("wb") as f:
+        f.write(b"\x1f\x8b\x08\x00" + b"\x00" * 60)
+        f.truncate(2 * 1024**3)  # Sparse, so it takes no space
+    tool = FileReadTool(working_dir=tmp_path, cache=FileCache())
+
+    start = time.perf_counter()
+    result = tool.execute(path="backup.tar.gz")
+
+    assert time.perf_counter() - start < 0.5
+    assert result.startswith(
+        "Binary file: backup.tar.gz (gzip compressed data, 2,147,483,648 bytes)"
+    )
+    assert "1f 8b 08 00" in result
+
+
+def test_file_read_tool_decodes_detected_encodings(tmp_path: Path):
+    """Test that BOMs are honored and dropped, and non-UTF-8 text is read."""
+    (tmp_path / "wide.txt").write_text("first\nsecond\n", encoding="utf-16")
+    (tmp_path / "bom.txt").write_text("\ufeffheader\n", encoding="utf-8")
+    (tmp_path / "legacy.txt").write_bytes("caf\xe9\n".encode("latin-1"))
+    tool = FileReadTool(working_dir=tmp_path, cache=FileCache())
+
+    assert "1 │ first\n2 │ second" in tool.execute(path="wide.txt")
+    assert "1 │ header" in tool.execute(path="bom.txt")
+    assert "1 │ caf\xe9" in tool.execute(path="legacy.txt")
+
+
+def test_file_read_tool_decodes_bytes_past_the_sniffed_head(
+    tmp_path: Path, monkeypatch
+):
+    """Test that a non-UTF-8 byte after the first 8 KB doesn't refuse the file."""
+    import vecna.tools.file_read as file_read
+
+    data = b"".join(b"ascii line %d\n" % i for i in range(1000)) + b"caf\xe9\n"
+    assert len(data) > 12 * 1024
+    (tmp_path / "late.txt").write_bytes(data)
+    small = FileReadTool(working_dir=tmp_path, cache=FileCache())
+
+    assert "1001 │ caf\xe9" in small.execute(path="late.txt", offset=1000)
+
+    monkeypatch.setattr(file_read, "MMAP_THRESHOLD", 16)
+    windowed = FileReadTool(working_dir=tmp_path, cache=FileCache())
+    assert "1001 │ caf\xe9" in windowed.execute(path="late.txt", offset=1000)
+
+
+def test_sniff_bytes_reads_text_starting_like_a_magic_number():
+    """Test that printable magic numbers need binary bytes to count."""
+    for text in (b"OggS is a container format\n", b"GIF89a\n", b"BZh, said he\n"):
+        assert sniff_bytes(text, True).encoding == "utf-8"
+
+    assert sniff_bytes(b"BZh91AY&SY\x0f\x83\x12\x01").kind == "bzip2 compressed data"
+    assert sniff_bytes(b"GIF89a\x01\x00\x01\x00\x80").kind == "GIF image"
+
+
+def test_read_lines_decodes_utf16_windows(tmp_path: Path, monkeypatch):
+    """Test that large UTF-16 files are read in windows too."""
+    import vecna.tools.file_read as file_read
+
+    monkeypatch.setattr(file_read, "MMAP_THRESHOLD", 16)
+    lines = [f"line {i}" for i in range(1, 11)]
+    (tmp_path / "wide.txt").write_text("\n".join(lines) + "\n", encoding="utf-16")
+    tool = FileReadTool(working_dir=tmp_path, cache=FileCache())
+
+    result = tool.execute(path="wide.txt", offset=4, limit=2)
+
+    assert "4 │ line 4\n5 │ line 5" in result
+    assert "line 6" not in result
+
+
+def test_read_lines_large_file_uses_window(tmp_path: Path, monkeypatch):
+    """Test the mmap-backed reader on a file above the mmap threshold."""
+    import vecna.tools.utils as tool_utils
+
+    monkeypatch.setattr(tool_utils, "MMAP_THRESHOLD", 16)
+    test_file = tmp_path / "big.log"
+    test_file.write_bytes(b"".join(b"entry %d\r\n" % i for i in range(1000)))
+
+    lines, more = tool_utils.read_lines(test_file, offset=991, limit=20)
+
+    assert lines[0] == "entry 990"
+    assert lines[-1] == "entry 999"
+    assert more is False
+    assert tool_utils.count_file_lines(test_file, chunk_size=7) == 1000
+
+
+def test_file_read_tool_skips_count_for_huge_files(tmp_path: Path, monkeypatch):
+    """Test that total lines are not counted for files over the limit."""
+    import vecna.tools.file_read as file_read
+
+    monkeypatch.setattr(file_read, "COUNT_LINES_LIMIT", 10)
+    monkeypatch.setattr(file_read, "MMAP_THRESHOLD", 10)
+    test_file = tmp_path / "huge.log"
+    test_file.write_text("row\n" * 50)
+
+    tool = FileReadTool(working_dir=tmp_path)
+    windowed = tool.execute(path="huge.log", limit=5)
+    counted = tool.execute(path="huge.log", limit=5, count_lines=True)
+
+    assert "total not counted" in windowed
+    assert "(50 lines)" in counted
+
+
+def test_file_read_tool_numbers_lines_like_windowed_reads(tmp_path: Path, monkeypatch):
+    """Test that only newlines split lines, whether a file is small or large."""
+    import vecna.tools.file_read as file_read
+
+    text = "page one\fstill line 1\r\nsep\u2028arator\x0b\x1c\nlast\n"
+    (tmp_path / "odd.txt").write_text(text, newline="")
+    small = FileReadTool(working_dir=tmp_path, cache=FileCache())
+    small_result = small.execute(path="odd.txt")
+
+    monkeypatch.setattr(file_read, "MMAP_THRESHOLD", 10)
+    large = FileReadTool(working_dir=tmp_path, cache=FileCache())
+
+    assert small_result == large.execute(path="odd.txt")
+    assert "3 │ last" in small_result
+    assert "(3 lines)" in small_result
+
+
+def test_file_read_tool_counts_lines_when_window_reaches_eof(
+    tmp_path: Path, monkeypatch
+):
+    """Test that a window ending the file gives the total without counting."""
+    import vecna.tools.file_read as file_read
+
+    monkeypatch.setattr(file_read, "COUNT_LINES_LIMIT", 10)
+    monkeypatch.setattr(file_read, "MMAP_THRESHOLD", 10)
+    (tmp_path / "huge.log").write_text("row\n" * 50)
+    tool = FileReadTool(working_dir=tmp_path)
+
+    assert "(50 lines)" in tool.execute(path="huge.log", offset=46)
+    assert "total not counted" in tool.execute(path="huge.log", offset=60)
+
+
+# === File Cache Tests ===
+
+
+def test_file_read_tool_serves_repeat_reads_from_cache(tmp_path: Path):
+    """Test that an unchanged file is read from disk only once."""
+    test_file = tmp_path / "cached.txt"
+    test_file.write_text("cached contents")
+    cache = FileCache()
+    tool = FileReadTool(working_dir=tmp_path, cache=cache)
+
+    first = tool.execute(path="cached.txt")
+    second = tool.execute(path="cached.txt")
+
+    assert first == second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_file_read_tool_cache_detects_changes(tmp_path: Path):
+    """Test that a modified file is re-read instead of served stale."""
+    test_file = tmp_path / "changing.txt"
+    test_file.write_text("version one")
+    tool = FileReadTool(working_dir=tmp_path, cache=FileCache())
+    tool.execute(path="changing.txt")
+
+    test_file.write_text("version two, longer")
+
+    assert "version two" in tool.execute(path="changing.txt")
+
+
+def test_split_budget_fills_small_outputs_first():
+    """Test that small outputs keep their size and large ones share the rest."""
+    assert split_budget([10, 500, 20], 300) == [10, 270, 20]
+    assert split_budget([400, 500, 20], 300) == [140, 140, 20]
+    assert split_budget([1, 2], 300) == [1, 2]
+    assert split_budget([], 300) == []
+
+
+def test_read_files_tool_reads_paths_and_globs(tmp_path: Path):
+    """Test that paths and globs are expanded, deduplicated and read."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("alpha\n")
+    (tmp_path / "src" / "b.py").write_text("beta\n")
+    (tmp_path / "notes.txt").write_text("gamma\n")
+    tool = ReadFilesTool(working_dir=tmp_path, cache=FileCache())
+
+    result = tool.execute(paths=["notes.txt", "src/*.py", "src/a.py"])
+
+    assert result.count("=== src/a.py ===") == 1
+    assert result.index("=== notes.txt ===") < result.index("=== src/b.py ===")
+    for text in ("alpha", "beta", "gamma"):
+        assert text in result
+
+
+def test_read_files_tool_uses_the_pool_only_for_large_reads(
+    tmp_path: Path, monkeypatch
+):
+    """Test that small files are read inline and large reads go to the pool."""
+    import vecna.tools.read_files as read_files
+
+    for i in range(3):
+        (tmp_path / f"f{i}.txt").write_text(f"file {i}\n" * 100)
+    pooled = []
+
+    def get_read_pool():
+        pooled.append(True)
+        return read_files.ThreadPoolExecutor(max_workers=2)
+
+    monkeypatch.setattr(read_files, "get_read_pool", get_read_pool)
+    tool = ReadFilesTool(working_dir=tmp_path, cache=FileCache())
+
+    inline = tool.execute(paths=["*.txt"])
+    assert not pooled
+    monkeypatch.setattr(read_files, "INLINE_READ_BYTES", 1000)
+    tool.reader.cache.invalidate()
+    assert tool.execute(paths=["*.txt"]) == inline
+    assert pooled
+
+
+def test_read_files_tool_reports_bad_paths(tmp_path: Path):
+    """Test that refused, missing and unmatched paths don't stop the read."""
+    (tmp_path / "ok.txt").write_text("fine\n")
+    tool = ReadFilesTool(working_dir=tmp_path, cache=FileCache())
+
+    result = tool.execute(paths=["ok.txt", "../secret", "missing.txt", "*.md"])
+
+    assert "fine" in result
+    assert "outside the working directory" in result
+    assert "File not found: missing.txt" in result
+    assert "No files match '*.md'" in result
+
+
+def test_read_files_tool_shares_the_budget(tmp_path: Path):
+    """Test that small files stay whole while large ones are shortened."""
+    (tmp_path / "small.txt").write_text("tiny\n")
+    (tmp_path / "big1.txt").write_text("".join(f"one {i}\n" for i in range(400)))
+    (tmp_path / "big2.txt").write_text("".join(f"two {i}\n" for i in range(400)))
+    tool = ReadFilesTool(working_dir=tmp_path, cache=FileCache(), max_output_tokens=500)
+
+    result = tool.execute(paths=["small.txt", "big1.txt", "big2.txt"])
+
+    assert len(result) <= tool.max_output_chars
+    assert "tiny" in result
+    # Both large files keep their head and tail
+    for name in ("one", "two"):
+        assert f"{name} 0" in result and f"{name} 399" in result
+    assert result.count("omitted from the middle") == 2
+
+
+def test_read_files_tool_caps_file_count(tmp_path: Path):
+    """Test that files beyond max_files are left out with a note."""
+    for i in range(5):
+        (tmp_path / f"f{i}.txt").write_text(f"file {i}\n")
+    tool = ReadFilesTool(working_dir=tmp_path, cache=FileCache())
+
+    result = tool.execute(paths=["*.txt"], max_files=2)
+
+    assert result.count("=== ") == 2
+    assert "3 more files not read" in result
+
+
+def numbered(count: int) -> str:
+    return "".join(f"line {i}\n" for i in range(1, count + 1))
+
+
+def test_file_read_tool_rereads_send_only_changes(tmp_path: Path):
+    """Test that re-reads are an unchanged note or a diff with file line numbers."""
+    test_file = tmp_path / "notes.txt"
+    test_file.write_text(numbered(100))
+    tool = FileReadTool(working_dir=tmp_path, cache=FileCache(), seen=SeenFiles())
+    full = tool.execute(path="notes.txt")
+
+    unchanged = tool.execute(path="notes.txt")
+    assert unchanged == f"File: notes.txt (100 lines)\n{UNCHANGED_NOTE}"
+
+    test_file.write_text(numbered(100).replace("line 50\n", "line fifty\n"))
+    diff = tool.execute(path="notes.txt")
+    assert len(diff) < len(full) / 3
+    assert "@@ -47,7 +47,7 @@" in diff
+    assert "-line 50\n+line fifty" in diff
+
+    # Another window is read in full the first time
+    assert "45 │ line 45" in tool.execute(path="notes.txt", offset=40, limit=10)
+
+
+def test_file_read_tool_reread_falls_back_to_full(tmp_path: Path):
+    """Test that a rewrite bigger than the file is sent whole."""
+    test_file = tmp_path / "notes.txt"
+    test_file.write_text(numbered(20))
+    tool = FileReadTool(working_dir=tmp_path, cache=FileCache(), seen=SeenFiles())
+    tool.execute(path="notes.txt")
+
+    test_file.write_text("".join(f"other {i}\n" for i in range(20)))
+
+    assert "1 │ other 0" in tool.execute(path="notes.txt")
+
+
+def test_registry_forget_results_resets_rereads(tmp_path: Path):
+    """Test that forgetting results makes the next read full again."""
+    (tmp_path / "a.txt").write_text(numbered(30))
+    seen = SeenFiles()
+    registry = ToolRegistry()
+    registry.register(FileReadTool(working_dir=tmp_path, cache=FileCache(), seen=seen))
+    registry.register(ReadFilesTool(working_dir=tmp_path, seen=seen))
+    registry.execute("read_file", {"path": "a.txt"})
+    assert UNCHANGED_NOTE in registry.execute("read_files", {"paths": ["a.txt"]})
+
+    registry.forget_results()
+
+    assert "30 │ line 30" in registry.execute("read_file", {"path": "a.txt"})
+
+
+def test_read_files_tool_forgets_truncated_reads(tmp_path: Path):
+    """Test that a file shortened to fit the budget isn't diffed later."""
+    (tmp_path / "big.txt").write_text(numbered(400))
+    (tmp_path / "small.txt").write_text(numbered(30))
+    seen = SeenFiles()
+    tool = ReadFilesTool(
+        working_dir=tmp_path, cache=FileCache(), max_output_tokens=500, seen=seen
+    )
+
+    tool.execute(paths=["big.txt", "small.txt"])
+
+    assert len(seen) == 1
+    assert UNCHANGED_NOTE in tool.execute(paths=["small.txt"])
+
+
+def test_file_cache_shared_per_working_dir(tmp_path: Path):
+    """Test that tools rooted in the same directory share one cache."""
+    assert FileReadTool(tmp_path).cache is FileReadTool(tmp_path).cache
+    assert get_file_cache(tmp_path) is FileReadTool(tmp_path).cache
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path: Path):
+    """Test that the byte budget evicts the oldest entries first."""
+    cache = FileCache(max_bytes=25)
+    cache.put_text(tmp_path / "a", (1, 10, 1), "a" * 10)
+    cache.put_text(tmp_path / "b", (1, 10, 2), "b" * 10)
+    assert cache.get(tmp_path / "a", (1, 10, 1)) is not None
+
+    cache.put_text(tmp_path / "c", (1, 10, 3), "c" * 10)
+
+    assert cache.get(tmp_path / "b", (1, 10, 2)) is None
+    assert cache.get(tmp_path / "a", (1, 10, 1)) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.size == 20
+
+
+def test_file_cache_invalidate(tmp_path: Path):
+    """Test explicit invalidation after a write."""
+    cache = FileCache()
+    path = tmp_path / "written.txt"
+    cache.put_text(path, (1, 1, 1), "x")
+
+    cache.invalidate(path)
+
+    assert cache.get(path, (1, 1, 1)) is None
+    assert cache.size == 0
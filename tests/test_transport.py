@@ -0,0 +1,301 @@
+"""Tests for the pooled, retrying API transport."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from anthropic import Anthropic, AsyncAnthropic
+
+from vecna import transport
+from vecna.agent import INTERRUPTED_NOTE, Agent, AsyncAgent
+from vecna.transport import (
+    AdaptiveLimiter,
+    AsyncRetryTransport,
+    RetryPolicy,
+    RetryTransport,
+    retry_after,
+)
+from vecna.utils import get_async_client, get_client, get_retry_policy
+
+
+def reply() -> dict:
+    return {
+        "id": "msg_1",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-test",
+        "content": [{"type": "text", "text": "Hi"}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 5},
+    }
+
+
+def scripted(statuses: list, headers: dict | None = None):
+    """A handler answering with `statuses` in turn, then successes."""
+    remaining = list(statuses)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        status = remaining.pop(0) if remaining else 200
+        if isinstance(status, Exception):
+            raise status
+        if status != 200:
+            return httpx.Response(status, headers=headers or {}, json={})
+        return httpx.Response(200, json=reply())
+
+    return handler, requests
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(transport, "BASE_BACKOFF", 0.001)
+
+
+def test_retries_throttled_requests():
+    """Test that a 429 is retried after retry-after and halves the limit."""
+    handler, requests = scripted([429, 529], {"retry-after-ms": "20"})
+    policy = RetryPolicy(max_retries=3, max_concurrency=8)
+    client = httpx.Client(
+        transport=RetryTransport(httpx.MockTransport(handler), policy)
+    )
+
+    response = client.post("https://api.test/v1/messages", json={"a": 1})
+
+    assert response.status_code == 200
+    assert len(requests) == 3
+    assert policy.counts == {429: 1, 529: 1}
+    assert policy.limiter.limit == 2
+    assert policy.limiter.active == 0
+    assert policy.snapshot()["retries"] == 2
+
+
+def test_gives_up_on_client_errors_and_after_max_retries():
+    """Test the requests that aren't retried, or not forever."""
+    handler, requests = scripted([400, 500, 500, 500])
+    policy = RetryPolicy(max_retries=2)
+    client = httpx.Client(
+        transport=RetryTransport(httpx.MockTransport(handler), policy)
+    )
+
+    assert client.post("https://api.test/").status_code == 400
+    assert client.post("https://api.test/").status_code == 500
+    assert len(requests) == 4
+    assert policy.retries == 2
+
+    handler, requests = scripted([503], {"x-should-retry": "false"})
+    client = httpx.Client(
+        transport=RetryTransport(httpx.MockTransport(handler), policy)
+    )
+    assert client.post("https://api.test/").status_code == 503
+
+
+def test_retries_failed_connections():
+    """Test that connection errors are retried, then raised."""
+    error = httpx.ConnectError("refused")
+    handler, requests = scripted([error, error, error])
+    policy = RetryPolicy(max_retries=1)
+    client = httpx.Client(
+        transport=RetryTransport(httpx.MockTransport(handler), policy)
+    )
+
+    with pytest.raises(httpx.ConnectError):
+        client.post("https://api.test/")
+    assert policy.counts == {0: 1}
+    assert client.post("https://api.test/").status_code == 200
+    assert policy.limiter.active == 0
+
+
+def test_retries_timeouts_and_dropped_connections():
+    """Test that timeouts are retried like the SDK retries them."""
+    errors = [
+        httpx.ReadTimeout("slow"),
+        httpx.WriteTimeout("slow"),
+        httpx.PoolTimeout("busy"),
+        httpx.RemoteProtocolError("Server disconnected"),
+    ]
+    handler, requests = scripted(errors)
+    policy = RetryPolicy(max_retries=4)
+    client = httpx.Client(
+        transport=RetryTransport(httpx.MockTransport(handler), policy)
+    )
+
+    assert client.post("https://api.test/").status_code == 200
+    assert policy.counts == {0: 4}
+
+
+def test_stream_holds_its_slot_until_closed():
+    """Test that a streamed response counts as in flight until closed."""
+    policy = RetryPolicy()
+    mock = httpx.MockTransport(lambda request: httpx.Response(200, content=b"data"))
+    client = httpx.Client(transport=RetryTransport(mock, policy))
+
+    with client.stream("GET", "https://api.test/") as response:
+        assert policy.limiter.active == 1
+        assert response.read() == b"data"
+    assert policy.limiter.active == 0
+
+
+def test_retry_after_formats():
+    """Test the retry-after headers understood."""
+    assert retry_after(httpx.Headers({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(httpx.Headers({"retry-after": "3"})) == 3.0
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert retry_after(httpx.Headers({"retry-after": date})) == 0.0
+    assert retry_after(httpx.Headers({})) is None
+
+
+def test_agent_turn_counts_retries():
+    """Test that a turn reports the retries its requests needed."""
+    handler, _ = scripted([529, 529], {"retry-after-ms": "0"})
+    policy = RetryPolicy()
+    client = Anthropic(
+        api_key="sk-test",
+        max_retries=0,
+        http_client=httpx.Client(
+            transport=RetryTransport(httpx.MockTransport(handler), policy)
+        ),
+    )
+    agent = Agent(client=client)
+
+    assert agent.chat("Hello") == "Hi"
+    assert agent.stats.last.retries == 2
+    assert agent.stats.summary()["retries"] == 2
+
+
+async def test_async_agent_turn_counts_retries():
+    """Test retries through the async transport, per concurrent turn."""
+    statuses = {"one": [429], "two": []}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        messages = json.loads(request.content)["messages"]
+        content = messages[-1]["content"]
+        if not isinstance(content, str):
+            content = content[0]["text"]
+        remaining = statuses[content]
+        if remaining:
+            return httpx.Response(remaining.pop(), headers={"retry-after-ms": "0"})
+        return httpx.Response(200, json=reply())
+
+    policy = RetryPolicy()
+    client = AsyncAnthropic(
+        api_key="sk-test",
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            transport=AsyncRetryTransport(httpx.MockTransport(handler), policy)
+        ),
+    )
+    agents = [AsyncAgent(client=client), AsyncAgent(client=client)]
+
+    await asyncio.gather(agents[0].chat("one"), agents[1].chat("two"))
+
+    assert [agent.stats.last.retries for agent in agents] == [1, 0]
+    assert policy.limiter.active == 0
+
+
+async def test_limiter_backs_off_and_recovers():
+    """Test that throttling halves the limit and successes raise it again."""
+    limiter = AdaptiveLimiter(4)
+    await limiter.aacquire()
+    limiter.release(throttled_for=0.0)
+    assert limiter.limit == 2
+
+    for _ in range(2):
+        await limiter.aacquire()
+        limiter.release()
+    assert limiter.limit == 3
+
+    for _ in range(3):
+        await limiter.aacquire()
+    waiter = asyncio.create_task(limiter.aacquire())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+    # A thread frees the slot the task is waiting for
+    threading.Thread(target=limiter.release).start()
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.active == 3
+
+
+async def test_clients_are_shared(monkeypatch):
+    """Test that the factories hand out one client per settings."""
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-test")
+    monkeypatch.delenv("VECNA_CASSETTE", raising=False)
+
+    assert get_client() is get_client()
+    assert get_async_client() is get_async_client()
+    assert get_client().max_retries == 0
+    first = get_client()
+    monkeypatch.setenv("VECNA_MAX_CONNECTIONS", "7")
+    assert get_client() is not first
+    assert get_retry_policy() is get_retry_policy()
+
+
+class StalledStreamHandler(BaseHTTPRequestHandler):
+    """Streams the start of a reply, then goes quiet."""
+
+    protocol_version = "HTTP/1.1"
+    events = [
+        {
+            "type": "message_start",
+            "message": {**reply(), "content": [], "stop_reason": None},
+        },
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""},
+        },
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "text_delta", "text": "Partial"},
+        },
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["content-length"]))
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.end_headers()
+        for event in self.events:
+            self.wfile.write(
+                f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+            )
+        self.wfile.flush()
+        self.server.released.wait(5)
+
+
+def test_cancel_aborts_a_stalled_stream(monkeypatch):
+    """Test that cancel() from another thread wakes a blocked read at once."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StalledStreamHandler)
+    server.released = threading.Event()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    host, port = server.server_address[:2]
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-test")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", f"http://{host}:{port}")
+    monkeypatch.delenv("VECNA_CASSETTE", raising=False)
+    agent = Agent()
+
+    try:
+        chunks = []
+        start = time.monotonic()
+        for chunk in agent.chat_stream("Hello"):
+            chunks.append(chunk)
+            threading.Timer(0.1, agent.cancel).start()
+        elapsed = time.monotonic() - start
+    finally:
+        server.released.set()
+        server.shutdown()
+        server.server_close()
+
+    assert chunks == ["Partial"]
+    assert elapsed < 2
+    assert agent.messages[-1]["content"] == f"Partial\n\n{INTERRUPTED_NOTE}"
+    assert get_retry_policy().limiter.active == 0
@@ -0,0 +1,212 @@
+"""Tests for running tools in worker processes."""
+
+import os
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from vecna.tools import ToolRegistry
+from vecna.tools.defaults import default_tools
+from vecna.tools.echo import EchoTool
+from vecna.tools.exceptions import ToolCancelledError, ToolTimeoutError
+from vecna.tools.grep import PARALLEL_THRESHOLD
+from vecna.tools.workers import MB, ToolLimits, WorkerPool
+
+
+class TickTool:
+    """Yields a line per tick, forever unless given a count."""
+
+    name = "tick"
+    description = "Count ticks"
+    parameters = {
+        "type": "object",
+        "properties": {
+            "count": {"type": "integer"},
+            "interval": {"type": "number"},
+        },
+    }
+
+    def execute(self, count: int = -1, interval: float = 0.02) -> Iterator[str]:
+        tick = 0
+        while tick != count:
+            yield f"tick {tick}\n"
+            tick += 1
+            time.sleep(interval)
+
+
+class CrashTool:
+    """Ends its worker process abruptly."""
+
+    name = "crash"
+    description = "Crash"
+    parameters = {"type": "object", "properties": {}}
+
+    def execute(self) -> str:
+        os._exit(3)
+
+
+class HogTool:
+    """Allocates memory."""
+
+    name = "hog"
+    description = "Allocate memory"
+    parameters = {
+        "type": "object",
+        "properties": {"megabytes": {"type": "integer"}},
+        "required": ["megabytes"],
+    }
+
+    def execute(self, megabytes: int) -> str:
+        return f"allocated {len(bytearray(megabytes * MB)) // MB} MB"
+
+
+def make_tools(pool: WorkerPool | None = None) -> ToolRegistry:
+    """Build the test tools, isolating all but echo when given a pool."""
+    tools = ToolRegistry(pool=pool)
+    tools.register(EchoTool())
+    for tool in (TickTool(), CrashTool(), HogTool()):
+        tools.register(tool, isolated=pool is not None)
+    return tools
+
+
+@pytest.fixture
+def pool() -> Iterator[WorkerPool]:
+    with WorkerPool(make_tools, size=1, limits=ToolLimits(timeout=5)) as pool:
+        yield pool
+
+
+@pytest.fixture
+def tools(pool: WorkerPool) -> ToolRegistry:
+    return make_tools(pool)
+
+
+def worker_pids(pool: WorkerPool) -> set[int | None]:
+    return {worker.process.pid for worker in pool._workers}
+
+
+def test_pooled_tool_streams_its_output(pool: WorkerPool):
+    """Test that a pooled tool's output arrives in chunks."""
+    chunks = list(pool.run("tick", {"count": 3, "interval": 0.15}))
+    assert "".join(chunks) == "tick 0\ntick 1\ntick 2\n"
+    assert len(chunks) > 1
+
+
+def test_registry_runs_isolated_tools_in_the_pool(tools: ToolRegistry):
+    """Test that isolated tools run in a worker and others in process."""
+    assert tools.is_isolated("tick")
+    assert not tools.is_isolated("echo")
+    assert tools.execute("tick", {"count": 2, "interval": 0}) == "tick 0\ntick 1\n"
+    assert tools.execute("echo", {"message": "hi"}) == "Echo: hi"
+    # Arguments are still checked before anything is sent to a worker
+    result = tools.execute("tick", {"count": "two"})
+    assert result.startswith("Error: invalid arguments for tick")
+
+
+def test_timed_out_tool_keeps_its_output(pool: WorkerPool):
+    """Test that a tool past its timeout is killed, keeping what it produced."""
+    tools = make_tools(pool)
+    # Wait for the worker to start, so the timeout only covers the call
+    assert tools.execute("tick", {"count": 0}) == ""
+    pool.tool_limits["tick"] = ToolLimits(timeout=0.5)
+    before = worker_pids(pool)
+    start = time.perf_counter()
+    result = tools.execute("tick", {})
+    assert time.perf_counter() - start < 2
+    assert result.startswith("tick 0\n")
+    assert result.endswith(
+        "[tick timed out after 0.5s; the output above is incomplete]"
+    )
+    # The worker was replaced and the pool still works
+    assert worker_pids(pool).isdisjoint(before)
+    assert tools.execute("tick", {"count": 1}) == "tick 0\n"
+
+
+def test_timeout_without_output_is_an_error(pool: WorkerPool):
+    """Test that a tool stopped before producing anything reports an error."""
+    pool.tool_limits["tick"] = ToolLimits(timeout=0.1)
+    with pytest.raises(ToolTimeoutError):
+        list(pool.run("tick", {"count": 1, "interval": 5}))
+
+
+def test_cancel_stops_a_pooled_call(tools: ToolRegistry):
+    """Test that setting the cancel flag stops the call promptly."""
+    assert tools.execute("tick", {"count": 0}) == ""
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    start = time.perf_counter()
+    result = tools.execute("tick", {}, cancel)
+    assert time.perf_counter() - start < 2
+    assert result.endswith("[tick cancelled; the output above is incomplete]")
+
+
+def test_cancel_before_output_raises(pool: WorkerPool):
+    """Test that a call cancelled before any output raises."""
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(ToolCancelledError):
+        list(pool.run("tick", {"interval": 5}, cancel))
+
+
+def test_crashed_worker_is_replaced(tools: ToolRegistry, pool: WorkerPool):
+    """Test that a worker dying mid-call is reported and replaced."""
+    result = tools.execute("crash", {})
+    assert result.startswith("Error executing crash: worker process died")
+    assert "exit code 3" in result
+    assert len(pool._workers) == 1
+    assert tools.execute("tick", {"count": 1}) == "tick 0\n"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Memory limits need RLIMIT_AS")
+def test_memory_limit_fails_the_call(pool: WorkerPool):
+    """Test that a tool over its memory limit fails without killing the pool."""
+    pool.tool_limits["hog"] = ToolLimits(timeout=5, memory=512 * MB)
+    tools = make_tools(pool)
+    before = worker_pids(pool)
+    result = tools.execute("hog", {"megabytes": 1024})
+    assert result == "Error executing hog: out of memory (limit 512 MB)"
+    # The limit is lifted after the call, and the worker is kept
+    assert worker_pids(pool) == before
+    pool.tool_limits.clear()
+    assert tools.execute("hog", {"megabytes": 600}) == "allocated 600 MB"
+
+
+def test_execute_many_runs_pooled_calls_concurrently():
+    """Test that pooled calls run side by side in separate workers."""
+    limits = ToolLimits(timeout=5)
+    with WorkerPool(make_tools, size=2, limits=limits) as pool:
+        tools = make_tools(pool)
+        # Wait for both workers to start
+        tools.execute_many([("a", "tick", {"count": 0}), ("b", "tick", {"count": 0})])
+        calls: list[tuple[str, str, dict[str, Any]]] = [
+            ("a", "tick", {"count": 1, "interval": 0.5}),
+            ("b", "tick", {"count": 1, "interval": 0.5}),
+        ]
+        start = time.perf_counter()
+        results = tools.execute_many(calls)
+        assert time.perf_counter() - start < 0.9
+    assert results == [("a", "tick 0\n"), ("b", "tick 0\n")]
+
+
+def test_isolated_tool_needs_a_pool():
+    """Test that isolating a tool in a registry without a pool is refused."""
+    with pytest.raises(ValueError, match="no pool"):
+        ToolRegistry().register(TickTool(), isolated=True)
+
+
+def test_pooled_grep_searches_large_trees(tmp_path: Path):
+    """Test that grep over many files works in a worker, which can't fork."""
+    for i in range(PARALLEL_THRESHOLD * 3):
+        (tmp_path / f"file{i:03}.txt").write_text(f"line\nneedle {i}\n")
+    tools = default_tools(tmp_path, workers=1)
+    try:
+        assert tools.is_isolated("grep")
+        result = tools.execute("grep", {"pattern": "needle", "max_results": 500})
+    finally:
+        tools.close()
+    assert not result.startswith("Error"), result
+    assert len(result.splitlines()) == PARALLEL_THRESHOLD * 3
+    assert result.splitlines()[0] == "file000.txt:2: needle 0"
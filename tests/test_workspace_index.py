@@ -0,0 +1,147 @@
+"""Tests for the workspace index and the glob tool."""
+
+from pathlib import Path
+
+import pytest
+
+from vecna.tools.dir_watch import DirectoryWatcher
+from vecna.tools.glob import GlobTool
+from vecna.tools.workspace_index import WorkspaceIndex, parse_gitignore
+
+
+def make_tree(root: Path, files: list[str]) -> None:
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+
+
+def test_index_respects_gitignore(tmp_path: Path):
+    """Test that ignored files and directories are left out of the index."""
+    make_tree(
+        tmp_path,
+        [
+            "main.py",
+            "debug.log",
+            "keep.log",
+            "build/out.py",
+            "src/app.py",
+            "src/cache/data.bin",
+            "src/notes.tmp",
+            ".git/config",
+        ],
+    )
+    (tmp_path / ".gitignore").write_text("*.log\n!keep.log\nbuild/\n# comment\n")
+    (tmp_path / "src" / ".gitignore").write_text("/cache/\n*.tmp\n")
+
+    index = WorkspaceIndex(tmp_path)
+
+    assert index.list_files() == [
+        ".gitignore",
+        "keep.log",
+        "main.py",
+        "src/.gitignore",
+        "src/app.py",
+    ]
+
+
+def test_gitignore_rule_matching():
+    """Test anchoring, directory-only rules and globstars."""
+    rules = parse_gitignore("/top.txt\ndocs/\n**/gen/*.py\n")
+
+    assert rules[0].matches("top.txt", False)
+    assert not rules[0].matches("sub/top.txt", False)
+    assert rules[1].matches("a/docs", True)
+    assert not rules[1].matches("a/docs", False)
+    assert rules[2].matches("x/y/gen/m.py", False)
+
+
+def test_index_glob_queries(tmp_path: Path):
+    """Test glob patterns against the sorted path table."""
+    make_tree(tmp_path, ["a.py", "b.md", "src/c.py", "src/pkg/d.py", "src/e.txt"])
+    index = WorkspaceIndex(tmp_path)
+
+    assert index.glob("*.py") == ["a.py"]
+    assert index.glob("**/*.py") == ["a.py", "src/c.py", "src/pkg/d.py"]
+    assert index.glob("src/**/*.py") == ["src/c.py", "src/pkg/d.py"]
+    assert index.glob("src/*") == ["src/c.py", "src/e.txt"]
+    assert index.glob("**/*.py", limit=2) == ["a.py", "src/c.py"]
+
+
+def test_index_refresh_is_incremental(tmp_path: Path):
+    """Test that refresh picks up added, removed and newly ignored files."""
+    make_tree(tmp_path, ["a.py", "old/b.py", "src/c.py"])
+    index = WorkspaceIndex(tmp_path, refresh_interval=3600, watch=False)
+    assert index.glob("**/*.py") == ["a.py", "old/b.py", "src/c.py"]
+
+    make_tree(tmp_path, ["src/new.py", "src/deep/er.py"])
+    (tmp_path / "old" / "b.py").unlink()
+    (tmp_path / "old").rmdir()
+    (tmp_path / ".gitignore").write_text("a.py\n")
+    # Within the refresh interval the table is not rescanned
+    assert index.glob("**/*.py") == ["a.py", "old/b.py", "src/c.py"]
+
+    index.refresh()
+
+    assert index.glob("**/*.py") == ["src/c.py", "src/deep/er.py", "src/new.py"]
+
+
+@pytest.mark.skipif(DirectoryWatcher.create() is None, reason="Watching needs inotify")
+def test_watched_index_is_always_fresh(tmp_path: Path):
+    """Test that a watched index sees every change, and journals it."""
+    make_tree(tmp_path, ["a.py", "old/b.py", "src/c.py"])
+    index = WorkspaceIndex(tmp_path, refresh_interval=3600, watch=True)
+    generation, changed = index.changes_since(None)
+    assert index.watching
+    assert changed is None
+
+    make_tree(tmp_path, ["src/new.py", "src/deep/er.py"])
+    (tmp_path / "old" / "b.py").unlink()
+    (tmp_path / "old").rmdir()
+    (tmp_path / ".gitignore").write_text("a.py\n")
+    assert index.glob("**/*.py") == ["src/c.py", "src/deep/er.py", "src/new.py"]
+    assert index.changes_since(generation)[1] == {
+        ".gitignore",
+        "a.py",
+        "old/b.py",
+        "src/deep/er.py",
+        "src/new.py",
+    }
+
+    # Files written in place are reported too, and so are rule changes
+    generation, _ = index.changes_since(generation)
+    (tmp_path / "src" / "c.py").write_text("changed")
+    (tmp_path / ".gitignore").write_text("")
+    assert index.glob("**/*.py") == [
+        "a.py",
+        "src/c.py",
+        "src/deep/er.py",
+        "src/new.py",
+    ]
+    assert index.changes_since(generation)[1] == {".gitignore", "a.py", "src/c.py"}
+    generation, changed = index.changes_since(generation)
+    assert index.changes_since(generation) == (generation, set())
+
+
+def test_index_finds_names_at_any_depth(tmp_path: Path):
+    """Test that "**/name" queries stay correct as files come and go."""
+    make_tree(tmp_path, ["setup.py", "a/setup.py", "a/b/setup.py", "a/b/other.py"])
+    index = WorkspaceIndex(tmp_path, refresh_interval=0, watch=False)
+    assert index.glob("**/setup.py") == ["a/b/setup.py", "a/setup.py", "setup.py"]
+    assert index.glob("a/**/setup.py") == ["a/b/setup.py", "a/setup.py"]
+
+    make_tree(tmp_path, ["c/setup.py"])
+    (tmp_path / "a" / "setup.py").unlink()
+    assert index.glob("**/setup.py") == ["a/b/setup.py", "c/setup.py", "setup.py"]
+
+
+def test_glob_tool(tmp_path: Path):
+    """Test the glob tool's output and sandboxing."""
+    make_tree(tmp_path, ["src/a.py", "src/b.py", "src/c.py", "README.md"])
+    tool = GlobTool(working_dir=tmp_path, index=WorkspaceIndex(tmp_path))
+
+    assert tool.execute(pattern="**/*.md") == "README.md"
+    assert tool.execute(pattern="*.py", path="src") == "src/a.py\nsrc/b.py\nsrc/c.py"
+    assert "more than 2 matches" in tool.execute(pattern="src/*.py", limit=2)
+    assert "No files match" in tool.execute(pattern="*.rs")
+    assert "Access denied" in tool.execute(pattern="*", path="../")